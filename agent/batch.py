@@ -0,0 +1,181 @@
+# agent/batch.py
+"""
+Batch mode: many agent tasks from a JSONL file, at most *concurrency* at
+a time on one shared client and ModelCaller.
+
+Every task runs in its own copy of the project directory, so tasks that
+write the same file never see each other's edits.  The tools' indexes
+live inside the project, so each copy starts with them warm and they are
+deleted along with it (and dropped from the in-memory CODE_INDEX).  Input lines are JSON
+objects with a "prompt" and optionally an "id" (default: the line number)
+and "max_iterations".  One result line is written per task as soon as it
+finishes, i.e. in completion order:
+
+    {"id", "session_id", "status", "final_response", "iterations",
+     "prompt_tokens", "response_tokens", "changed_files", "wall_s", "error"}
+
+status is "ok", "max_iterations" (no final answer) or "error".
+"""
+from __future__ import annotations
+import asyncio
+import filecmp
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import IO
+
+from agent.loop    import MAX_ITERATIONS, run_session
+from agent.session import SessionStore
+from agent.model   import ModelCaller
+from functions.dispatcher     import CODE_INDEX
+from functions.get_files_info import TOOL_STATE_DIRS
+
+IGNORE = shutil.ignore_patterns("__pycache__")
+
+
+@dataclass
+class Task:
+    id: str
+    prompt: str
+    max_iterations: int = MAX_ITERATIONS
+
+
+def load_tasks(path: str, max_iterations: int = MAX_ITERATIONS) -> list[Task]:
+    """
+    Parse a tasks file; *max_iterations* applies to tasks that do not set
+    their own.  Raises ValueError naming the first bad line.
+    """
+    tasks: list[Task] = []
+    seen: set[str] = set()
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                task = Task(
+                    id=str(data.get("id", n)),
+                    prompt=data["prompt"],
+                    max_iterations=int(data.get("max_iterations", max_iterations)),
+                )
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                raise ValueError(f"{path}:{n}: invalid task ({e!r})") from None
+            if task.max_iterations < 1:
+                raise ValueError(f"{path}:{n}: max_iterations must be at least 1")
+            if task.id in seen:
+                raise ValueError(f"{path}:{n}: duplicate task id {task.id!r}")
+            seen.add(task.id)
+            tasks.append(task)
+    return tasks
+
+
+def _files(root: str) -> Iterator[str]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != "__pycache__" and d not in TOOL_STATE_DIRS]
+        for name in filenames:
+            yield os.path.relpath(os.path.join(dirpath, name), root)
+
+
+def changed_files(source: str, work: str) -> list[str]:
+    """
+    Files added, modified or deleted in *work* relative to *source*; the
+    tools' own state (TOOL_STATE_DIRS) is not counted.
+    """
+    before, after = set(_files(source)), set(_files(work))
+    changed = before ^ after
+    changed.update(
+        rel for rel in before & after
+        if not filecmp.cmp(os.path.join(source, rel), os.path.join(work, rel), shallow=False)
+    )
+    return sorted(changed)
+
+
+async def _run_task(
+    task: Task,
+    client,
+    source: str,
+    out: IO[str],
+    limiter: asyncio.Semaphore,
+    keep_workdirs: bool,
+    **kwargs,
+) -> dict:
+    async with limiter:
+        root = tempfile.mkdtemp(prefix="agent-task-")
+        work = os.path.join(root, os.path.basename(source))
+        store = SessionStore()
+        record = {
+            "id": task.id, "session_id": store.session_id, "status": "error",
+            "final_response": None, "iterations": 0,
+            "prompt_tokens": 0, "response_tokens": 0,
+            "changed_files": [], "wall_s": 0.0, "error": None,
+        }
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(shutil.copytree, source, work, ignore=IGNORE)
+            result = await run_session(
+                client, store, task.prompt,
+                max_iterations=task.max_iterations, workdir=work, **kwargs,
+            )
+            record.update(
+                status="ok" if result.final_response is not None else "max_iterations",
+                final_response=result.final_response,
+                iterations=result.iterations,
+                prompt_tokens=result.prompt_tokens,
+                response_tokens=result.response_tokens,
+            )
+        except Exception as e:                  # one bad task must not stop the batch
+            record["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            record["wall_s"] = round(time.perf_counter() - start, 3)
+            if os.path.isdir(work):
+                record["changed_files"] = await asyncio.to_thread(changed_files, source, work)
+            if keep_workdirs:
+                record["workdir"] = work
+            else:
+                await asyncio.to_thread(shutil.rmtree, root, True)
+                CODE_INDEX.forget(root)
+
+    out.write(json.dumps(record) + "\n")
+    out.flush()
+    return record
+
+
+async def run_batch(
+    client,
+    tasks: list[Task],
+    out: IO[str],
+    source: str,
+    *,
+    concurrency: int = 4,
+    keep_workdirs: bool = False,
+    **kwargs,
+) -> list[dict]:
+    """
+    Run every task against a fresh copy of *source* and stream one JSON
+    result line per task to *out*.  Remaining keyword arguments go to
+    `run_session` (tracer, cache, context_budget, ...); all tasks share
+    one ModelCaller, whose metrics therefore cover the whole batch.
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1 (got {concurrency})")
+    limiter = asyncio.Semaphore(concurrency)
+    kwargs["caller"] = kwargs.get("caller") or ModelCaller()
+    source = os.path.abspath(source)
+    return await asyncio.gather(
+        *(_run_task(t, client, source, out, limiter, keep_workdirs, **kwargs) for t in tasks)
+    )
+
+
+def summary(records: list[dict]) -> str:
+    statuses = Counter(r["status"] for r in records)
+    return (
+        f"Batch: {len(records)} task(s): "
+        + ", ".join(f"{s}={n}" for s, n in sorted(statuses.items()))
+        + f"; tokens: {sum(r['prompt_tokens'] for r in records)} prompt, "
+        f"{sum(r['response_tokens'] for r in records)} response"
+    )
@@ -0,0 +1,180 @@
+# agent/compaction.py
+"""
+Shrink the conversation before each model call.  The full history stays in
+`messages` (and the session store); only the copy sent to the model is
+compacted:
+
+  * `get_file_content` results for a path that a later `write_file` or
+    `patch_file` changed are replaced by a one-line marker, and
+  * while the estimated prompt is over the token budget, the oldest tool
+    results (and old `write_file` payloads) are replaced by a short preview
+    plus a content hash, leaving the most recent turns untouched.
+
+When a file read is compacted away, the session's `ReadLog` forgets it, so
+the next read of that file returns the full text again rather than an
+"unchanged since turn N" note pointing at text the model no longer has.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+
+from google.genai import types
+
+from functions.dispatcher import WRITE_TOOLS
+from functions.read_cache import ReadLog
+
+CHARS_PER_TOKEN = 4            # rough estimate, good enough for budgeting
+DEFAULT_TOKEN_BUDGET = 32_000
+KEEP_RECENT = 2                # newest tool turns that are never compacted
+PREVIEW_CHARS = 80
+
+
+def estimate_tokens(content: types.Content) -> int:
+    dumped = json.dumps(content.model_dump(mode="json", exclude_none=True))
+    return len(dumped) // CHARS_PER_TOKEN + 1
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+def _is_compacted(text: str) -> bool:
+    return text.startswith(("[compacted:", "[superseded:"))
+
+
+def _summary(text: str) -> str:
+    preview = text.strip().splitlines()[0][:PREVIEW_CHARS] if text.strip() else ""
+    return f"[compacted: {len(text)} chars, sha={_digest(text)}] {preview}"
+
+
+def _calls(messages: list[types.Content], index: int) -> list[types.FunctionCall]:
+    """Function calls of the model turn that a tool turn at *index* answers."""
+    if index == 0 or messages[index - 1].role != "model":
+        return []
+    return [p.function_call for p in messages[index - 1].parts or [] if p.function_call]
+
+
+def _path(args: dict | None) -> str | None:
+    path = (args or {}).get("file_path")
+    return os.path.normpath(path) if path else None
+
+
+def _replace_results(content: types.Content, new_text) -> types.Content | None:
+    """
+    Copy of a tool turn with every function response passed through
+    *new_text*, or None when *new_text* changed nothing.
+    """
+    changed = False
+    parts = []
+    for i, part in enumerate(content.parts or []):
+        fr = part.function_response
+        if fr is None:
+            parts.append(part)
+            continue
+        text = str((fr.response or {}).get("result", fr.response))
+        replacement = new_text(i, fr.name, text)
+        if replacement is None:
+            parts.append(part)
+        else:
+            changed = True
+            parts.append(
+                types.Part.from_function_response(
+                    name=fr.name, response={"result": replacement}
+                )
+            )
+    return types.Content(role=content.role, parts=parts) if changed else None
+
+
+def _strip_write_payloads(content: types.Content) -> types.Content:
+    """Copy of a model turn with `write_file` contents reduced to a hash."""
+    parts = []
+    for part in content.parts or []:
+        fc = part.function_call
+        if fc is not None and fc.name == "write_file" and "content" in (fc.args or {}):
+            args = dict(fc.args)
+            args["content"] = _summary(str(args["content"]))
+            part = types.Part(function_call=types.FunctionCall(name=fc.name, args=args))
+        parts.append(part)
+    return types.Content(role=content.role, parts=parts)
+
+
+def compact(
+    messages: list[types.Content],
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    keep_recent: int = KEEP_RECENT,
+    reads: ReadLog | None = None,
+) -> tuple[list[types.Content], int, int]:
+    """
+    Return (compacted_messages, estimated_tokens_before, estimated_tokens_after).
+    *messages* itself is never modified.
+    """
+
+    def forget(calls: list[types.FunctionCall], k: int, name: str, text: str) -> None:
+        # *text* is the read being compacted; its digest matches the sha the
+        # ReadLog recorded only if it is still the model's latest full read
+        if reads is not None and name == "get_file_content" and k < len(calls):
+            path = _path(calls[k].args)
+            if path is not None:
+                reads.forget(path, _digest(text))
+    out = list(messages)
+    sizes = [estimate_tokens(c) for c in out]
+    before = sum(sizes)
+
+    def swap(index: int, content: types.Content) -> None:
+        out[index] = content
+        sizes[index] = estimate_tokens(content)
+
+    # ── 1. drop reads made stale by a later write ───────────────
+    last_write: dict[str, int] = {}
+    for i, content in enumerate(messages):
+        if content.role == "model":
+            for part in content.parts or []:
+                fc = part.function_call
+                if fc is not None and fc.name in WRITE_TOOLS and _path(fc.args):
+                    last_write[_path(fc.args)] = i
+
+    for i, content in enumerate(messages):
+        if content.role != "tool":
+            continue
+        calls = _calls(messages, i)
+
+        def superseded(k: int, name: str, text: str, i=i, calls=calls):
+            if name != "get_file_content" or k >= len(calls):
+                return None
+            path = _path(calls[k].args)
+            if path is None or last_write.get(path, -1) <= i:
+                return None
+            forget(calls, k, name, text)
+            return f"[superseded: {path} was changed by a later write]"
+
+        compacted = _replace_results(content, superseded)
+        if compacted is not None:
+            swap(i, compacted)
+
+    # ── 2. summarise oldest turns until under budget ────────────
+    tool_turns = [i for i, c in enumerate(out) if c.role == "tool"]
+    stale = set(tool_turns[:-keep_recent] if keep_recent else tool_turns)
+    candidates = [
+        i for i, c in enumerate(out)
+        if i in stale or (c.role == "model" and i + 1 in stale)
+    ]
+    for i in candidates:
+        if sum(sizes) <= token_budget:
+            break
+        if out[i].role == "tool":
+            calls = _calls(messages, i)
+
+            def summarise(k: int, name: str, text: str, calls=calls):
+                if _is_compacted(text):
+                    return None
+                forget(calls, k, name, text)
+                return _summary(text)
+
+            compacted = _replace_results(out[i], summarise)
+            if compacted is not None:
+                swap(i, compacted)
+        else:
+            swap(i, _strip_write_payloads(out[i]))
+
+    return out, before, sum(sizes)
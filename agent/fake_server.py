@@ -0,0 +1,162 @@
+# agent/fake_server.py
+"""
+A local stand-in for the Gemini REST endpoint that injects failures.
+
+`FakeGeminiServer` answers `...:streamGenerateContent?alt=sse` requests
+over real HTTP with the next model turn of a transcript (as server-sent
+events, one part per event), so a real `genai.Client` pointed at
+`server.url` exercises the whole network path: connection reuse, status
+errors, resets and timeouts.  Each request first takes the next entry of
+*faults*; past its end, requests fail with probability *failure_rate*
+(seeded) and otherwise succeed.  Only successful requests consume a turn.
+
+Faults:
+    "ok"              serve the next turn
+    "429", "503", …   reply with that HTTP status and a JSON error body
+                      (plus a Retry-After header if *retry_after* is set)
+    "reset"           close the connection without a response
+    "drop"            send the first event, then close mid-stream
+    "stall"           sleep `stall` seconds before answering (the turn is
+                      not consumed: the client is expected to time out)
+"""
+from __future__ import annotations
+import json
+import random
+import socket
+import struct
+import threading
+import time
+from collections.abc import Iterable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from google.genai import types
+
+RANDOM_FAULTS = ("429", "500", "503", "reset", "drop")
+
+
+class FakeGeminiServer:
+    def __init__(
+        self,
+        turns: list[types.Content],
+        faults: Iterable[str] = (),
+        *,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+        stall: float = 5.0,
+        retry_after: float | None = None,
+    ) -> None:
+        self.turns = list(turns)
+        self.faults = list(faults)
+        self.failure_rate = failure_rate
+        self.stall = stall
+        self.retry_after = retry_after
+        self.requests = 0
+        self.served = 0
+        self.injected: list[str] = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def __enter__(self) -> "FakeGeminiServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _next(self) -> tuple[str, types.Content | None]:
+        """The fault for this request and, if it succeeds, the turn to serve."""
+        with self._lock:
+            self.requests += 1
+            if self.faults:
+                fault = self.faults.pop(0)
+            elif self._rng.random() < self.failure_rate:
+                fault = self._rng.choice(RANDOM_FAULTS)
+            else:
+                fault = "ok"
+            if fault != "ok":
+                self.injected.append(fault)
+            if fault in ("ok", "drop", "stall"):
+                if self.served >= len(self.turns):
+                    return "exhausted", None
+                turn = self.turns[self.served]
+                if fault == "ok":
+                    self.served += 1
+                return fault, turn
+            return fault, None
+
+
+def _event(part: types.Part, usage: dict | None) -> bytes:
+    chunk = types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))],
+    ).model_dump(mode="json", by_alias=True, exclude_none=True)
+    if usage:
+        chunk["usageMetadata"] = usage
+    return b"data: " + json.dumps(chunk).encode() + b"\r\n\r\n"
+
+
+def _handler(server: FakeGeminiServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"           # keep-alive, like the real API
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def _error(self, code: int, message: str, retry_after: float | None = None) -> None:
+            body = json.dumps({"error": {"code": code, "message": message, "status": "INJECTED"}}).encode()
+            self.send_response(code)
+            if retry_after is not None:
+                self.send_header("Retry-After", f"{retry_after:g}")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self) -> None:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if ":streamGenerateContent" not in self.path:
+                return self._error(404, f"unsupported path {self.path}")
+
+            fault, turn = server._next()
+            if fault == "reset":
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                self.close_connection = True
+                return
+            if fault.isdigit():
+                return self._error(int(fault), f"injected {fault}", server.retry_after)
+            if fault == "exhausted":
+                return self._error(400, "transcript exhausted")
+            if fault == "stall":
+                time.sleep(server.stall)
+
+            prompt_chars = len(json.dumps(request.get("contents", [])))
+            usage = {
+                "promptTokenCount": prompt_chars // 4 + 1,
+                "candidatesTokenCount": len(json.dumps(turn.model_dump(mode="json"))) // 4 + 1,
+            }
+            parts = turn.parts or []
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for n, part in enumerate(parts, 1):
+                    data = _event(part, usage if n == len(parts) else None)
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                    if fault == "drop":
+                        self.close_connection = True
+                        return                  # no terminating chunk: truncated stream
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True    # the client gave up (e.g. after a stall)
+
+    return Handler
@@ -0,0 +1,303 @@
+# agent/loop.py
+"""
+asyncio agent loop.  One `run_session` drives one conversation; many of
+them can share a single event loop, with an `asyncio.Semaphore` capping how
+many are active at once.  `main.py` is a thin synchronous wrapper.
+"""
+from __future__ import annotations
+import asyncio
+import contextlib
+import time
+from dataclasses import dataclass
+
+from google.genai import types
+
+# tool schemas
+from functions.get_files_info   import ListingCache, schema_get_files_info
+from functions.get_file_content import schema_get_file_content
+from functions.write_file       import schema_write_file
+from functions.patch_file       import schema_patch_file
+from functions.run_python       import schema_run_python_file
+from functions.run_tests        import schema_run_tests
+from functions.search_code      import schema_search_code
+from functions.dispatcher       import call_functions_async
+from functions.read_cache       import ReadLog
+from agent.session              import SessionStore, pending_function_call
+from agent.compaction           import DEFAULT_TOKEN_BUDGET, compact
+from agent.trace                import Tracer
+from agent.response_cache       import ResponseCache, request_key
+from agent.model                import ModelCaller
+
+MODEL = "gemini-2.0-flash-001"
+MAX_ITERATIONS = 20
+
+# ── system prompt ───────────────────────────────────────────────
+system_prompt = """
+You are a helpful AI coding agent.
+
+You are working in a repository that has a **calculator package** at
+`calculator/pkg/`.  The main logic lives in `pkg/calculator.py`.
+
+When a user reports a bug in the calculator:
+
+1. Call **get_files_info(directory='pkg')** to confirm the file list
+   (**recursive=True** lists a whole subtree in one call).
+2. Call **get_file_content(file_path='pkg/calculator.py')** to inspect the
+   source. To find where something is defined or used, call
+   **search_code(query=..., mode='symbol'|'text'|'regex')** instead of
+   reading more files.
+3. Patch ONLY that file. Prefer **patch_file(file_path='pkg/calculator.py',
+   edits=[{search, replace}])** for small fixes; use **write_file** only to
+   rewrite most of the file. Never create new files (e.g. script.py).
+4. Optionally run **run_tests()** (reruns only the tests your edit affects)
+   or **run_python_file(file_path='calculator/main.py', args=[...])** to verify.
+5. After it works, answer in plain text.
+
+Independent calls (e.g. listing a directory and reading several files) may
+be issued together in ONE response; they run concurrently and all results
+come back in the next turn. Calls that depend on an earlier result must wait
+for it. No free-text plans.
+Paths must stay relative; `working_directory` is added automatically.
+"""
+
+
+# ── tool registry ────────────────────────────────────────────────
+available_tools = [
+    types.Tool(
+        function_declarations=[
+            schema_get_files_info,
+            schema_get_file_content,
+            schema_run_python_file,
+            schema_run_tests,
+            schema_search_code,
+            schema_write_file,
+            schema_patch_file,
+        ]
+    )
+]
+
+
+class ModelCallError(RuntimeError):
+    """The model call failed; the session can be resumed from its store."""
+
+
+@dataclass
+class SessionResult:
+    session_id: str
+    final_response: str | None = None      # None → iteration cap reached
+    iterations: int = 0
+    usage: types.GenerateContentResponseUsageMetadata | None = None    # last call's
+    prompt_tokens: int = 0                 # summed over every model call
+    response_tokens: int = 0
+    tokens_saved: int = 0                  # estimated, by compaction
+
+
+def final_text(content: types.Content) -> str:
+    return "".join(p.text for p in content.parts if p.text).strip()
+
+
+def _merge_chunks(parts: list[types.Part]) -> list[types.Part]:
+    """Join the text fragments of a streamed reply; other parts pass through."""
+    merged: list[types.Part] = []
+    for part in parts:
+        if part.text is not None and merged and merged[-1].text is not None \
+                and not (part.function_call or merged[-1].function_call):
+            merged[-1] = types.Part(text=merged[-1].text + part.text)
+        else:
+            merged.append(part)
+    return merged
+
+
+async def _generate(
+    client,
+    contents: list[types.Content],
+    tracer: Tracer | None,
+    iteration: int,
+    cache: ResponseCache | None = None,
+    caller: ModelCaller | None = None,
+):
+    """
+    One streamed model call.  Returns (content, usage); with a *tracer*,
+    records latency, time to first chunk and token counts.  With a
+    *cache*, an identical earlier request is answered from disk.  Failed
+    attempts are retried by *caller* (see agent.model).
+    """
+    start = time.perf_counter()
+    config = types.GenerateContentConfig(
+        system_instruction=system_prompt,
+        tools=available_tools,
+        temperature=0.0,
+    )
+    key = request_key(MODEL, config, contents) if cache is not None else None
+    if key is not None and (hit := cache.get(key)) is not None:
+        content, usage = hit
+        if tracer is not None:
+            tracer.add(
+                "generate_content [cached]", "model", start, time.perf_counter(),
+                iteration=iteration,
+                prompt_tokens=usage.prompt_token_count if usage else None,
+                response_tokens=usage.candidates_token_count if usage else None,
+            )
+        return content, usage
+
+    async def attempt():
+        start = time.perf_counter()
+        first_chunk = None
+        parts: list[types.Part] = []
+        usage = None
+        async for chunk in await client.aio.models.generate_content_stream(
+            model=MODEL,
+            contents=contents,
+            config=config,
+        ):
+            if first_chunk is None:
+                first_chunk = time.perf_counter()
+            if chunk.candidates and chunk.candidates[0].content:
+                parts.extend(chunk.candidates[0].content.parts or [])
+            usage = chunk.usage_metadata or usage
+        return start, first_chunk, parts, usage
+
+    start, first_chunk, parts, usage = await (caller or ModelCaller()).call(attempt, tracer)
+
+    if tracer is not None:
+        tracer.add(
+            "generate_content", "model", start, time.perf_counter(),
+            iteration=iteration,
+            ttft_ms=round(((first_chunk or start) - start) * 1e3, 3),
+            prompt_tokens=usage.prompt_token_count if usage else None,
+            response_tokens=usage.candidates_token_count if usage else None,
+        )
+    content = types.Content(role="model", parts=_merge_chunks(parts))
+    if key is not None and content.parts:
+        cache.put(key, content, usage)
+    return content, usage
+
+
+async def run_session(
+    client,
+    store: SessionStore,
+    prompt: str = "",
+    *,
+    verbose: bool = False,
+    context_budget: int = DEFAULT_TOKEN_BUDGET,
+    max_iterations: int = MAX_ITERATIONS,
+    limiter: asyncio.Semaphore | None = None,
+    tracer: Tracer | None = None,
+    cache: ResponseCache | None = None,
+    caller: ModelCaller | None = None,
+    workdir: str | None = None,
+) -> SessionResult:
+    """
+    Run (or resume, when *store* already has turns) one agent conversation.
+    Raises ModelCallError if the model cannot be reached; every turn up to
+    that point is already in *store*.  With a *tracer*, every model and
+    tool call is recorded inside a "session" span; with a response
+    *cache*, repeated identical model requests skip the network.  Model
+    calls go through *caller*, which retries transient errors; share one
+    across sessions to share its concurrency limit and metrics.  Tools
+    work in *workdir* instead of the dispatcher's WORKING_DIR if given.
+    """
+    async with limiter or contextlib.nullcontext():
+        args = (
+            client, store, prompt, verbose, context_budget, max_iterations,
+            tracer, cache, caller or ModelCaller(), workdir,
+        )
+        if tracer is None:
+            return await _run(*args)
+        with tracer.span("session", "session", session_id=store.session_id):
+            return await _run(*args)
+
+
+async def run_sessions(
+    client, prompts: list[str], *, concurrency: int = 4, **kwargs
+) -> list[SessionResult | BaseException]:
+    """
+    Run one new session per prompt, at most *concurrency* at a time.  All
+    sessions share one ModelCaller (pass `caller=` to set its retry policy
+    and in-flight call limit), so its metrics cover the whole batch.
+    """
+    limiter = asyncio.Semaphore(concurrency)
+    kwargs["caller"] = kwargs.get("caller") or ModelCaller()
+    return await asyncio.gather(
+        *(run_session(client, SessionStore(), p, limiter=limiter, **kwargs) for p in prompts),
+        return_exceptions=True,
+    )
+
+
+async def _run(
+    client, store, prompt, verbose, context_budget, max_iterations, tracer, cache, caller,
+    workdir,
+) -> SessionResult:
+    result = SessionResult(store.session_id)
+
+    # conversation memory
+    messages: list[types.Content] = store.load() if store.exists() else []
+    reads = ReadLog()                           # file versions the model has seen
+    listings = ListingCache()                   # directory listings, this session only
+
+    def record(content: types.Content) -> None:
+        messages.append(content)                # keep conversation state
+        store.append(content)                   # … and survive a crash
+
+    async def run_tool_calls(content: types.Content) -> None:
+        function_calls = [p.function_call for p in content.parts if p.function_call]
+        reads.turn = result.iterations
+        tool_response = await call_functions_async(
+            function_calls, verbose=verbose, reads=reads, tracer=tracer,
+            workdir=workdir, listings=listings,
+        )
+
+        # ensure dispatcher produced one tool response per call
+        if len(tool_response.parts) != len(function_calls) or not all(
+            p.function_response for p in tool_response.parts
+        ):
+            raise RuntimeError("call_functions failed to produce a tool response")
+
+        if verbose:
+            for part in tool_response.parts:
+                print("->", part.function_response.response)
+
+        record(tool_response)                   # feed all tool results back to LLM
+
+    # a resumed run may stop between a tool call and its response; answer
+    # it before any new prompt, as every call needs its response next
+    if pending_function_call(messages):
+        await run_tool_calls(messages[-1])
+
+    if prompt:
+        record(types.Content(role="user", parts=[types.Part(text=prompt)]))
+    elif messages and messages[-1].role == "model":
+        # resumed a session that already finished
+        result.final_response = final_text(messages[-1])
+        return result
+
+    # ── dialogue loop ───────────────────────────────────────────
+    for _ in range(max_iterations):
+        # send a compacted copy; `messages` keeps the full history
+        contents, tokens_before, tokens_after = compact(
+            messages, context_budget, reads=reads
+        )
+        result.tokens_saved += tokens_before - tokens_after
+        try:
+            content, result.usage = await _generate(
+                client, contents, tracer, result.iterations + 1, cache, caller
+            )
+        except Exception as e:
+            raise ModelCallError(str(e)) from e
+
+        result.iterations += 1
+        if result.usage is not None:
+            result.prompt_tokens += result.usage.prompt_token_count or 0
+            result.response_tokens += result.usage.candidates_token_count or 0
+        record(content)
+
+        # ── branch: model produced one or more tool calls ───────
+        if pending_function_call(messages):
+            await run_tool_calls(content)
+            continue                            # next turn
+
+        # ── branch: model produced plain text (final answer) ────
+        result.final_response = final_text(content)
+        break
+
+    return result
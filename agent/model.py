@@ -0,0 +1,180 @@
+# agent/model.py
+"""
+The model-call layer: one shared HTTP client, retries with exponential
+backoff and full jitter for transient failures, a timeout per attempt,
+limits on in-flight calls and on the request rate across sessions, and
+counters for what the retries cost.
+
+    caller = ModelCaller()
+    result = await caller.call(lambda: stream_one_reply(...))
+
+`call` re-runs the whole attempt, so a stream that fails half way is
+started again from scratch; the caller only sees the successful attempt.
+"""
+from __future__ import annotations
+import asyncio
+import contextlib
+import random
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, TypeVar
+
+import httpx
+from google.genai import errors
+
+if TYPE_CHECKING:
+    from agent.trace import Tracer
+
+T = TypeVar("T")
+
+# 408 request timeout, 429 rate limited, 5xx server side
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+MAX_CONNECTIONS = 16            # per shared HTTP client
+
+
+def make_client(api_key: str, *, base_url: str | None = None, max_connections: int = MAX_CONNECTIONS):
+    """
+    Build the one `genai.Client` a process should share: its httpx client
+    keeps connections alive, so every session and retry reuses them.
+    """
+    from google import genai
+    from google.genai import types
+
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(
+            base_url=base_url,
+            client_args={"limits": limits},
+            async_client_args={"limits": limits},
+        ),
+    )
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 5
+    base_delay: float = 0.5         # seconds; doubles per attempt
+    max_delay: float = 30.0
+    timeout: float = 120.0          # per attempt, including the whole stream
+
+    def __post_init__(self) -> None:
+        if self.max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1 (got {self.max_attempts})")
+        if not self.timeout > 0:
+            raise ValueError(f"timeout must be positive (got {self.timeout})")
+        if self.base_delay < 0 or self.max_delay < 0:
+            raise ValueError("base_delay and max_delay must not be negative")
+
+
+@dataclass
+class CallMetrics:
+    calls: int = 0                  # successful calls
+    attempts: int = 0
+    retries: int = 0
+    failed_time: float = 0.0        # seconds spent in attempts that failed
+    backoff_time: float = 0.0       # seconds slept between attempts
+    errors: Counter = field(default_factory=Counter)
+
+    def summary(self) -> str:
+        kinds = ", ".join(f"{k}={n}" for k, n in self.errors.most_common()) or "none"
+        return (
+            f"Model calls: {self.calls} ({self.attempts} attempts, {self.retries} retries); "
+            f"retries cost {self.failed_time + self.backoff_time:.2f}s "
+            f"({self.failed_time:.2f}s failed attempts, {self.backoff_time:.2f}s backoff); "
+            f"errors: {kinds}"
+        )
+
+
+def error_kind(exc: BaseException) -> str:
+    if isinstance(exc, errors.APIError):
+        return f"http_{exc.code}"
+    if isinstance(exc, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return "timeout"
+    return type(exc).__name__
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, errors.APIError):
+        return exc.code in RETRYABLE_STATUS
+    # connection refused/reset, read errors, our own per-attempt timeout
+    return isinstance(exc, (asyncio.TimeoutError, httpx.TransportError))
+
+
+def _retry_after(exc: BaseException) -> float | None:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    try:
+        return float(headers["retry-after"]) if headers else None
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class ModelCaller:
+    def __init__(
+        self,
+        policy: RetryPolicy | None = None,
+        *,
+        max_concurrent: int | None = None,
+        rate: float | None = None,
+        rng: random.Random | None = None,
+    ) -> None:
+        if rate is not None and not rate > 0:
+            raise ValueError(f"rate must be positive (got {rate})")
+        self.policy = policy or RetryPolicy()
+        self.metrics = CallMetrics()
+        self._limiter = asyncio.Semaphore(max_concurrent) if max_concurrent else None
+        self._interval = 1.0 / rate if rate else 0.0    # rate: attempts per second
+        self._next_start = 0.0
+        self._rng = rng or random.Random()
+
+    async def _pace(self) -> None:
+        """Space attempt starts at least 1/rate seconds apart (one event loop)."""
+        if not self._interval:
+            return
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + self._interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def backoff(self, attempt: int, exc: BaseException) -> float:
+        """Full jitter: uniform in [0, min(max_delay, base * 2**(attempt-1))], at least Retry-After."""
+        p = self.policy
+        delay = self._rng.uniform(0, min(p.max_delay, p.base_delay * 2 ** (attempt - 1)))
+        hint = _retry_after(exc)
+        return max(delay, min(hint, p.max_delay)) if hint is not None else delay
+
+    async def call(self, attempt: Callable[[], Awaitable[T]], tracer: Tracer | None = None) -> T:
+        """Await `attempt()` until it succeeds or fails for good; re-raises the last error."""
+        p = self.policy
+        n = 0
+        while True:
+            n += 1
+            await self._pace()
+            self.metrics.attempts += 1
+            start = time.perf_counter()
+            try:
+                async with self._limiter or contextlib.nullcontext():
+                    result = await asyncio.wait_for(attempt(), p.timeout)
+                self.metrics.calls += 1
+                return result
+            except Exception as exc:
+                failed = time.perf_counter()
+                kind = error_kind(exc)
+                self.metrics.errors[kind] += 1
+                self.metrics.failed_time += failed - start
+                if tracer is not None:
+                    tracer.add("model attempt [failed]", "retry", start, failed, attempt=n, error=kind)
+                if n >= p.max_attempts or not is_retryable(exc):
+                    raise
+
+                delay = self.backoff(n, exc)
+                self.metrics.retries += 1
+                self.metrics.backoff_time += delay
+                await asyncio.sleep(delay)
+                if tracer is not None:
+                    tracer.add("backoff", "retry", failed, time.perf_counter(), attempt=n)
@@ -0,0 +1,70 @@
+# agent/replay.py
+"""
+A stand-in for `genai.Client` that replays recorded model turns.
+
+`ReplayClient` answers each `generate_content_stream` call with the next
+model turn of a transcript, whatever the prompt, so the agent loop, the
+dispatcher and the tools run for real while the model is deterministic and
+offline.  Transcripts are either `types.Content` lists built in code or the
+model turns of a recorded session file (see agent.session).  Each part is
+streamed as its own chunk, with estimated token counts on the last one.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import os
+from collections.abc import AsyncIterator
+
+from google.genai import types
+
+from agent.compaction import estimate_tokens
+from agent.session import SessionStore
+
+
+class ReplayClient:
+    def __init__(self, turns: list[types.Content], latency: float = 0.0) -> None:
+        self.turns = list(turns)
+        self.latency = latency                  # seconds before each chunk
+        self.calls = 0
+        self.bytes_sent = 0                     # serialized prompt bytes, all calls
+        self.aio = _AsyncClient(self)
+
+    @classmethod
+    def from_session(cls, path: str, **kwargs) -> "ReplayClient":
+        """Replay the model turns of a session JSONL file."""
+        session_id = os.path.splitext(os.path.basename(path))[0]
+        store = SessionStore(session_id, os.path.dirname(path) or ".")
+        return cls([c for c in store.load() if c.role == "model"], **kwargs)
+
+    async def _stream(self, contents: list[types.Content]) -> AsyncIterator[types.GenerateContentResponse]:
+        if self.calls >= len(self.turns):
+            raise RuntimeError(f"replay transcript exhausted after {len(self.turns)} turns")
+        turn = self.turns[self.calls]
+        self.calls += 1
+        self.bytes_sent += sum(
+            len(json.dumps(c.model_dump(mode="json", exclude_none=True)).encode())
+            for c in contents
+        )
+        usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=sum(estimate_tokens(c) for c in contents),
+            candidates_token_count=estimate_tokens(turn),
+        )
+        parts = turn.parts or []
+        for n, part in enumerate(parts, 1):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            yield types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))],
+                usage_metadata=usage if n == len(parts) else None,
+            )
+
+
+class _AsyncClient:
+    """The `client.aio` surface the agent loop uses."""
+
+    def __init__(self, replay: ReplayClient) -> None:
+        self.models = self
+        self._replay = replay
+
+    async def generate_content_stream(self, *, model, contents, config=None):
+        return self._replay._stream(contents)
@@ -0,0 +1,162 @@
+# agent/response_cache.py
+"""
+Opt-in on-disk cache of model responses.
+
+At temperature 0 with a fixed system prompt and tool set, an identical
+request gets the same answer, so a repeated request (e.g. the same prompt
+in CI) can be answered from disk without a network round-trip.  Entries
+are keyed by a SHA-256 of the model name, the full generation config
+(system instruction, tool schemas, temperature) and the serialized
+contents, and stored one JSON file per key.
+
+Entries expire `ttl` seconds after they were written.  When the directory
+grows past `max_bytes`, the least recently used entries (by mtime, which
+a hit refreshes) are deleted.  The directory is only scanned for that on
+the first `put`, every EVICT_EVERY puts after it, and whenever the bytes
+written since the last scan push the estimated size past `max_bytes`.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+from google.genai import types
+
+CACHE_DIR = os.path.join(".cache", "responses")
+DEFAULT_TTL = 7 * 24 * 3600         # seconds
+DEFAULT_MAX_BYTES = 64 << 20
+EVICT_EVERY = 64                    # puts between scans while under budget
+
+# Per-run measurements inside tool results; masked in the key so that a
+# rerun of the same conversation still hits.
+VOLATILE = re.compile(r"\[wall time [\d.]+s, peak RSS [^\]]+\]")
+
+
+def _stable(content: types.Content) -> dict:
+    dumped = content.model_dump(mode="json", exclude_none=True)
+    for part in dumped.get("parts", []):
+        response = part.get("function_response", {}).get("response", {})
+        if isinstance(response.get("result"), str):
+            response["result"] = VOLATILE.sub("[wall time, peak RSS]", response["result"])
+    return dumped
+
+
+def request_key(model: str, config: types.GenerateContentConfig, contents: list[types.Content]) -> str:
+    request = {
+        "model": model,
+        "config": config.model_dump(mode="json", exclude_none=True),
+        "contents": [_stable(c) for c in contents],
+    }
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        directory: str = CACHE_DIR,
+        ttl: float = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes: int | None = None  # estimated size; None until scanned
+        self._puts = 0                  # puts since the last scan
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(
+        self, key: str
+    ) -> tuple[types.Content, types.GenerateContentResponseUsageMetadata | None] | None:
+        """The cached (content, usage) for *key*, or None if absent or expired."""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                record = json.load(f)
+            expired = time.time() - record["created"] > self.ttl
+            if not expired:
+                os.utime(path)                  # most recently used
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        if expired:
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        usage = record.get("usage")
+        return (
+            types.Content.model_validate(record["content"]),
+            types.GenerateContentResponseUsageMetadata.model_validate(usage) if usage else None,
+        )
+
+    def put(
+        self,
+        key: str,
+        content: types.Content,
+        usage: types.GenerateContentResponseUsageMetadata | None,
+    ) -> None:
+        record = {
+            "created": time.time(),
+            "content": content.model_dump(mode="json", exclude_none=True),
+            "usage": usage.model_dump(mode="json", exclude_none=True) if usage else None,
+        }
+        data = json.dumps(record).encode("utf-8")
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        self._puts += 1
+        if self._bytes is not None:
+            self._bytes += len(data)            # overwrites overcount: scans early
+        if self._bytes is None or self._bytes > self.max_bytes or self._puts >= EVICT_EVERY:
+            self.evict()
+
+    def evict(self) -> None:
+        """Drop expired entries, then the least recently used until under max_bytes."""
+        now = time.time()
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:             # evicted by another process meanwhile
+                        continue
+                    if now - st.st_mtime > self.ttl:     # mtime >= created, so expired
+                        self._remove(entry.path)
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+        self._bytes, self._puts = total, 0
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
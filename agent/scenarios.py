@@ -0,0 +1,142 @@
+# agent/scenarios.py
+"""
+Canned bug-fix scenarios for offline, end-to-end runs of the agent.
+
+Each scenario breaks one line of a fresh copy of `calculator/` and replays
+the model turns an agent would take to fix it: list and read, patch, run
+the tests, run the CLI, answer.  `run_scenario` drives the real loop and
+tools against that copy with a `ReplayClient` and reports iterations, tool
+time and bytes, and whether the copy ended up fixed.
+"""
+from __future__ import annotations
+import asyncio
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+
+from google.genai import types
+
+from agent.loop import run_session
+from agent.model import ModelCaller
+from agent.replay import ReplayClient
+from agent.session import SESSION_DIR, SessionStore
+from agent.trace import Tracer
+
+SOURCE_DIR = "calculator"
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    prompt: str
+    file_path: str          # relative to the calculator directory
+    good: str               # line(s) the bug replaces; the fix restores them
+    bad: str
+    cli_args: tuple[str, ...]
+
+    def turns(self) -> list[types.Content]:
+        def calls(*pairs: tuple[str, dict]) -> types.Content:
+            return types.Content(role="model", parts=[
+                types.Part(function_call=types.FunctionCall(name=name, args=args))
+                for name, args in pairs
+            ])
+
+        return [
+            calls(
+                ("get_files_info", {"directory": "pkg"}),
+                ("get_file_content", {"file_path": self.file_path}),
+            ),
+            calls(("patch_file", {
+                "file_path": self.file_path,
+                "edits": [{"search": self.bad, "replace": self.good}],
+            })),
+            calls(("run_tests", {})),
+            calls(("run_python_file", {"file_path": "main.py", "args": list(self.cli_args)})),
+            types.Content(role="model", parts=[
+                types.Part(text=f"Fixed {self.file_path}; the tests pass."),
+            ]),
+        ]
+
+
+SCENARIOS = [
+    Scenario(
+        name="precedence",
+        prompt="3 + 7 * 2 gives 20 instead of 17. Please fix it.",
+        file_path="pkg/calculator.py",
+        good='"*": 2,',
+        bad='"*": 1,',
+        cli_args=("3 + 7 * 2",),
+    ),
+    Scenario(
+        name="render",
+        prompt="10 / 4 is shown as 2 instead of 2.5. Please fix it.",
+        file_path="pkg/render.py",
+        good="if isinstance(result, float) and result.is_integer():",
+        bad="if isinstance(result, float):",
+        cli_args=("10 / 4",),
+    ),
+    Scenario(
+        name="unary-minus",
+        prompt='"5 - 3" fails with "invalid expression". Please fix it.',
+        file_path="pkg/lexer.py",
+        good='append(NEG if expect_operand and ch == "-" else ch)',
+        bad='append(NEG if ch == "-" else ch)',
+        cli_args=("5 - 3",),
+    ),
+]
+
+
+def run_scenario(
+    scenario: Scenario,
+    source: str = SOURCE_DIR,
+    *,
+    client=None,
+    caller: ModelCaller | None = None,
+) -> dict:
+    """
+    Run *scenario* in a temporary project directory and return its metrics:
+    iterations, model calls, tool calls and time, bytes sent to the model,
+    tool result bytes, wall time and whether the bug was fixed.  *client*
+    defaults to a ReplayClient of the scenario's turns.
+    """
+    source = os.path.abspath(source)
+    with tempfile.TemporaryDirectory() as root:
+        work = os.path.join(root, SOURCE_DIR)
+        shutil.copytree(source, work, ignore=shutil.ignore_patterns("__pycache__"))
+        target = os.path.join(work, scenario.file_path)
+        with open(target, encoding="utf-8") as f:
+            original = f.read()
+        if original.count(scenario.good) != 1:
+            raise ValueError(f"{scenario.name}: {scenario.good!r} must occur once in {target}")
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(original.replace(scenario.good, scenario.bad))
+
+        replay = ReplayClient(scenario.turns())
+        tracer = Tracer()
+        store = SessionStore(directory=os.path.join(root, SESSION_DIR))
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = asyncio.run(run_session(
+                client or replay, store, scenario.prompt,
+                tracer=tracer, caller=caller, workdir=work,
+            ))
+        wall = time.perf_counter() - start
+
+        with open(target, encoding="utf-8") as f:
+            fixed = f.read() == original
+
+    tools = [e for e in tracer.events if e["cat"] == "tool"]
+    return {
+        "iterations": result.iterations,
+        "model_calls": sum(e["cat"] == "model" for e in tracer.events),
+        "tool_calls": len(tools),
+        "tool_ms": sum(e["dur"] for e in tools) / 1e3,
+        "bytes_sent": replay.bytes_sent if client is None else None,
+        "result_bytes": sum(e["args"].get("result_bytes", 0) for e in tools),
+        "wall_ms": wall * 1e3,
+        "fixed": fixed and result.final_response is not None,
+    }
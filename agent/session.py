@@ -0,0 +1,75 @@
+# agent/session.py
+"""
+Append-only JSONL store for agent conversations.  Every `types.Content`
+turn (user prompt, model reply, tool response) is written as one line as
+soon as it exists, so a crashed or capped run can be resumed without
+re-paying for model turns or tool calls.
+"""
+from __future__ import annotations
+import json
+import os
+import uuid
+
+from google.genai import types
+
+SESSION_DIR = ".sessions"
+
+
+class SessionStore:
+    def __init__(self, session_id: str | None = None, directory: str = SESSION_DIR):
+        if session_id is not None and (
+            session_id in ("", ".", "..") or os.path.basename(session_id) != session_id
+        ):
+            raise ValueError(f"invalid session id {session_id!r}")
+        self.session_id = session_id or uuid.uuid4().hex[:12]
+        self.path = os.path.join(directory, f"{self.session_id}.jsonl")
+        self.skipped: list[int] = []            # corrupt lines ignored by load()
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def append(self, content: types.Content) -> None:
+        """Persist one turn; flushed before returning."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        record = {"content": content.model_dump(mode="json", exclude_none=True)}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def load(self) -> list[types.Content]:
+        """
+        Return every recorded turn in order.  A torn last line (crash while
+        writing) is cut off the file, so the session resumes from the last
+        complete turn and the next `append` starts on a fresh line.  Corrupt
+        lines before it are skipped, never deleted; their 1-based numbers
+        are left in `skipped`.
+        """
+        messages: list[types.Content] = []
+        self.skipped = []
+        with open(self.path, "rb") as f:
+            data = f.read()
+        lines = data.splitlines(keepends=True)
+        end = 0                                 # bytes up to the last good turn
+        for n, line in enumerate(lines, 1):
+            try:
+                record = json.loads(line)
+                content = types.Content.model_validate(record["content"])
+            except (ValueError, KeyError, TypeError):   # also UTF-8 and pydantic errors
+                if n < len(lines):
+                    self.skipped.append(n)
+                    end += len(line)
+                continue
+            messages.append(content)
+            end += len(line)
+        if end < len(data):
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+        if end and not data[:end].endswith(b"\n"):
+            with open(self.path, "ab") as f:   # complete record, newline lost
+                f.write(b"\n")
+        return messages
+
+def pending_function_call(messages: list[types.Content]) -> bool:
+    """True when the last turn is a model tool call with no recorded response."""
+    if not messages or messages[-1].role != "model":
+        return False
+    return any(part.function_call for part in messages[-1].parts or [])
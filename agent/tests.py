@@ -0,0 +1,453 @@
+# agent/tests.py  (run from the project root: python -m unittest agent.tests)
+import asyncio
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from google.genai import errors, types
+
+from agent.batch import Task, changed_files, load_tasks, run_batch
+from agent.compaction import _digest, compact
+from agent.fake_server import FakeGeminiServer
+from agent.loop import MODEL, run_session
+from agent.model import ModelCaller, RetryPolicy, make_client
+from agent.replay import ReplayClient
+from agent.response_cache import EVICT_EVERY, ResponseCache
+from agent.scenarios import SCENARIOS, run_scenario
+from agent.session import SESSION_DIR, SessionStore
+from agent.trace import Tracer
+from functions.dispatcher import CODE_INDEX
+from functions.read_cache import ReadLog
+from main import main
+
+
+def text_turn(role, text):
+    return types.Content(role=role, parts=[types.Part(text=text)])
+
+
+def call_turn(name, **args):
+    return types.Content(
+        role="model", parts=[types.Part(function_call=types.FunctionCall(name=name, args=args))]
+    )
+
+
+class TempDirTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+
+class TestSessionStore(TempDirTestCase):
+    def test_round_trip(self):
+        store = SessionStore("s", self.tmp)
+        turns = [text_turn("user", "hi"), call_turn("get_files_info", directory="pkg")]
+        for turn in turns:
+            store.append(turn)
+        self.assertEqual(SessionStore("s", self.tmp).load(), turns)
+
+    def test_torn_tail_then_append(self):
+        store = SessionStore("s", self.tmp)
+        store.append(text_turn("user", "one"))
+        store.append(text_turn("model", "two"))
+        with open(store.path, "rb+") as f:         # crash half way through turn 2
+            f.truncate(os.path.getsize(store.path) - 10)
+
+        resumed = SessionStore("s", self.tmp)
+        self.assertEqual(resumed.load(), [text_turn("user", "one")])
+        resumed.append(text_turn("model", "three"))
+        resumed.append(text_turn("user", "four"))
+        self.assertEqual(
+            SessionStore("s", self.tmp).load(),
+            [text_turn("user", "one"), text_turn("model", "three"), text_turn("user", "four")],
+        )
+
+    def test_missing_final_newline(self):
+        store = SessionStore("s", self.tmp)
+        store.append(text_turn("user", "one"))
+        with open(store.path, "rb+") as f:         # crash before the newline
+            f.truncate(os.path.getsize(store.path) - 1)
+
+        store.load()
+        store.append(text_turn("model", "two"))
+        self.assertEqual(
+            store.load(), [text_turn("user", "one"), text_turn("model", "two")]
+        )
+
+    def test_corrupt_middle_line_is_skipped_not_truncated(self):
+        store = SessionStore("s", self.tmp)
+        store.append(text_turn("user", "one"))
+        with open(store.path, "a", encoding="utf-8") as f:
+            f.write('{"content": {"role": "us\n')
+        store.append(text_turn("model", "two"))
+
+        turns = store.load()
+        self.assertEqual(turns, [text_turn("user", "one"), text_turn("model", "two")])
+        self.assertEqual(store.skipped, [2])
+        self.assertEqual(SessionStore("s", self.tmp).load(), turns)   # nothing was deleted
+
+    def test_session_id_cannot_leave_the_directory(self):
+        for bad in ("../x", "a/b", "..", ""):
+            with self.subTest(bad), self.assertRaises(ValueError):
+                SessionStore(bad, self.tmp)
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            main(["--resume", "../x"])
+
+
+class TestResume(TempDirTestCase):
+    def test_pending_call_answered_before_new_prompt(self):
+        os.makedirs(os.path.join(self.tmp, "work", "pkg"))
+        store = SessionStore("s", self.tmp)
+        store.append(text_turn("user", "list pkg"))
+        store.append(call_turn("get_files_info", directory="pkg"))   # crashed here
+
+        client = ReplayClient([text_turn("model", "done")])
+        result = asyncio.run(run_session(
+            client, SessionStore("s", self.tmp), "and now?",
+            workdir=os.path.join(self.tmp, "work"),
+        ))
+
+        self.assertEqual(result.final_response, "done")
+        roles = [c.role for c in store.load()]
+        self.assertEqual(roles, ["user", "model", "tool", "user", "model"])
+        self.assertEqual(store.load()[2].parts[0].function_response.name, "get_files_info")
+
+
+def tool_turn(name, result):
+    return types.Content(
+        role="tool", parts=[types.Part.from_function_response(name=name, response={"result": result})]
+    )
+
+
+class TestCompactionReadLog(unittest.TestCase):
+    def history(self, *reads_and_writes):
+        messages = [text_turn("user", "fix it")]
+        for name, result in reads_and_writes:
+            args = {"file_path": "pkg/a.py"}
+            if name == "write_file":
+                args["content"] = "new"
+            messages += [call_turn(name, **args), tool_turn(name, result)]
+        return messages
+
+    def test_reread_after_write_survives_compaction(self):
+        messages = self.history(
+            ("get_file_content", "old text"), ("write_file", "ok"), ("get_file_content", "new text"),
+        )
+        reads = ReadLog()
+        reads.turn = 3
+        reads.record("pkg/a.py", _digest("new text"))
+
+        for _ in range(3):                      # compact runs before every model call
+            out, _, _ = compact(messages, reads=reads)
+        self.assertIn("[superseded", str(out[2].parts[0].function_response.response))
+        self.assertEqual(reads.seen("pkg/a.py", _digest("new text")), 3)
+
+    def test_compacted_latest_read_is_forgotten(self):
+        messages = self.history(("get_file_content", "old text"), ("write_file", "ok"))
+        reads = ReadLog()
+        reads.record("pkg/a.py", _digest("old text"))
+        compact(messages, reads=reads)
+        self.assertIsNone(reads.seen("pkg/a.py", _digest("old text")))
+
+
+class TestScenarios(unittest.TestCase):
+    def test_replayed_fixes(self):
+        cwd, before = os.getcwd(), sorted(os.listdir())
+        for scenario in SCENARIOS:
+            with self.subTest(scenario.name):
+                metrics = run_scenario(scenario)
+                self.assertTrue(metrics["fixed"], metrics)
+                self.assertEqual(metrics["iterations"], 5)
+                self.assertEqual(metrics["tool_calls"], 5)
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertEqual(sorted(os.listdir()), before)     # no .sessions left behind
+
+    def test_unpatched_copy_is_not_fixed(self):
+        scenario = SCENARIOS[0]
+        turns = [t for t in scenario.turns() if t.parts[0].function_call is None
+                 or t.parts[0].function_call.name != "patch_file"]
+        self.assertFalse(run_scenario(scenario, client=ReplayClient(turns))["fixed"])
+
+
+class TestModelCaller(unittest.TestCase):
+    """ModelCaller driving a real client against the fault-injecting server."""
+
+    def call(self, faults, policy=None, **server_options):
+        caller = ModelCaller(policy or RetryPolicy(base_delay=0.01, timeout=2.0))
+        with FakeGeminiServer([text_turn("model", "pong")], faults, **server_options) as server:
+            client = make_client("fake-key", base_url=server.url)
+
+            async def attempt():
+                stream = await client.aio.models.generate_content_stream(model=MODEL, contents="ping")
+                return "".join([chunk.text async for chunk in stream])
+
+            async def main():
+                try:
+                    return await caller.call(attempt)
+                finally:                        # genai 1.12 has no public close
+                    await client._api_client._async_httpx_client.aclose()
+
+            try:
+                return asyncio.run(main()), caller.metrics, server
+            except Exception as e:
+                e.metrics, e.server = caller.metrics, server
+                raise
+
+    def test_retries_transient_failures(self):
+        text, metrics, server = self.call(["429", "503", "reset", "ok"])
+        self.assertEqual(text, "pong")
+        self.assertEqual((metrics.calls, metrics.attempts, metrics.retries), (1, 4, 3))
+        self.assertEqual(metrics.errors["http_429"], 1)
+        self.assertEqual(metrics.errors["http_503"], 1)
+        self.assertEqual(server.requests, 4)
+
+    def test_stall_times_out_and_retries(self):
+        text, metrics, _ = self.call(
+            ["stall", "ok"], RetryPolicy(base_delay=0.01, timeout=0.3), stall=2.0,
+        )
+        self.assertEqual(text, "pong")
+        self.assertEqual(metrics.errors["timeout"], 1)
+        self.assertGreaterEqual(metrics.failed_time, 0.3)
+
+    def test_retry_after_is_honoured(self):
+        _, metrics, _ = self.call(["429", "ok"], retry_after=0.4)
+        self.assertEqual(metrics.retries, 1)
+        self.assertGreaterEqual(metrics.backoff_time, 0.4)
+
+    def test_client_errors_are_not_retried(self):
+        with self.assertRaises(errors.ClientError) as caught:
+            self.call(["400"])
+        self.assertEqual(caught.exception.metrics.attempts, 1)
+
+    def test_gives_up_after_max_attempts(self):
+        with self.assertRaises(errors.ServerError) as caught:
+            self.call(["503"] * 3, RetryPolicy(max_attempts=3, base_delay=0.01))
+        self.assertEqual(caught.exception.metrics.attempts, 3)
+        self.assertEqual(caught.exception.server.requests, 3)
+
+    def test_invalid_settings_are_rejected(self):
+        for kwargs in ({"max_attempts": 0}, {"timeout": 0}, {"timeout": float("nan")}, {"base_delay": -1}):
+            with self.subTest(**kwargs), self.assertRaises(ValueError):
+                RetryPolicy(**kwargs)
+        with self.assertRaises(ValueError):
+            ModelCaller(rate=0)
+        for args in (["--max-attempts", "0"], ["--model-timeout", "0"], ["--rpm", "-1"], ["--rpm", "0"]):
+            with self.subTest(args), self.assertRaises(SystemExit), \
+                    contextlib.redirect_stderr(io.StringIO()):
+                main([*args, "hi"])
+
+
+class TestTracer(TempDirTestCase):
+    def tracer(self):
+        tracer = Tracer()
+        t0 = tracer.origin
+        # two overlapping sessions: 0-100 ms and 50-150 ms
+        tracer.add("session", "session", t0, t0 + 0.1)
+        tracer.add("session", "session", t0 + 0.05, t0 + 0.15)
+        tracer.add("model", "model", t0, t0 + 0.03, ttft_ms=10.0, prompt_tokens=100, response_tokens=7)
+        tracer.add("model", "model", t0 + 0.05, t0 + 0.1, ttft_ms=20.0, prompt_tokens=50, response_tokens=3)
+        tracer.add("tool get_file_content", "tool", t0 + 0.03, t0 + 0.045, args_bytes=20, result_bytes=300)
+        return tracer
+
+    def test_summary(self):
+        lines = self.tracer().summary().splitlines()
+        self.assertEqual(lines[-1], "session wall time: 150.0 ms")     # not 200
+        model = lines[2].split()
+        self.assertEqual(model[:7], ["model", "2", "80.0", "40.0", "50.0", "53.3%", "15.0"])
+        self.assertEqual(model[7:], ["150", "10", "0", "0"])
+        tool = lines[3].split()
+        self.assertEqual(tool[:3] + tool[-2:], ["tool", "get_file_content", "1", "20", "300"])
+        self.assertEqual(tool[6], "10.0%")
+
+    def test_chrome_trace_and_jsonl(self):
+        tracer = self.tracer()
+        with tracer.span("tool write_file", "tool") as args:
+            args["result_bytes"] = 5
+        chrome, lines = os.path.join(self.tmp, "t.json"), os.path.join(self.tmp, "t.jsonl")
+        tracer.write(chrome)
+        tracer.write(lines)
+        with open(chrome, encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertEqual(data["displayTimeUnit"], "ms")
+        events = data["traceEvents"]
+        self.assertEqual(len(events), 6)
+        for event in events:
+            self.assertEqual(event["ph"], "X")
+            self.assertEqual(set(event), {"name", "cat", "ph", "ts", "dur", "pid", "tid", "args"})
+        self.assertEqual((events[1]["ts"], events[1]["dur"]), (50000.0, 100000.0))   # µs
+        self.assertEqual(events[-1]["args"], {"result_bytes": 5})
+        with open(lines, encoding="utf-8") as f:
+            self.assertEqual([json.loads(line) for line in f], events)
+
+
+class TestResponseCache(TempDirTestCase):
+    def cache(self, **kwargs):
+        return ResponseCache(os.path.join(self.tmp, "cache"), **kwargs)
+
+    def test_expired_entry_is_a_miss_and_removed(self):
+        cache = self.cache(ttl=60)
+        cache.put("k", text_turn("model", "hi"), None)
+        self.assertEqual(cache.get("k"), (text_turn("model", "hi"), None))
+
+        path = cache._path("k")
+        with open(path, encoding="utf-8") as f:
+            record = json.load(f)
+        record["created"] -= 61
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        self.assertIsNone(cache.get("k"))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_least_recently_used_entries_go_first(self):
+        cache = self.cache()
+        now = time.time()
+        for n, key in enumerate("abc"):
+            cache.put(key, text_turn("model", key * 100), None)
+            os.utime(cache._path(key), (now - 30 + n, now - 30 + n))
+        os.utime(cache._path("a"))              # a hit refreshes the mtime
+        cache.max_bytes = sum(os.path.getsize(cache._path(key)) for key in "ac")
+        cache.evict()
+        self.assertEqual(sorted(os.listdir(cache.directory)), ["a.json", "c.json"])
+
+    def test_over_budget_put_evicts_without_waiting(self):
+        cache = self.cache()
+        cache.put("a", text_turn("model", "a" * 100), None)
+        cache.max_bytes = os.path.getsize(cache._path("a")) + 10
+        cache.put("b", text_turn("model", "b" * 100), None)
+        self.assertEqual(os.listdir(cache.directory), ["b.json"])
+
+    def test_directory_is_not_scanned_on_every_put(self):
+        cache = self.cache()
+        with mock.patch.object(cache, "evict", wraps=cache.evict) as evict:
+            for n in range(2 * EVICT_EVERY):
+                cache.put(str(n), text_turn("model", "x"), None)
+        self.assertEqual(evict.call_count, 2)   # first put, then every EVICT_EVERY
+
+    def test_entry_vanishing_during_a_scan_is_skipped(self):
+        cache = self.cache()
+        cache.put("a", text_turn("model", "a"), None)
+        os.symlink("gone.json", cache._path("dangling"))
+        cache.evict()
+        self.assertTrue(os.path.exists(cache._path("a")))
+
+    def test_no_cache_overrides_the_environment(self):
+        store = SessionStore("abcdef012345", self.tmp)
+        store.append(text_turn("model", "done"))
+        env = dict(os.environ, AGENT_RESPONSE_CACHE="1")
+        main_py = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+        for flag, cached in (["--no-cache"], False), ([], True):
+            with self.subTest(flag):
+                work = tempfile.mkdtemp(dir=self.tmp)
+                proc = subprocess.run(
+                    [sys.executable, main_py, *flag, "--replay", store.path, "hi"],
+                    cwd=work, env=env, capture_output=True, text=True, timeout=60,
+                )
+                self.assertEqual(proc.returncode, 0, proc.stderr)
+                self.assertIn("Final response:\ndone", proc.stdout)
+                self.assertEqual(os.path.isdir(os.path.join(work, ".cache")), cached)
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+class TestBatch(TempDirTestCase):
+    def tasks_file(self, *lines):
+        path = os.path.join(self.tmp, "tasks.jsonl")
+        write(path, "\n".join(lines) + "\n")
+        return path
+
+    def test_load_tasks(self):
+        path = self.tasks_file(
+            '{"prompt": "one"}', "", '{"prompt": "two", "id": "b", "max_iterations": 3}',
+        )
+        self.assertEqual(load_tasks(path, 7), [Task("1", "one", 7), Task("b", "two", 3)])
+
+    def test_load_tasks_rejects_bad_lines(self):
+        for lines, message in [
+            (['{"prompt": "a"}', '{"id": 5}'], ":2: invalid task"),
+            (['{"prompt": "a", "id": 1}', '{"prompt": "b", "id": "1"}'], ":2: duplicate task id"),
+            (["not json"], ":1: invalid task"),
+            (['{"prompt": "a", "max_iterations": 0}'], ":1: max_iterations must be at least 1"),
+        ]:
+            with self.subTest(message), self.assertRaisesRegex(ValueError, message):
+                load_tasks(self.tasks_file(*lines))
+        with self.assertRaisesRegex(ValueError, "max_iterations must be at least 1"):
+            load_tasks(self.tasks_file('{"prompt": "a"}'), 0)
+
+    def test_changed_files(self):
+        source, work = os.path.join(self.tmp, "source"), os.path.join(self.tmp, "work")
+        for root in (source, work):
+            write(os.path.join(root, "same.py"), "same\n")
+            write(os.path.join(root, "pkg", "edited.py"), "before\n" if root == source else "after\n")
+        write(os.path.join(source, "deleted.py"), "")
+        write(os.path.join(work, "pkg", "added.py"), "")
+        write(os.path.join(work, "__pycache__", "x.pyc"), "")
+        write(os.path.join(work, ".test_impact", "index.json"), "{}")
+        write(os.path.join(work, ".code_index", "index.json"), "{}")
+        self.assertEqual(
+            changed_files(source, work),
+            ["deleted.py", os.path.join("pkg", "added.py"), os.path.join("pkg", "edited.py")],
+        )
+
+    def run_batch(self, tasks, turns, **kwargs):
+        source = os.path.join(self.tmp, "project")
+        write(os.path.join(source, "pkg", "mod.py"), "x = 1\n")
+        out = io.StringIO()
+        created = not os.path.exists(SESSION_DIR)
+        with contextlib.redirect_stdout(io.StringIO()):
+            records = asyncio.run(run_batch(ReplayClient(turns), tasks, out, source, **kwargs))
+        if created and os.path.exists(SESSION_DIR):
+            self.addCleanup(os.rmdir, SESSION_DIR)        # runs last: after the files
+        for record in records:
+            self.addCleanup(os.remove, os.path.join(SESSION_DIR, f"{record['session_id']}.jsonl"))
+        return records, [json.loads(line) for line in out.getvalue().splitlines()], source
+
+    def test_result_stream(self):
+        edit = call_turn("write_file", file_path="pkg/new.py", content="y = 2\n")
+        records, streamed, source = self.run_batch(
+            [Task("a", "add new.py"), Task("b", "list", max_iterations=1), Task("c", "?")],
+            [edit, text_turn("model", "added"), call_turn("get_files_info", directory="pkg")],
+            concurrency=1,
+        )
+        self.assertEqual(streamed, records)
+        by_id = {r["id"]: r for r in streamed}
+        self.assertEqual(list(by_id), ["a", "b", "c"])    # one at a time: completion order
+        self.assertEqual(
+            {k: by_id["a"][k] for k in ("status", "final_response", "iterations", "changed_files")},
+            {"status": "ok", "final_response": "added", "iterations": 2,
+             "changed_files": [os.path.join("pkg", "new.py")]},
+        )
+        self.assertEqual((by_id["b"]["status"], by_id["b"]["iterations"]), ("max_iterations", 1))
+        self.assertEqual(by_id["c"]["status"], "error")
+        self.assertIn("exhausted", by_id["c"]["error"])
+        self.assertFalse(any("workdir" in r for r in streamed))
+        self.assertFalse(os.path.exists(os.path.join(source, "pkg", "new.py")))
+
+    def test_removed_copies_leave_the_code_index(self):
+        search = call_turn("search_code", query="x")
+        records, _, _ = self.run_batch(
+            [Task("a", "find x"), Task("b", "find x")],
+            [search, text_turn("model", "found"), search, text_turn("model", "found")],
+            concurrency=1,
+        )
+        self.assertEqual([r["status"] for r in records], ["ok", "ok"])
+        self.assertFalse([r for r in CODE_INDEX._roots if "agent-task-" in r])
+
+    def test_concurrency_must_be_positive(self):
+        with self.assertRaisesRegex(ValueError, "concurrency must be at least 1"):
+            self.run_batch([Task("a", "x")], [], concurrency=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
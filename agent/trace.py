@@ -0,0 +1,105 @@
+# agent/trace.py
+"""
+Per-turn instrumentation for the agent loop.
+
+A `Tracer` collects timed spans: one per model call (latency, time to
+first token, prompt/response tokens) and one per tool call (wall time,
+argument and result bytes), all inside a "session" span.  `write` saves
+them as Chrome trace JSON (`.json`, loadable in chrome://tracing or
+Perfetto) or as one event per line (`.jsonl`), and `summary` renders a
+table of where the time and tokens went.
+"""
+from __future__ import annotations
+import contextlib
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.origin = time.perf_counter()
+        self.events: list[dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, cat: str, start: float, end: float, **args) -> None:
+        """Record a complete span; *start*/*end* are `time.perf_counter()` values."""
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": round((start - self.origin) * 1e6, 1),    # µs, as Chrome expects
+            "dur": round((end - start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    @contextlib.contextmanager
+    def span(self, name: str, cat: str, **args) -> Iterator[dict]:
+        """Time the block; keys added to the yielded dict become span args."""
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.add(name, cat, start, time.perf_counter(), **args)
+
+    def write(self, path: str) -> None:
+        """Chrome trace JSON, or JSON lines when *path* ends in `.jsonl`."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                for event in self.events:
+                    f.write(json.dumps(event) + "\n")
+            else:
+                json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+    def summary(self) -> str:
+        """
+        Table of calls, time and tokens/bytes per span name.  Wall time runs
+        from the first session start to the last session end, so sessions
+        that overlap (batch mode) are not counted twice.
+        """
+        sessions = [e for e in self.events if e["cat"] == "session"]
+        wall = (
+            max(e["ts"] + e["dur"] for e in sessions) - min(e["ts"] for e in sessions)
+            if sessions else 0.0
+        ) or 1.0
+        rows: dict[str, dict] = {}
+        for e in self.events:
+            if e["cat"] == "session":
+                continue
+            row = rows.setdefault(e["name"], {
+                "calls": 0, "total": 0.0, "max": 0.0, "ttft": 0.0,
+                "prompt": 0, "response": 0, "sent": 0, "received": 0,
+            })
+            args = e["args"]
+            row["calls"] += 1
+            row["total"] += e["dur"]
+            row["max"] = max(row["max"], e["dur"])
+            row["ttft"] += args.get("ttft_ms", 0.0)
+            row["prompt"] += args.get("prompt_tokens") or 0
+            row["response"] += args.get("response_tokens") or 0
+            row["sent"] += args.get("args_bytes", 0)
+            row["received"] += args.get("result_bytes", 0)
+
+        header = (
+            f"{'span':<26}{'calls':>6}{'total ms':>11}{'mean ms':>10}{'max ms':>10}"
+            f"{'% wall':>8}{'ttft ms':>9}{'prompt tok':>12}{'resp tok':>10}"
+            f"{'args B':>9}{'result B':>10}"
+        )
+        lines = [header, "-" * len(header)]
+        for name, r in sorted(rows.items(), key=lambda kv: -kv[1]["total"]):
+            lines.append(
+                f"{name:<26}{r['calls']:>6}{r['total'] / 1e3:>11.1f}"
+                f"{r['total'] / r['calls'] / 1e3:>10.1f}{r['max'] / 1e3:>10.1f}"
+                f"{100 * r['total'] / wall:>7.1f}%"
+                f"{r['ttft'] / r['calls']:>9.1f}{r['prompt']:>12}{r['response']:>10}"
+                f"{r['sent']:>9}{r['received']:>10}"
+            )
+        lines.append(f"session wall time: {wall / 1e3:.1f} ms")
+        return "\n".join(lines)
@@ -0,0 +1,195 @@
+# bench.py  (project root)
+"""
+Micro-benchmarks for the agent tools.
+
+    uv run bench.py            # run every benchmark
+    uv run bench.py listing    # run only the named ones
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS = {}
+
+
+def benchmark(fn):
+    BENCHMARKS[fn.__name__.removeprefix("bench_")] = fn
+    return fn
+
+
+def timed(fn, repeat: int) -> float:
+    """Mean seconds per call over *repeat* calls."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def report(title: str, rows: dict[str, float]) -> None:
+    print(f"\n{title}\n" + "-" * len(title))
+    for name, seconds in rows.items():
+        print(f"{name:>28}: {seconds * 1000:10.3f} ms")
+
+
+@benchmark
+def bench_listing(n_files: int = 10_000, repeat: int = 20) -> None:
+    from functions.get_files_info import ListingCache, get_files_info
+
+    def listdir_baseline(root: str) -> str:
+        # the previous implementation: listdir + isdir + getsize per entry
+        lines = []
+        for name in sorted(os.listdir(root)):
+            item = os.path.join(root, name)
+            lines.append(
+                f"- {name}: file_size={os.path.getsize(item)} bytes, "
+                f"is_dir={os.path.isdir(item)}"
+            )
+        return "\n".join(lines)
+
+    with tempfile.TemporaryDirectory() as root:
+        for i in range(n_files):
+            with open(os.path.join(root, f"f{i:05d}.txt"), "w") as f:
+                f.write("x" * (i % 100))
+
+        cache = ListingCache()
+        get_files_info(root, ".", cache=cache)  # warm the cache
+        report(
+            f"get_files_info on {n_files} files",
+            {
+                "listdir + isdir + getsize": timed(lambda: listdir_baseline(root), repeat),
+                "scandir, uncached": timed(lambda: get_files_info(root, "."), repeat),
+                "scandir, cached": timed(lambda: get_files_info(root, ".", cache=cache), repeat),
+            },
+        )
+
+
+@benchmark
+def bench_run_python(runs: int = 30) -> None:
+    from functions.run_python import run_python_file, use_warm_pool
+    from functions.warm_pool import WarmPool
+
+    cases = {
+        "main.py 3 + 5": ("main.py", ["3 + 5"]),
+        "tests.py": ("tests.py", []),
+    }
+    pool = WarmPool(size=1)
+    try:
+        for label, (path, args) in cases.items():
+            use_warm_pool(None)
+            cold = timed(lambda: run_python_file("calculator", path, args), runs)
+            use_warm_pool(pool)
+            run_python_file("calculator", path, args)  # first fork warms the page cache
+            warm = timed(lambda: run_python_file("calculator", path, args), runs)
+            report(
+                f"run_python_file {label}",
+                {
+                    f"cold subprocess ({1 / cold:.1f} runs/s)": cold,
+                    f"warm pool ({1 / warm:.1f} runs/s)": warm,
+                },
+            )
+    finally:
+        use_warm_pool(None)
+        pool.close()
+
+
+@benchmark
+def bench_scenarios(repeat: int = 3) -> None:
+    from agent.scenarios import SCENARIOS, run_scenario
+
+    columns = ("iterations", "tool_calls", "tool_ms", "bytes_sent", "result_bytes", "wall_ms")
+    title = f"replayed bug-fix scenarios (best wall time of {repeat})"
+    header = f"{'scenario':<14}" + "".join(f"{c:>14}" for c in columns) + f"{'fixed':>8}"
+    print(f"\n{title}\n" + "-" * len(title))
+    print(header)
+    for scenario in SCENARIOS:
+        runs = [run_scenario(scenario) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r["wall_ms"])
+        cells = "".join(
+            f"{best[c]:>14.1f}" if isinstance(best[c], float) else f"{best[c]:>14}"
+            for c in columns
+        )
+        print(f"{scenario.name:<14}{cells}{str(all(r['fixed'] for r in runs)):>8}")
+
+
+@benchmark
+def bench_retries() -> None:
+    from agent.fake_server import FakeGeminiServer
+    from agent.loop import ModelCallError
+    from agent.model import ModelCaller, RetryPolicy, make_client
+    from agent.scenarios import SCENARIOS, run_scenario
+
+    scenario = SCENARIOS[0]
+    profiles = {
+        "no faults": {},
+        "429/5xx/reset/drop/stall": {"faults": ["429", "503", "reset", "ok", "500", "drop", "stall"]},
+        "30% random faults": {"failure_rate": 0.3, "seed": 4},
+        "400 (not retried)": {"faults": ["400"]},
+    }
+    title = f"scenario {scenario.name!r} through a real client and a fault-injecting server"
+    print(f"\n{title}\n" + "-" * len(title))
+    print(f"{'profile':<26}{'requests':>9}{'retries':>9}{'failed s':>10}{'backoff s':>11}{'wall ms':>10}  outcome")
+    for label, options in profiles.items():
+        with FakeGeminiServer(scenario.turns(), stall=3.0, **options) as server:
+            caller = ModelCaller(RetryPolicy(base_delay=0.05, timeout=1.0))
+            start = time.perf_counter()
+            try:
+                result = run_scenario(
+                    scenario, client=make_client("fake-key", base_url=server.url), caller=caller
+                )
+                outcome = "fixed" if result["fixed"] else "NOT fixed"
+            except ModelCallError as e:
+                outcome = f"ModelCallError: {str(e)[:40]}"
+            m = caller.metrics
+            print(
+                f"{label:<26}{server.requests:>9}{m.retries:>9}{m.failed_time:>10.2f}"
+                f"{m.backoff_time:>11.2f}{(time.perf_counter() - start) * 1e3:>10.1f}  {outcome}"
+            )
+
+
+def _import_times(argv: list[str]) -> tuple[float, dict[str, int]]:
+    """Wall seconds of `python -X importtime *argv` and self-µs per imported module."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *argv],
+        capture_output=True, text=True, check=True,
+    )
+    wall = time.perf_counter() - start
+    modules = {}
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if line.startswith("import time:") and "|" in line:
+            self_us, _, name = line[len("import time:"):].split("|")
+            if self_us.strip().isdigit():
+                modules[name.strip()] = int(self_us)
+    return wall, modules
+
+
+@benchmark
+def bench_startup(repeat: int = 5) -> None:
+    targets = {
+        "main.py --help": ["main.py", "--help"],
+        "functions.get_files_info": ["-c", "import functions.get_files_info"],
+        "functions.run_python": ["-c", "import functions.run_python"],
+        "functions.dispatcher": ["-c", "import functions.dispatcher"],
+        "agent.loop": ["-c", "import agent.loop"],
+    }
+    title = f"cold start, python -X importtime (best of {repeat})"
+    print(f"\n{title}\n" + "-" * len(title))
+    print(f"{'target':<26}{'wall ms':>10}{'imports ms':>12}{'google.* ms':>13}{'modules':>9}")
+    for label, argv in targets.items():
+        wall, modules = min((_import_times(argv) for _ in range(repeat)), key=lambda r: r[0])
+        google = sum(us for name, us in modules.items() if name.startswith("google"))
+        print(
+            f"{label:<26}{wall * 1e3:>10.1f}{sum(modules.values()) / 1e3:>12.1f}"
+            f"{google / 1e3:>13.1f}{len(modules):>9}"
+        )
+
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        if name not in BENCHMARKS:
+            sys.exit(f"unknown benchmark: {name} (choose from {', '.join(BENCHMARKS)})")
+        BENCHMARKS[name]()
@@ -1,6 +1,132 @@
+import argparse
+import decimal
+import json
+import math
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
 from pkg.calculator import Calculator
-from pkg.render import render
+from pkg.render import format_result, render
+
+# one Calculator per worker process, so its program cache stays warm
+_worker_calculator = None
+
+
+def make_calculator(backend="float", precision=None):
+    context = decimal.Context(prec=precision) if precision else None
+    return Calculator(backend=backend, context=context)
+
+
+def evaluate_line(calculator, expression):
+    try:
+        return expression, calculator.evaluate(expression), None
+    except Exception as e:
+        return expression, None, str(e)
+
+
+def _evaluate_chunk(expressions, backend="float", precision=None):
+    global _worker_calculator
+    if _worker_calculator is None:
+        _worker_calculator = make_calculator(backend, precision)
+    return [evaluate_line(_worker_calculator, e) for e in expressions]
+
+
+def format_record(output_format, expression, result, error):
+    if output_format == "jsonl":
+        if result is not None and not (isinstance(result, float) and math.isfinite(result)):
+            # exact results, and inf/nan (not valid JSON numbers), as strings
+            result = format_result(result)
+        return json.dumps(
+            {"expression": expression, "result": result, "error": error}, allow_nan=False
+        )
+    if error is not None:
+        return f"Error: {error}"
+    if output_format == "box":
+        return render(expression, result)
+    return format_result(result)
+
+
+def _expressions(lines):
+    for line in lines:
+        expression = line.strip()
+        if expression:
+            yield expression
+
+
+def stream(
+    lines,
+    out,
+    output_format="text",
+    workers=1,
+    chunk_size=1000,
+    flush=False,
+    backend="float",
+    precision=None,
+):
+    """
+    Evaluate newline-delimited expressions from `lines` and write one result
+    per expression to `out`, in input order. At most 2 * `workers` chunks of
+    `chunk_size` expressions are in flight, so memory stays bounded.
+    `backend` and `precision` (decimal digits) select the number type.
+    """
+    if workers < 1 or chunk_size < 1:
+        raise ValueError("workers and chunk_size must be at least 1")
+    expressions = _expressions(lines)
+
+    if workers == 1:
+        calculator = make_calculator(backend, precision)
+        for expression in expressions:
+            out.write(format_record(output_format, *evaluate_line(calculator, expression)) + "\n")
+            if flush:
+                out.flush()
+        return
+
+    def write_chunk(records):
+        for record in records:
+            out.write(format_record(output_format, *record) + "\n")
+        if flush:
+            out.flush()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        while True:
+            chunk = list(islice(expressions, chunk_size))
+            if not chunk:
+                break
+            pending.append(pool.submit(_evaluate_chunk, chunk, backend, precision))
+            if len(pending) >= 2 * workers:
+                write_chunk(pending.popleft().result())
+        while pending:
+            write_chunk(pending.popleft().result())
+
+
+def main_stream(argv):
+    parser = argparse.ArgumentParser(
+        prog="main.py --stream",
+        description="Evaluate newline-delimited expressions from a file or stdin.",
+    )
+    parser.add_argument("input", nargs="?", default="-", help='input file, or "-" for stdin')
+    parser.add_argument("--format", choices=["text", "jsonl", "box"], default="text")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--backend", choices=["float", "decimal", "fraction"], default="float")
+    parser.add_argument("--precision", type=int, help="significant digits for --backend decimal")
+    opts = parser.parse_args(argv)
+    if opts.precision is not None and opts.backend != "decimal":
+        parser.error("--precision requires --backend decimal")
+    if opts.workers < 1:
+        parser.error("--workers must be at least 1")
+    if opts.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    numbers = {"backend": opts.backend, "precision": opts.precision}
+
+    if opts.input == "-":
+        stream(sys.stdin, sys.stdout, opts.format, opts.workers, opts.chunk_size, flush=True, **numbers)
+        return
+    with open(opts.input, encoding="utf-8") as f:
+        stream(f, sys.stdout, opts.format, opts.workers, opts.chunk_size, **numbers)
 
 
 def main():
@@ -8,9 +134,15 @@ def main():
     if len(sys.argv) <= 1:
         print("Calculator App")
         print('Usage: python main.py "<expression>"')
+        print("       python main.py --stream [FILE] [--format text|jsonl|box] [--workers N]")
+        print("                      [--backend float|decimal|fraction] [--precision DIGITS]")
         print('Example: python main.py "3 + 5"')
         return
 
+    if sys.argv[1] == "--stream":
+        main_stream(sys.argv[2:])
+        return
+
     expression = " ".join(sys.argv[1:])
     try:
         result = calculator.evaluate(expression)
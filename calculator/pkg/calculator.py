@@ -1,23 +1,336 @@
+import operator
+from array import array
+from collections import OrderedDict
+from decimal import localcontext
+from itertools import repeat
+
+try:
+    import numpy as np
+except ImportError:  # optional ("numpy" extra); batch evaluation falls back
+    np = None        # to array.array columns and a per-row map() loop
+
+from .backends import make_backend
+from .lexer import NEG, tokenize
+
+# Opcodes of a compiled postfix program. OP_PUSH loads the next constant,
+# OP_LOAD the next named variable, OP_NEG negates the top of the stack and
+# every other opcode pops two values and pushes the result.
+OP_PUSH = 0
+OP_ADD = 1
+OP_SUB = 2
+OP_MUL = 3
+OP_DIV = 4
+OP_LOAD = 5
+OP_NEG = 6
+
+OPCODES = {
+    "+": OP_ADD,
+    "-": OP_SUB,
+    "*": OP_MUL,
+    "/": OP_DIV,
+    NEG: OP_NEG,
+}
+
+# unary minus binds tighter than any binary operator
+UNARY_PRECEDENCE = 3
+
+
+COLUMN_OPS = {
+    OP_ADD: operator.add,
+    OP_SUB: operator.sub,
+    OP_MUL: operator.mul,
+    OP_DIV: operator.truediv,
+}
+
+
+class Program:
+    """A compiled expression: a byte array of opcodes, its constants and
+    the variable names it loads."""
+
+    __slots__ = ("code", "consts", "names")
+
+    def __init__(self, code, consts, names=()):
+        self.code = code
+        self.consts = consts
+        self.names = names
+
+    def __len__(self):
+        return len(self.code)
+
+
 class Calculator:
-    def __init__(self):
-        self.operators = {
-            "+": lambda a, b: a + b,
-            "-": lambda a, b: a - b,
-            "*": lambda a, b: a * b,
-            "/": lambda a, b: a / b,
-        }
+    """
+    Evaluates infix expressions in one numeric backend: "float" (the
+    default), "decimal" (rounded to `context`, a decimal.Context) or
+    "fraction" (exact rationals). Numbers are converted from their source
+    text, so 0.1 is exactly one tenth in the decimal and fraction backends.
+    """
+
+    def __init__(self, cache_size=1024, backend="float", context=None):
+        self.backend = make_backend(backend, context)
+        self.operators = self.backend.operators
         self.precedence = {
             "+": 1,
             "-": 1,
             "*": 2,
             "/": 2,
         }
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._batch_cache = OrderedDict()
+        # opcode -> backend function; float runs the inlined _run instead
+        self._ops = {OPCODES[symbol]: fn for symbol, fn in self.operators.items()}
+        self._execute = self._run if self.backend.name == "float" else self._run_ops
 
     def evaluate(self, expression):
         if not expression or expression.isspace():
             return None
-        tokens = expression.strip().split()
-        return self._evaluate_infix(tokens)
+        return self._execute(self.compile(expression))
+
+    def evaluate_batch(self, expression, variables):
+        """
+        Evaluate `expression` once over whole columns of data.
+
+        `variables` maps names used in the expression to equal-length NumPy
+        arrays or array.array buffers. Returns a new NumPy array when NumPy
+        is installed, otherwise a new array.array of doubles; the inputs are
+        never returned or modified.
+
+        Only with NumPy (the optional "numpy" extra) does the per-row work
+        run outside Python; without it each opcode still loops over the rows
+        in map().
+        """
+        if not expression or expression.isspace():
+            return None
+        if self.backend.name != "float":
+            raise ValueError("batch evaluation requires the float backend")
+        program = self.compile(expression, names=True)
+        columns, length = self._bind_columns(program, variables)
+        return self._run_batch(program, columns, length)
+
+    def compile(self, expression, names=False):
+        """
+        Return the postfix Program for `expression`, using the LRU cache.
+        Variable names are only accepted when `names` is true.
+        """
+        cache = self._batch_cache if names else self._cache
+        program = cache.get(expression)
+        if program is not None:
+            cache.move_to_end(expression)
+            return program
+
+        program = self._compile_infix(
+            tokenize(expression, names, self.backend.number)
+        )
+        if self.cache_size > 0:
+            cache[expression] = program
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return program
+
+    def clear_cache(self):
+        self._cache.clear()
+        self._batch_cache.clear()
+
+    def _compile_infix(self, tokens):
+        # Same shunting-yard walk as _evaluate_infix, extended with
+        # parentheses and unary minus. Instead of applying operators it emits
+        # them and tracks the stack depth, so malformed input fails here with
+        # the same errors in the same order.
+        code = array("B")
+        consts = self.backend.consts()
+        loads = []
+        operators = []
+        depth = 0
+        for token in tokens:
+            if token.__class__ is not str:
+                consts.append(token)
+                code.append(OP_PUSH)
+                depth += 1
+            elif token in self.operators:
+                precedence = self.precedence[token]
+                while operators and operators[-1] != "(" and (
+                    self._precedence(operators[-1]) >= precedence
+                ):
+                    depth = self._emit_operator(operators.pop(), depth, code)
+                operators.append(token)
+            elif token == NEG or token == "(":
+                operators.append(token)
+            elif token == ")":
+                while operators and operators[-1] != "(":
+                    depth = self._emit_operator(operators.pop(), depth, code)
+                if not operators:
+                    raise ValueError("unbalanced parentheses")
+                operators.pop()
+            else:
+                loads.append(token)
+                code.append(OP_LOAD)
+                depth += 1
+
+        while operators:
+            operator = operators.pop()
+            if operator == "(":
+                raise ValueError("unbalanced parentheses")
+            depth = self._emit_operator(operator, depth, code)
+
+        if depth != 1:
+            raise ValueError("invalid expression")
+
+        return Program(code, consts, tuple(loads))
+
+    def _precedence(self, operator):
+        if operator == NEG:
+            return UNARY_PRECEDENCE
+        return self.precedence[operator]
+
+    def _emit_operator(self, operator, depth, code):
+        if operator == NEG:
+            if depth < 1:
+                raise ValueError("not enough operands for operator -")
+            code.append(OP_NEG)
+            return depth
+        if depth < 2:
+            raise ValueError(f"not enough operands for operator {operator}")
+        code.append(OPCODES[operator])
+        return depth - 1
+
+    def _run(self, program):
+        consts = program.consts
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        k = 0
+        for op in program.code:
+            if op == OP_PUSH:
+                push(consts[k])
+                k += 1
+                continue
+            if op == OP_NEG:
+                stack[-1] = -stack[-1]
+                continue
+            b = pop()
+            a = pop()
+            if op == OP_ADD:
+                push(a + b)
+            elif op == OP_SUB:
+                push(a - b)
+            elif op == OP_MUL:
+                push(a * b)
+            else:
+                push(a / b)
+        return stack[0]
+
+    def _run_ops(self, program):
+        # _run for the decimal and fraction backends: the same loop, with
+        # every operation dispatched through the backend's table.
+        if self.backend.context is not None:
+            with localcontext(self.backend.context):
+                return self._run_table(program)
+        return self._run_table(program)
+
+    def _run_table(self, program):
+        consts = program.consts
+        ops = self._ops
+        neg = self.backend.neg
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        k = 0
+        for op in program.code:
+            if op == OP_PUSH:
+                push(consts[k])
+                k += 1
+            elif op == OP_NEG:
+                stack[-1] = neg(stack[-1])
+            else:
+                b = pop()
+                stack[-1] = ops[op](stack[-1], b)
+        return stack[0]
+
+    def _bind_columns(self, program, variables):
+        columns = {}
+        length = None
+        for name in program.names:
+            if name in columns:
+                continue
+            if name not in variables:
+                raise ValueError(f"unknown variable: {name}")
+            column = variables[name]
+            if np is not None:
+                column = np.asarray(column, dtype=np.float64)
+                if column.ndim != 1:
+                    raise ValueError(f"variable {name} must be one-dimensional")
+            elif not isinstance(column, array) or column.typecode != "d":
+                column = array("d", column)
+            if length is None:
+                length = len(column)
+            elif len(column) != length:
+                raise ValueError(
+                    f"variable {name} has {len(column)} rows, expected {length}"
+                )
+            columns[name] = column
+        return columns, length
+
+    def _run_batch(self, program, columns, length):
+        # One pass over the opcodes; each opcode handles a whole column, so
+        # the per-row work happens inside NumPy (or map() without NumPy).
+        consts = program.consts
+        names = program.names
+        stack = []
+        k = 0
+        n = 0
+        for op in program.code:
+            if op == OP_PUSH:
+                stack.append(consts[k])
+                k += 1
+            elif op == OP_LOAD:
+                stack.append(columns[names[n]])
+                n += 1
+            elif op == OP_NEG:
+                stack.append(self._column_neg(stack.pop()))
+            else:
+                b = stack.pop()
+                a = stack.pop()
+                stack.append(self._column_op(op, a, b))
+        result = stack[0]
+        if any(result is column for column in columns.values()):
+            # a bare variable: never hand back (or alias) the caller's array
+            result = result.copy() if np is not None else array("d", result)
+        return self._as_column(result, length)
+
+    def _column_op(self, op, a, b):
+        a_scalar = isinstance(a, float)
+        b_scalar = isinstance(b, float)
+        if a_scalar and b_scalar:
+            return COLUMN_OPS[op](a, b)
+        if op == OP_DIV:
+            if b_scalar:
+                has_zero = b == 0.0
+            elif np is not None:
+                has_zero = not b.all()
+            else:
+                has_zero = 0.0 in b
+            if has_zero:
+                raise ZeroDivisionError("float division by zero")
+        if np is not None:
+            return COLUMN_OPS[op](a, b)
+        a_iter = repeat(a) if a_scalar else a
+        b_iter = repeat(b) if b_scalar else b
+        return array("d", map(COLUMN_OPS[op], a_iter, b_iter))
+
+    def _column_neg(self, a):
+        if isinstance(a, float) or np is not None:
+            return -a
+        return array("d", map(operator.neg, a))
+
+    def _as_column(self, value, length):
+        if not isinstance(value, float):
+            return value
+        # expression without variables: broadcast to the row count
+        length = length or 0
+        if np is not None:
+            return np.full(length, value)
+        return array("d", repeat(value, length))
 
     def _evaluate_infix(self, tokens):
         values = []
@@ -33,8 +346,8 @@ class Calculator:
                 operators.append(token)
             else:
                 try:
-                    values.append(float(token))
-                except ValueError:
+                    values.append(self.backend.number(token))
+                except (ValueError, ArithmeticError):
                     raise ValueError(f"invalid token: {token}")
 
         while operators:
@@ -0,0 +1,59 @@
+import re
+
+OPERATORS = frozenset("+-*/")
+NEG = "u-"  # token emitted for a unary minus; never a valid name
+
+_NUMBER = re.compile(r"(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_NAME = re.compile(r"[A-Za-z_]\w*")
+_DIGITS = frozenset("0123456789.")
+
+
+def tokenize(expression, names=False, number=float):
+    """
+    Split `expression` into tokens in one left-to-right pass.
+
+    Numbers come back converted from their text by `number` (float by
+    default; Decimal and Fraction also accept every number the lexer
+    matches), operators and parentheses as one-character
+    strings, a unary minus as NEG and (only when `names` is true) variable
+    names as strings. Whitespace is optional between tokens. Raises
+    ValueError naming the offending character and its position.
+    """
+    tokens = []
+    append = tokens.append
+    # a "-" is unary at the start, after an operator or after "("
+    expect_operand = True
+    pos = 0
+    end = len(expression)
+    while pos < end:
+        ch = expression[pos]
+        if ch in _DIGITS:
+            match = _NUMBER.match(expression, pos)
+            if match is None:
+                raise ValueError(f"invalid token: {ch} at position {pos}")
+            append(number(match.group()))
+            pos = match.end()
+            expect_operand = False
+        elif ch in OPERATORS:
+            append(NEG if expect_operand and ch == "-" else ch)
+            expect_operand = True
+            pos += 1
+        elif ch == "(":
+            append(ch)
+            expect_operand = True
+            pos += 1
+        elif ch == ")":
+            append(ch)
+            expect_operand = False
+            pos += 1
+        elif ch.isspace():
+            pos += 1
+        elif names and (match := _NAME.match(expression, pos)):
+            append(match.group())
+            pos = match.end()
+            expect_operand = False
+        else:
+            token = _NAME.match(expression, pos)
+            token = token.group() if token else ch
+            raise ValueError(f"invalid token: {token} at position {pos}")
+    return tokens
@@ -1,8 +1,18 @@
-def render(expression, result):
+from decimal import Decimal
+
+
+def format_result(result):
     if isinstance(result, float) and result.is_integer():
-        result_str = str(int(result))
-    else:
-        result_str = str(result)
+        return str(int(result))
+    if isinstance(result, Decimal):
+        # fixed point, keeping the scale ("2.50"), never "1E+3"
+        return format(result, "f")
+    # Fraction prints as "7/3", or "3" when whole
+    return str(result)
+
+
+def render(expression, result):
+    result_str = format_result(result)
 
     box_width = max(len(expression), len(result_str)) + 4
     lines = []
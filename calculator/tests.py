@@ -1,5 +1,36 @@
+import contextlib
+import decimal
+import io
+import json
+import os
+import time
 import unittest
-from pkg.calculator import Calculator
+from array import array
+from fractions import Fraction
+from main import main_stream, stream
+from pkg.calculator import Calculator, np
+from pkg.lexer import NEG, tokenize
+from pkg.render import format_result
+
+BENCH = os.environ.get("CALC_BENCH") == "1"
+BENCH_EXPRESSIONS = [
+    "3 + 5",
+    "2 * 3 - 8 / 2 + 5",
+    "1 + 2 * 3 - 4 / 5 + 6 * 7 - 8 / 9 + 10",
+    "100 / 4 * 2 - 7 + 3 * 3 * 3 - 1",
+]
+LONG_EXPRESSION = " + ".join(
+    f"{i}.25 * 3 - {i}.5 / 4" for i in range(1, 41)
+)
+
+
+def _throughput(fn, expressions, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for expression in expressions:
+            fn(expression)
+    elapsed = time.perf_counter() - start
+    return rounds * len(expressions) / elapsed
 
 
 class TestCalculator(unittest.TestCase):
@@ -35,6 +66,346 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.calculator.evaluate("+ 3")
 
+    def test_division_by_zero(self):
+        with self.assertRaises(ZeroDivisionError):
+            self.calculator.evaluate("1 / 0")
+
+    def test_invalid_expression(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("3 5")
+
+
+class TestLexer(unittest.TestCase):
+    def test_unspaced_operators(self):
+        self.assertEqual(tokenize("3+5*2"), [3.0, "+", 5.0, "*", 2.0])
+
+    def test_parentheses_and_unary_minus(self):
+        self.assertEqual(
+            tokenize("-(1 - -2)"),
+            [NEG, "(", 1.0, "-", NEG, 2.0, ")"],
+        )
+
+    def test_scientific_notation(self):
+        self.assertEqual(tokenize("1.5e3*2E-1+.5"), [1500.0, "*", 0.2, "+", 0.5])
+
+    def test_error_position(self):
+        with self.assertRaisesRegex(ValueError, "invalid token: \\$ at position 4"):
+            tokenize("3 + $")
+
+    def test_names_only_when_allowed(self):
+        self.assertEqual(tokenize("x*2", names=True), ["x", "*", 2.0])
+        with self.assertRaisesRegex(ValueError, "invalid token: x at position 0"):
+            tokenize("x*2")
+
+
+class TestUnspacedExpressions(unittest.TestCase):
+    def setUp(self):
+        self.calculator = Calculator()
+
+    def test_unspaced(self):
+        self.assertEqual(self.calculator.evaluate("3+5*2"), 13)
+
+    def test_parentheses(self):
+        self.assertEqual(self.calculator.evaluate("(3 + 5) * 2"), 16)
+        self.assertEqual(self.calculator.evaluate("2*(3-(4-1))"), 0)
+
+    def test_unary_minus(self):
+        self.assertEqual(self.calculator.evaluate("-3 * 2"), -6)
+        self.assertEqual(self.calculator.evaluate("2 - -3"), 5)
+        self.assertEqual(self.calculator.evaluate("-(2 + 3)"), -5)
+
+    def test_scientific_notation(self):
+        self.assertEqual(self.calculator.evaluate("1e3 / 2.5E2"), 4)
+
+    def test_unbalanced_parentheses(self):
+        for expression in ("(3 + 5", "3 + 5)", ")("):
+            with self.assertRaises(ValueError):
+                self.calculator.evaluate(expression)
+
+
+class TestCompiledPrograms(unittest.TestCase):
+    def setUp(self):
+        self.calculator = Calculator(cache_size=2)
+
+    def test_matches_interpreted_path(self):
+        for expression in BENCH_EXPRESSIONS:
+            self.assertEqual(
+                self.calculator.evaluate(expression),
+                self.calculator._evaluate_infix(expression.split()),
+            )
+
+    def test_program_is_cached(self):
+        program = self.calculator.compile("3 * 4 + 5")
+        self.assertIs(self.calculator.compile("3 * 4 + 5"), program)
+
+    def test_cache_is_bounded(self):
+        first = self.calculator.compile("1 + 1")
+        self.calculator.compile("2 + 2")
+        self.calculator.compile("3 + 3")
+        self.assertEqual(len(self.calculator._cache), 2)
+        self.assertIsNot(self.calculator.compile("1 + 1"), first)
+
+    def test_errors_are_not_cached(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("+ 3")
+        self.assertEqual(len(self.calculator._cache), 0)
+
+
+class TestBatchEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.calculator = Calculator()
+
+    def test_array_columns(self):
+        x = array("d", [1, 2, 3])
+        y = array("d", [10, 20, 30])
+        result = self.calculator.evaluate_batch("x * 2 + y", {"x": x, "y": y})
+        self.assertEqual(list(result), [12, 24, 36])
+
+    def test_bare_variable_is_copied(self):
+        x = array("d", [1, 2, 3])
+        result = self.calculator.evaluate_batch("(x)", {"x": x})
+        self.assertIsNot(result, x)
+        result[0] = 99
+        self.assertEqual(list(x), [1, 2, 3])
+
+    def test_variable_named_neg(self):
+        neg = array("d", [1, 2])
+        self.assertEqual(list(self.calculator.evaluate_batch("neg * 2", {"neg": neg})), [2, 4])
+        self.assertEqual(list(self.calculator.evaluate_batch("-neg", {"neg": neg})), [-1, -2])
+
+    def test_precedence_matches_scalar_path(self):
+        x = array("d", [2, 4])
+        result = self.calculator.evaluate_batch("x * 3 - 8 / x + 5", {"x": x})
+        expected = [self.calculator.evaluate(f"{v} * 3 - 8 / {v} + 5") for v in x]
+        self.assertEqual(list(result), expected)
+
+    def test_constant_expression_is_broadcast(self):
+        result = self.calculator.evaluate_batch("3 + 5", {})
+        self.assertEqual(len(result), 0)
+
+    def test_division_by_zero(self):
+        with self.assertRaises(ZeroDivisionError):
+            self.calculator.evaluate_batch("1 / x", {"x": array("d", [1, 0])})
+
+    def test_invalid_token(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate_batch("x $ 3", {"x": array("d", [1])})
+
+    def test_unknown_variable(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate_batch("x + y", {"x": array("d", [1])})
+
+    def test_scalar_path_rejects_names(self):
+        self.calculator.evaluate_batch("x + 1", {"x": array("d", [1])})
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("x + 1")
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_numpy_columns(self):
+        x = np.arange(5, dtype=float)
+        result = self.calculator.evaluate_batch("x * 2 + 1", {"x": x})
+        self.assertTrue((result == x * 2 + 1).all())
+
+
+class TestBackends(unittest.TestCase):
+    def test_decimal_is_exact(self):
+        calculator = Calculator(backend="decimal")
+        result = calculator.evaluate("0.1 + 0.2")
+        self.assertEqual(result, decimal.Decimal("0.3"))
+        self.assertEqual(format_result(result), "0.3")
+
+    def test_decimal_context(self):
+        calculator = Calculator(backend="decimal", context=decimal.Context(prec=5))
+        self.assertEqual(calculator.evaluate("1 / 3"), decimal.Decimal("0.33333"))
+        self.assertEqual(calculator.evaluate("-(2 / 3)"), decimal.Decimal("-0.66667"))
+
+    def test_fraction_is_exact(self):
+        calculator = Calculator(backend="fraction")
+        self.assertEqual(calculator.evaluate("1/3 + 1/3 + 1/3"), 1)
+        self.assertEqual(calculator.evaluate("0.1 * 3"), Fraction(3, 10))
+        self.assertEqual(calculator.evaluate("1.5e-3"), Fraction(3, 2000))
+
+    def test_backends_agree_with_float(self):
+        expressions = ["2 * (3 + 4) - -5", "10 - 2 - 3", "2 + 3 * 4 / 8", "-(1 - 4) * 2"]
+        floats = Calculator()
+        for backend in ("decimal", "fraction"):
+            calculator = Calculator(backend=backend)
+            for expression in expressions:
+                self.assertEqual(
+                    float(calculator.evaluate(expression)),
+                    floats.evaluate(expression),
+                    (backend, expression),
+                )
+
+    def test_division_by_zero(self):
+        for backend in ("float", "decimal", "fraction"):
+            with self.assertRaises(ZeroDivisionError):
+                Calculator(backend=backend).evaluate("1 / (2 - 2)")
+
+    def test_errors_match_float(self):
+        for backend in ("decimal", "fraction"):
+            with self.assertRaisesRegex(ValueError, "invalid token: \\$ at position 2"):
+                Calculator(backend=backend).evaluate("3 $ 5")
+
+    def test_render(self):
+        self.assertEqual(format_result(decimal.Decimal("2.50")), "2.50")
+        self.assertEqual(format_result(decimal.Decimal("1E+3")), "1000")
+        self.assertEqual(format_result(Fraction(7, 3)), "7/3")
+        self.assertEqual(format_result(Fraction(6, 3)), "2")
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            Calculator(backend="complex")
+        with self.assertRaises(ValueError):
+            Calculator(backend="fraction", context=decimal.Context())
+        with self.assertRaises(ValueError):
+            Calculator(backend="decimal").evaluate_batch("x", {"x": [1.0]})
+
+
+class TestStreaming(unittest.TestCase):
+    LINES = ["3 + 5\n", "\n", "10 / 4\n", "$ 3 5\n", "2 * 3 - 8 / 2 + 5\n"]
+
+    def run_stream(self, **kwargs):
+        out = io.StringIO()
+        stream(self.LINES, out, **kwargs)
+        return out.getvalue().splitlines()
+
+    def test_text_output(self):
+        self.assertEqual(
+            self.run_stream(),
+            ["8", "2.5", "Error: invalid token: $ at position 0", "7"],
+        )
+
+    def test_jsonl_output(self):
+        records = [json.loads(line) for line in self.run_stream(output_format="jsonl")]
+        self.assertEqual([r["result"] for r in records], [8, 2.5, None, 7])
+        self.assertEqual(records[2]["error"], "invalid token: $ at position 0")
+
+    def test_jsonl_non_finite_results(self):
+        out = io.StringIO()
+        stream(["1e308 * 10\n", "0 - 1e308 * 10\n"], out, output_format="jsonl")
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([r["result"] for r in records], ["inf", "-inf"])
+
+    def test_workers_keep_input_order(self):
+        self.assertEqual(
+            self.run_stream(workers=2, chunk_size=1),
+            self.run_stream(),
+        )
+
+    def test_workers_and_chunk_size_must_be_positive(self):
+        for kwargs in ({"workers": 0}, {"workers": 2, "chunk_size": 0}, {"chunk_size": -1}):
+            with self.subTest(**kwargs), self.assertRaises(ValueError):
+                self.run_stream(**kwargs)
+        for argv in (["--workers", "0"], ["--workers", "2", "--chunk-size", "0"]):
+            with self.subTest(argv=argv), self.assertRaises(SystemExit), \
+                    contextlib.redirect_stderr(io.StringIO()):
+                main_stream(argv)
+
+    def test_exact_backend_output(self):
+        records = [
+            json.loads(line)
+            for line in self.run_stream(output_format="jsonl", backend="fraction")
+        ]
+        self.assertEqual([r["result"] for r in records], ["8", "5/2", None, "7"])
+        self.assertEqual(
+            self.run_stream(workers=2, chunk_size=1, backend="decimal", precision=3),
+            ["8", "2.5", "Error: invalid token: $ at position 0", "7"],
+        )
+
+
+@unittest.skipUnless(BENCH, "set CALC_BENCH=1 to run benchmarks")
+class BenchmarkCalculator(unittest.TestCase):
+    ROUNDS = 20_000
+
+    def test_compiled_vs_interpreted(self):
+        calculator = Calculator()
+
+        def interpreted(expression):
+            return calculator._evaluate_infix(expression.strip().split())
+
+        def cold(expression):
+            calculator.clear_cache()
+            return calculator.evaluate(expression)
+
+        results = {
+            "interpreted": _throughput(interpreted, BENCH_EXPRESSIONS, self.ROUNDS),
+            "compiled (cold)": _throughput(cold, BENCH_EXPRESSIONS, self.ROUNDS),
+            "compiled (warm)": _throughput(
+                calculator.evaluate, BENCH_EXPRESSIONS, self.ROUNDS
+            ),
+        }
+        print()
+        for name, rate in results.items():
+            print(f"{name:>20}: {rate:12,.0f} expr/s")
+
+    def test_tokenizer_throughput(self):
+        spaced = BENCH_EXPRESSIONS * 10
+        tokens = sum(len(e.split()) for e in spaced)
+        rounds = 2_000
+
+        def split_then_convert(expression):
+            # the old pre-pass: str.split plus float() per operand
+            for token in expression.strip().split():
+                if token not in "+-*/":
+                    float(token)
+
+        results = {
+            "str.split (spaced)": _throughput(split_then_convert, spaced, rounds),
+            "lexer (spaced)": _throughput(tokenize, spaced, rounds),
+            "lexer (unspaced)": _throughput(
+                tokenize, [e.replace(" ", "") for e in spaced], rounds
+            ),
+        }
+        print()
+        for name, rate in results.items():
+            print(f"{name:>20}: {rate * tokens / len(spaced):12,.0f} tokens/s")
+
+    def test_batch_vs_scalar_rows(self):
+        calculator = Calculator()
+        rows = 200_000
+        x = array("d", range(rows))
+        y = array("d", range(rows))
+
+        start = time.perf_counter()
+        for i in range(rows):
+            calculator.evaluate(f"{x[i]} * 2 + {y[i]}")
+        scalar = rows / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        calculator.evaluate_batch("x * 2 + y", {"x": x, "y": y})
+        batch = rows / (time.perf_counter() - start)
+
+        print()
+        print(f"{'scalar rows':>20}: {scalar:12,.0f} rows/s")
+        print(f"{'batch rows':>20}: {batch:12,.0f} rows/s")
+
+    def test_backends(self):
+        # long expressions: 40 terms, 160 operators
+        rounds = 2_000
+        float_calculator = Calculator()
+
+        def float_then_convert(expression):
+            # the old workaround: evaluate in float, convert the result
+            return decimal.Decimal(float_calculator.evaluate(expression))
+
+        results = {
+            "float": _throughput(float_calculator.evaluate, [LONG_EXPRESSION], rounds),
+            "float -> Decimal": _throughput(float_then_convert, [LONG_EXPRESSION], rounds),
+        }
+        for backend in ("decimal", "fraction"):
+            calculator = Calculator(backend=backend)
+            results[backend] = _throughput(calculator.evaluate, [LONG_EXPRESSION], rounds)
+
+            def cold(expression):
+                calculator.clear_cache()
+                return calculator.evaluate(expression)
+
+            results[f"{backend} (cold)"] = _throughput(cold, [LONG_EXPRESSION], rounds // 4)
+        print()
+        for name, rate in results.items():
+            print(f"{name:>20}: {rate:12,.0f} expr/s ({rate / results['float']:.2f}x float)")
+
 
 if __name__ == "__main__":
     unittest.main()
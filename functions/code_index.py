@@ -0,0 +1,238 @@
+# functions/code_index.py
+"""
+Incremental symbol and trigram index for `search_code`.
+
+`CodeIndex` keeps one index per working directory: for every text file
+its (mtime_ns, size), the Python symbols it defines (classes, functions,
+methods, module-level names; found with `ast`) and the set of lowercase
+trigrams in its text.  A posting map trigram -> files narrows a text
+search to the files that can contain the query before any of them is
+read.
+
+Each search first re-stats the tree and re-indexes only files whose
+mtime or size changed (plus any `invalidate`d by a write); the result is
+saved under INDEX_DIR inside the working directory, so a new process (or
+a copy of the project) starts warm.  Stat calls and file reads happen
+outside any lock; a per-directory lock only guards the in-memory maps.
+"""
+from __future__ import annotations
+import ast
+import json
+import os
+import tempfile
+import threading
+from typing import Optional
+
+INDEX_DIR = ".code_index"           # inside the working directory
+MAX_FILE_BYTES = 1 << 20            # larger files are not indexed
+SKIP_DIRS = {"__pycache__", "node_modules"}
+
+
+def trigrams(text: str) -> set[str]:
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def python_symbols(source: str) -> list[tuple[str, str, int]]:
+    """(qualname, kind, line) for each definition in *source*."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+    found: list[tuple[str, str, int]] = []
+
+    def visit(body: list[ast.stmt], prefix: str, in_class: bool) -> None:
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                found.append((prefix + node.name, "class", node.lineno))
+                visit(node.body, f"{prefix}{node.name}.", True)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                found.append((prefix + node.name, "method" if in_class else "function", node.lineno))
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)) and not prefix:
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        found.append((target.id, "variable", node.lineno))
+
+    visit(tree.body, "", False)
+    return found
+
+
+class _RootIndex:
+    def __init__(self, root: str, path: str) -> None:
+        self.root = root
+        self.path = path
+        self.lock = threading.Lock()
+        # rel path -> {"mtime_ns", "size", "text", "symbols", "trigrams"}
+        self.files: dict[str, dict] = {}
+        self.postings: dict[str, set[str]] = {}
+        self.dirty: set[str] = set()
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.files = json.load(f)["files"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass                                # missing or corrupt: start over
+        for rel, entry in self.files.items():
+            self._post(rel, entry["trigrams"])
+
+    def _post(self, rel: str, grams) -> None:
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(rel)
+
+    def _unpost(self, rel: str) -> None:
+        for gram in self.files[rel]["trigrams"]:
+            files = self.postings.get(gram)
+            if files is not None:
+                files.discard(rel)
+                if not files:
+                    del self.postings[gram]
+
+    def _scan(self) -> dict[str, os.stat_result]:
+        found: dict[str, os.stat_result] = {}
+        stack = [self.root]
+        while stack:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in SKIP_DIRS:
+                            stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        found[os.path.relpath(entry.path, self.root)] = entry.stat()
+        return found
+
+    def refresh(self) -> int:
+        """Re-index new, changed and invalidated files; returns how many changed."""
+        current = self._scan()
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            gone = [rel for rel in self.files if rel not in current]
+            stale = [
+                (rel, st) for rel, st in current.items()
+                if rel in dirty
+                or (entry := self.files.get(rel)) is None
+                or entry["mtime_ns"] != st.st_mtime_ns
+                or entry["size"] != st.st_size
+            ]
+        if not gone and not stale:
+            return 0
+
+        fresh = {rel: self._index_file(rel, st) for rel, st in stale}
+        with self.lock:
+            for rel in gone:
+                if rel in self.files:
+                    self._unpost(rel)
+                    del self.files[rel]
+            for rel, entry in fresh.items():
+                if rel in self.files:
+                    self._unpost(rel)
+                self.files[rel] = entry
+                self._post(rel, entry["trigrams"])
+            data = json.dumps({"files": self.files})
+        self._save(data)
+        return len(gone) + len(fresh)
+
+    def _index_file(self, rel: str, st: os.stat_result) -> dict:
+        entry = {
+            "mtime_ns": st.st_mtime_ns, "size": st.st_size,
+            "text": False, "symbols": [], "trigrams": [],
+        }
+        if st.st_size > MAX_FILE_BYTES:
+            return entry
+        text = read_text(os.path.join(self.root, rel))
+        if text is None:
+            return entry
+        entry["text"] = True
+        entry["trigrams"] = sorted(trigrams(text))
+        if rel.endswith(".py"):
+            entry["symbols"] = python_symbols(text)
+        return entry
+
+    def candidates(self, query: str) -> list[str]:
+        """Files whose trigrams include every trigram of *query*."""
+        grams = trigrams(query)
+        if not grams:
+            return self.text_files()
+        with self.lock:
+            sets = sorted((self.postings.get(g, set()) for g in grams), key=len)
+            result = set(sets[0])
+            for s in sets[1:]:
+                result &= s
+                if not result:
+                    break
+        return sorted(result)
+
+    def text_files(self) -> list[str]:
+        with self.lock:
+            return sorted(r for r, e in self.files.items() if e["text"])
+
+    def symbols(self) -> list[tuple[str, list]]:
+        """(rel path, symbols) per indexed file, sorted by path."""
+        with self.lock:
+            return sorted((r, e["symbols"]) for r, e in self.files.items())
+
+    def _save(self, data: str) -> None:
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def read_text(path: str) -> Optional[str]:
+    """UTF-8 text of *path*, or None for binary/undecodable files."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if b"\0" in data[:8192]:
+        return None
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+class CodeIndex:
+    """Per-working-directory indexes, shared by every session in the process."""
+
+    def __init__(self, directory: str = INDEX_DIR) -> None:
+        self.directory = directory              # relative to each root
+        self._roots: dict[str, _RootIndex] = {}
+        self._lock = threading.Lock()           # guards _roots only
+
+    def refreshed(self, root: str) -> _RootIndex:
+        """The index of *root*, brought up to date with the files on disk."""
+        root = os.path.abspath(root)
+        with self._lock:
+            index = self._roots.get(root)
+        if index is None:
+            loaded = _RootIndex(root, os.path.join(root, self.directory, "index.json"))
+            with self._lock:
+                index = self._roots.setdefault(root, loaded)
+        index.refresh()
+        return index
+
+    def invalidate(self, path: str) -> None:
+        """Re-index *path* on the next search even if its mtime looks unchanged."""
+        path = os.path.abspath(path)
+        with self._lock:
+            roots = list(self._roots.items())
+        for root, index in roots:
+            if path.startswith(root + os.sep):
+                with index.lock:
+                    index.dirty.add(os.path.relpath(path, root))
+
+    def forget(self, directory: str) -> None:
+        """Drop the in-memory indexes of *directory* and everything under it."""
+        directory = os.path.abspath(directory)
+        with self._lock:
+            for root in [r for r in self._roots if r == directory or r.startswith(directory + os.sep)]:
+                del self._roots[root]
@@ -1,23 +1,85 @@
 # functions/dispatcher.py
 from __future__ import annotations
+import asyncio
+import contextlib
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
 from google.genai import types
 
-from functions.get_files_info   import get_files_info
+from functions.get_files_info   import ListingCache, get_files_info
 from functions.get_file_content import get_file_content
 from functions.write_file       import write_file
-from functions.run_python       import run_python_file
+from functions.patch_file       import patch_file
+from functions.run_python       import run_python_file, run_python_file_async
+from functions.run_tests        import run_tests
+from functions.search_code      import search_code
+from functions.code_index       import CodeIndex
+from functions.read_cache       import ContentCache, ReadLog, read_file_cached
 
-WORKING_DIR = "calculator"  # locked per assignment
+if TYPE_CHECKING:
+    from agent.trace import Tracer
+
+WORKING_DIR = "calculator"  # locked per assignment; `workdir=` points a session at a copy
+
+# Decoded file contents shared by every session in the process.
+CONTENT_CACHE = ContentCache()
+
+# Symbol/trigram index behind search_code, refreshed incrementally.
+CODE_INDEX = CodeIndex()
+
+RANGE_ARGS = ("offset", "length", "start_line", "end_line")
 
 # Map tool name ➜ real Python function
 FUNC_MAP = {
     "get_files_info":   get_files_info,
     "get_file_content": get_file_content,
     "write_file":       write_file,
+    "patch_file":       patch_file,
     "run_python_file":  run_python_file,
+    "run_tests":        run_tests,
+    "search_code":      search_code,
 }
 
+# Tools with a native coroutine version; the rest run in a worker thread
+# when called through call_functions_async.
+ASYNC_FUNC_MAP = {
+    "run_python_file":  run_python_file_async,
+}
+
+# Tools that modify a single file given by `file_path`.
+WRITE_TOOLS = {"write_file", "patch_file"}
+
+# Tools without side effects; consecutive calls to these run concurrently.
+READ_ONLY = {"get_files_info", "get_file_content", "search_code"}
+MAX_WORKERS = 8
+
+
+def _invalidate(fn_name: str, fn_args: dict, listings: ListingCache | None) -> None:
+    """Drop cached state that a side-effecting tool may have made stale."""
+    if fn_name in WRITE_TOOLS and fn_args.get("file_path"):
+        target = os.path.join(fn_args["working_directory"], fn_args["file_path"])
+        if listings is not None:
+            listings.invalidate(os.path.dirname(target))
+        CONTENT_CACHE.invalidate(target)
+        CODE_INDEX.invalidate(target)
+    elif fn_name in ("run_python_file", "run_tests") and listings is not None:
+        # a script may touch any file; sizes would go stale unnoticed
+        listings.invalidate()
+
+
+def _span(tracer: Tracer | None, fn_name: str, fn_args: dict):
+    """Time one tool call; the caller adds "result_bytes" to the yielded dict."""
+    if tracer is None:
+        return contextlib.nullcontext({})
+    sent = {k: v for k, v in fn_args.items() if k != "working_directory"}
+    return tracer.span(fn_name, "tool", args_bytes=_payload_bytes(sent))
+
+
+def _payload_bytes(value) -> int:
+    return len(json.dumps(value, default=str).encode())
+
 
 def _log(fn_name: str, fn_args: dict, verbose: bool) -> None:
     if verbose:
@@ -26,55 +88,211 @@ def _log(fn_name: str, fn_args: dict, verbose: bool) -> None:
         print(f" - Calling function: {fn_name}")
 
 
-def call_function(function_call_part: types.FunctionCall, *, verbose: bool = False) -> types.Content:
+def call_function(
+    function_call_part: types.FunctionCall,
+    *,
+    verbose: bool = False,
+    reads: ReadLog | None = None,
+    tracer: Tracer | None = None,
+    workdir: str | None = None,
+    listings: ListingCache | None = None,
+) -> types.Content:
     """
     Execute the tool requested by the LLM and wrap the result in a
     FunctionResponse content object so Gemini can use it in the next turn.
+    With a *tracer*, the call's wall time and payload bytes are recorded.
+    *workdir* replaces WORKING_DIR, e.g. with a private copy of it, and
+    a session's *listings* cache reuses directory listings between calls.
     """
+    return types.Content(
+        role="tool",
+        parts=[_execute(function_call_part, verbose, reads, tracer, workdir, listings)],
+    )
+
+
+def call_functions(
+    function_calls: list[types.FunctionCall],
+    *,
+    verbose: bool = False,
+    reads: ReadLog | None = None,
+    tracer: Tracer | None = None,
+    workdir: str | None = None,
+    listings: ListingCache | None = None,
+) -> types.Content:
+    """
+    Execute every tool call from one model response and return all results
+    in a single tool Content, in call order.
+
+    Runs of consecutive read-only calls execute concurrently in a thread
+    pool; any other call (writes, run_python_file) waits for the calls
+    before it and runs on its own, so side effects keep their order.
+
+    With a session's *reads* log, re-reading a file the model has already
+    seen unchanged returns a short "unchanged since turn N" note instead
+    of the full text.
+    """
+    parts: list[types.Part] = []
+    batch: list[types.FunctionCall] = []
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        def flush() -> None:
+            if len(batch) == 1:
+                parts.append(_execute(batch[0], verbose, reads, tracer, workdir, listings))
+            elif batch:
+                parts.extend(pool.map(
+                    lambda fc: _execute(fc, verbose, reads, tracer, workdir, listings), batch
+                ))
+            batch.clear()
+
+        for fc in function_calls:
+            if fc.name in READ_ONLY:
+                batch.append(fc)
+                continue
+            flush()
+            parts.append(_execute(fc, verbose, reads, tracer, workdir, listings))
+        flush()
+
+    return types.Content(role="tool", parts=parts)
+
+
+async def call_functions_async(
+    function_calls: list[types.FunctionCall],
+    *,
+    verbose: bool = False,
+    reads: ReadLog | None = None,
+    tracer: Tracer | None = None,
+    workdir: str | None = None,
+    listings: ListingCache | None = None,
+) -> types.Content:
+    """
+    asyncio counterpart of `call_functions`, with the same ordering rules.
+    Tools without a coroutine version run via `asyncio.to_thread`, so the
+    event loop is never blocked.
+    """
+    parts: list[types.Part] = []
+    batch: list[types.FunctionCall] = []
+
+    async def flush() -> None:
+        if batch:
+            parts.extend(await asyncio.gather(
+                *(_execute_async(fc, verbose, reads, tracer, workdir, listings) for fc in batch)
+            ))
+            batch.clear()
+
+    for fc in function_calls:
+        if fc.name in READ_ONLY:
+            batch.append(fc)
+            continue
+        await flush()
+        parts.append(await _execute_async(fc, verbose, reads, tracer, workdir, listings))
+    await flush()
+
+    return types.Content(role="tool", parts=parts)
+
+
+async def _execute_async(
+    function_call_part: types.FunctionCall,
+    verbose: bool,
+    reads: ReadLog | None,
+    tracer: Tracer | None = None,
+    workdir: str | None = None,
+    listings: ListingCache | None = None,
+) -> types.Part:
+    fn_name: str = function_call_part.name
+    if fn_name not in ASYNC_FUNC_MAP:
+        return await asyncio.to_thread(
+            _execute, function_call_part, verbose, reads, tracer, workdir, listings
+        )
+
+    fn_args: dict = dict(function_call_part.args or {})
+    fn_args["working_directory"] = workdir or WORKING_DIR
+    _log(fn_name, {k: v for k, v in fn_args.items() if k != "working_directory"}, verbose)
+
+    with _span(tracer, fn_name, fn_args) as span:
+        try:
+            result = await ASYNC_FUNC_MAP[fn_name](**fn_args)
+        except Exception as exc:
+            result = f"Error: {exc}"
+        _invalidate(fn_name, fn_args, listings)
+        span["result_bytes"] = _payload_bytes(result)
+
+    return types.Part.from_function_response(
+        name=fn_name,
+        response={"result": result},
+    )
+
+
+def _read_file(fn_args: dict, reads: ReadLog | None) -> str:
+    """Whole-file get_file_content through the content cache."""
+    text, sha = read_file_cached(CONTENT_CACHE, fn_args["working_directory"], fn_args["file_path"])
+    if sha is None or reads is None:
+        return text
+    turn = reads.seen(fn_args["file_path"], sha)
+    if turn is not None:
+        return (
+            f'"{fn_args["file_path"]}" unchanged since turn {turn} (sha={sha}); '
+            "reuse the content you already have."
+        )
+    reads.record(fn_args["file_path"], sha)
+    return text
+
+
+def _execute(
+    function_call_part: types.FunctionCall,
+    verbose: bool,
+    reads: ReadLog | None = None,
+    tracer: Tracer | None = None,
+    workdir: str | None = None,
+    listings: ListingCache | None = None,
+) -> types.Part:
     fn_name: str = function_call_part.name
     fn_args: dict = dict(function_call_part.args or {})
 
     # guard-rail on name
     if fn_name not in FUNC_MAP:
-        return types.Content(
-            role="tool",
-            parts=[
-                types.Part.from_function_response(
-                    name=fn_name,
-                    response={"error": f"Unknown function: {fn_name}"},
-                )
-            ],
+        return types.Part.from_function_response(
+            name=fn_name,
+            response={"error": f"Unknown function: {fn_name}"},
         )
 
     # inject working_directory
-    fn_args["working_directory"] = WORKING_DIR
-
-    # ── Auto list directory before reading a file ─────────────────
-    if fn_name == "get_file_content":
-        dir_to_list = os.path.dirname(fn_args["file_path"]) or "."
-        _log("get_files_info", {"directory": dir_to_list}, verbose)
-        pre_list_result = FUNC_MAP["get_files_info"](
-            working_directory=WORKING_DIR,
-            directory=dir_to_list,
-        )
-        if verbose:
-            print("->", pre_list_result)
+    fn_args["working_directory"] = workdir or WORKING_DIR
 
-    # ── Run the requested function ────────────────────────────────
-    _log(fn_name, {k: v for k, v in fn_args.items() if k != "working_directory"}, verbose)
+    # the span covers the automatic pre-listing too
+    with _span(tracer, fn_name, fn_args) as span:
+        # ── Auto list directory before reading a file ─────────────
+        if fn_name == "get_file_content":
+            dir_to_list = os.path.dirname(fn_args["file_path"]) or "."
+            _log("get_files_info", {"directory": dir_to_list}, verbose)
+            pre_list_result = FUNC_MAP["get_files_info"](
+                working_directory=fn_args["working_directory"],
+                directory=dir_to_list,
+                cache=listings,
+            )
+            if verbose:
+                print("->", pre_list_result)
+
+        # ── Run the requested function ────────────────────────────
+        _log(fn_name, {k: v for k, v in fn_args.items() if k != "working_directory"}, verbose)
 
-    try:
-        result = FUNC_MAP[fn_name](**fn_args)
-    except Exception as exc:
-        result = f"Error: {exc}"
+        try:
+            if fn_name == "get_files_info":
+                result = FUNC_MAP[fn_name](**fn_args, cache=listings)
+            elif fn_name == "search_code":
+                result = FUNC_MAP[fn_name](**fn_args, index=CODE_INDEX)
+            elif fn_name == "get_file_content" and not any(
+                fn_args.get(k) is not None for k in RANGE_ARGS
+            ):
+                result = _read_file(fn_args, reads)
+            else:
+                result = FUNC_MAP[fn_name](**fn_args)
+        except Exception as exc:
+            result = f"Error: {exc}"
+        _invalidate(fn_name, fn_args, listings)
+        span["result_bytes"] = _payload_bytes(result)
 
     # wrap result for Gemini
-    return types.Content(
-        role="tool",
-        parts=[
-            types.Part.from_function_response(
-                name=fn_name,
-                response={"result": result},
-            )
-        ],
+    return types.Part.from_function_response(
+        name=fn_name,
+        response={"result": result},
     )
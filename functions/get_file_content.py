@@ -1,15 +1,109 @@
 # functions/get_file_content.py
 from __future__ import annotations
+import contextlib
+import mmap
 import os
+import threading
+from collections import OrderedDict
 from .config import MAX_CHARS
+from .schema import lazy_schema
 
+MMAP_THRESHOLD = 1 << 20   # files at least this big are memory-mapped
+COUNT_CHUNK = 1 << 20      # bytes scanned per step when counting lines
+MAX_COUNTS = 256           # file versions whose line count is remembered
 
-def get_file_content(working_directory: str, file_path: str) -> str:
+# (path, mtime_ns, size) -> line count, so paging through a file scans it
+# for newlines once rather than on every ranged read
+_line_counts: OrderedDict[tuple[str, int, int], int] = OrderedDict()
+_counts_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _open_buffer(path: str):
+    """Yield the file's bytes; large files are mmap-ed instead of read."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            yield f.read()
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def _count_lines(buf) -> int:
+    size = len(buf)
+    if size == 0:
+        return 0
+    newlines = sum(
+        buf[i:i + COUNT_CHUNK].count(b"\n") for i in range(0, size, COUNT_CHUNK)
+    )
+    return newlines + (buf[size - 1:size] != b"\n")
+
+
+def _cached_line_count(path: str, buf) -> int:
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    with _counts_lock:
+        if key in _line_counts:
+            _line_counts.move_to_end(key)
+            return _line_counts[key]
+    total = _count_lines(buf)
+    if len(buf) == st.st_size:              # file unchanged while we counted
+        with _counts_lock:
+            _line_counts[key] = total
+            if len(_line_counts) > MAX_COUNTS:
+                _line_counts.popitem(last=False)
+    return total
+
+
+def _char_start(buf, pos: int) -> int:
+    """*pos* moved forward past UTF-8 continuation bytes (0b10xxxxxx)."""
+    end = min(len(buf), pos + 3)
+    while pos < end and buf[pos] & 0xC0 == 0x80:
+        pos += 1
+    return pos
+
+
+def _line_offset(buf, line: int) -> int:
+    """Byte offset where 1-based *line* starts (len(buf) past the end)."""
+    remaining = line - 1
+    pos = 0
+    # skip whole chunks with a C-level count, then walk the last one
+    while remaining:
+        chunk_newlines = buf[pos:pos + COUNT_CHUNK].count(b"\n")
+        if chunk_newlines >= remaining or pos + COUNT_CHUNK >= len(buf):
+            break
+        remaining -= chunk_newlines
+        pos += COUNT_CHUNK
+    for _ in range(remaining):
+        pos = buf.find(b"\n", pos)
+        if pos == -1:
+            return len(buf)
+        pos += 1
+    return pos
+
+
+def get_file_content(
+    working_directory: str,
+    file_path: str,
+    offset: int | None = None,
+    length: int | None = None,
+    start_line: int | None = None,
+    end_line: int | None = None,
+) -> str:
     """
     Safely read a file inside `working_directory`.
 
+    With no range arguments the file is read from the start.  A byte range
+    (*offset*/*length*) or a 1-based inclusive line range
+    (*start_line*/*end_line*) reads only that slice; large files are
+    memory-mapped so nothing before the slice is decoded.  Every slice is
+    capped at MAX_CHARS bytes, and byte slices are moved to UTF-8 character
+    boundaries.  A start past the end of the file is an error.
+
     Returns either:
-      * the file's text (possibly truncated to MAX_CHARS), or
+      * the file's text (possibly truncated to MAX_CHARS), with a header
+        giving file size and line count for ranged reads, or
       * an error string starting with "Error:".
     """
     try:
@@ -27,32 +121,110 @@ def get_file_content(working_directory: str, file_path: str) -> str:
         if not os.path.isfile(target_abs):
             return f'Error: File not found or is not a regular file: "{file_path}"'
 
-        with open(target_abs, "r", encoding="utf-8", errors="replace") as f:
-            data = f.read(MAX_CHARS + 1)
+        ranged = any(v is not None for v in (offset, length, start_line, end_line))
+        if not ranged:
+            with open(target_abs, "r", encoding="utf-8", errors="replace") as f:
+                data = f.read(MAX_CHARS + 1)
 
-        if len(data) > MAX_CHARS:
-            data = (
-                data[:MAX_CHARS]
-                + f'\n[...File "{file_path}" truncated at {MAX_CHARS} characters]'
-            )
+            if len(data) > MAX_CHARS:
+                with _open_buffer(target_abs) as buf:
+                    size, total = len(buf), _cached_line_count(target_abs, buf)
+                data = (
+                    data[:MAX_CHARS]
+                    + f'\n[...File "{file_path}" truncated at {MAX_CHARS} characters; '
+                    f"{size} bytes, {total} lines in total. Pass start_line/end_line "
+                    "or offset/length to read further]"
+                )
+
+            return data
+
+        with _open_buffer(target_abs) as buf:
+            size, total = len(buf), _cached_line_count(target_abs, buf)
+
+            if start_line is not None or end_line is not None:
+                first = int(start_line or 1)
+                last = int(end_line) if end_line is not None else total
+                if first > total:
+                    return (
+                        f"Error: start_line {first} is past the end of "
+                        f'"{file_path}" ({total} lines)'
+                    )
+                if first < 1 or last < first:
+                    return f"Error: invalid line range {first}-{last}"
+                start = _line_offset(buf, first)
+                end = _line_offset(buf, last + 1)
+                shown = f"lines {first}-{min(last, total)}"
+            else:
+                start = int(offset or 0)
+                if start < 0 or (length is not None and int(length) < 0):
+                    return "Error: offset and length must not be negative"
+                if start > size:
+                    return (
+                        f'Error: offset {start} is past the end of "{file_path}" '
+                        f"({size} bytes)"
+                    )
+                start = _char_start(buf, start)    # never begin mid-character
+                end = min(size, start + int(length)) if length is not None else size
+                end = max(start, end)
+                shown = None
 
-        return data
+            truncated = end - start > MAX_CHARS
+            if truncated:
+                end = start + MAX_CHARS
+            if end < size and buf[end] & 0xC0 == 0x80:
+                if truncated:                       # stay under the cap
+                    while end > start and buf[end] & 0xC0 == 0x80:
+                        end -= 1
+                else:                               # finish the last character
+                    end = _char_start(buf, end)
+            shown = shown or f"bytes {start}-{end}"
+            data = buf[start:end].decode("utf-8", errors="replace")
+
+        header = f'[File "{file_path}": {size} bytes, {total} lines; showing {shown}]'
+        if truncated:
+            data += (
+                f"\n[...truncated at {MAX_CHARS} bytes; continue with offset={end}]"
+            )
+        return header + "\n" + data
 
     except Exception as exc:  # catch any unexpected issues
         return f"Error: {exc}"
 
-from google.genai import types
-
-schema_get_file_content = types.FunctionDeclaration(
-    name="get_file_content",
-    description="Reads the contents of a file (truncated to 10 000 chars).",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="Path to the file (relative to working directory).",
-            ),
-        },
-    ),
-)
+
+def _schema(types):
+    return types.FunctionDeclaration(
+        name="get_file_content",
+        description=(
+            "Reads the contents of a file (truncated to 10 000 chars). Pass a line "
+            "range or a byte range to page through larger files; ranged reads "
+            "report the file's size and line count."
+        ),
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(
+                    type=types.Type.STRING,
+                    description="Path to the file (relative to working directory).",
+                ),
+                "start_line": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="First line to read, 1-based.",
+                ),
+                "end_line": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Last line to read, inclusive. Defaults to the end of the file.",
+                ),
+                "offset": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Byte offset to start reading at (ignored when a line range is given).",
+                ),
+                "length": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Number of bytes to read from offset.",
+                ),
+            },
+        ),
+    )
+
+
+__getattr__ = lazy_schema(globals(), "schema_get_file_content", _schema)
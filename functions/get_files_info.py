@@ -1,14 +1,154 @@
 """
 Return a one-line-per-entry listing for any directory *inside* a permitted
-working directory.  All errors are returned as strings that start with
-"Error:" so the LLM can read them and try again.
+working directory, or a compact indented tree of it.  All errors are
+returned as strings that start with "Error:" so the LLM can read them and
+try again.
 """
 from __future__ import annotations
+import fnmatch
 import os
-from typing import Optional
-from google.genai import types
+import stat
+import threading
+from collections.abc import Iterator
+from typing import Optional, Union
+from functions.schema import lazy_schema
 
-def get_files_info(working_directory: str, directory: Optional[str] = None) -> str:
+MAX_ENTRIES = 200  # lines in a tree listing
+
+# State the tools keep inside the working directory; never listed.
+TOOL_STATE_DIRS = {".test_impact", ".code_index"}
+
+# Never descended into by a tree listing (nor shown).
+PRUNE_DIRS = {
+    ".git", ".hg", ".svn", "__pycache__", ".venv", "venv", "node_modules",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox", ".nox",
+    ".sessions", ".cache",
+} | TOOL_STATE_DIRS
+
+
+class ListingCache:
+    """
+    Formatted listings keyed by absolute directory path.  An entry is only
+    served while the directory's mtime is unchanged; callers that modify
+    files inside a directory (which does not always bump its mtime) must
+    call `invalidate`.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, tuple[int, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str, mtime_ns: int) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry[0] == mtime_ns:
+            return entry[1]
+        return None
+
+    def put(self, path: str, mtime_ns: int, listing: str) -> None:
+        with self._lock:
+            self._entries[path] = (mtime_ns, listing)
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Drop the entry for *path*, or every entry when *path* is None."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+
+def _globs(patterns: Union[str, list[str], None]) -> list[str]:
+    if not patterns:
+        return []
+    return [patterns] if isinstance(patterns, str) else list(patterns)
+
+
+def _matches(name: str, rel: str, patterns: list[str]) -> bool:
+    """Patterns with a "/" match the relative path, the rest the bare name."""
+    return any(
+        fnmatch.fnmatchcase(rel if "/" in p else name, p) for p in patterns
+    )
+
+
+def _walk(
+    path: str, rel: str, depth: int, max_depth: Optional[int], exclude: list[str]
+) -> Iterator[tuple[int, str, os.DirEntry, bool]]:
+    """
+    (depth, relative path, entry, is_dir) depth-first in name order.
+    Excluded and PRUNE_DIRS directories are skipped without being opened,
+    and nothing is read past the point where the caller stops iterating.
+    """
+    try:
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except OSError:
+        return  # unreadable subdirectory: list it, but not its contents
+    for e in entries:
+        child = rel + e.name
+        is_dir = e.is_dir(follow_symlinks=False)  # never leave the tree via a link
+        if (is_dir and e.name in PRUNE_DIRS) or _matches(e.name, child, exclude):
+            continue
+        yield depth, child, e, is_dir
+        if is_dir and (max_depth is None or depth + 1 < max_depth):
+            yield from _walk(e.path, child + "/", depth + 1, max_depth, exclude)
+
+
+def _tree(
+    root: str,
+    max_depth: Optional[int],
+    include: list[str],
+    exclude: list[str],
+    max_entries: int,
+) -> str:
+    """
+    Indented "name size" lines, directories ending in "/".  With *include*
+    only matching files are listed, plus the directories leading to them.
+    """
+    lines: list[str] = []
+    pending: list[tuple[int, str]] = []  # directories shown once a file under them matches
+    truncated = False
+    for depth, rel, e, is_dir in _walk(root, "", 0, max_depth, exclude):
+        indent = "  " * depth
+        if is_dir:
+            line = f"{indent}{e.name}/"
+            if include:
+                pending = [p for p in pending if p[0] < depth]
+                pending.append((depth, line))
+                continue
+            new = [line]
+        else:
+            if include and not _matches(e.name, rel, include):
+                continue
+            # the directories leading to a match count against max_entries too
+            new = [p[1] for p in pending if p[0] < depth]
+            new.append(f"{indent}{e.name} {e.stat(follow_symlinks=False).st_size}")
+            pending.clear()
+        if len(lines) + len(new) > max_entries:
+            truncated = True
+            break
+        lines.extend(new)
+
+    if not lines and not truncated:
+        return "(no matching entries)" if include or exclude else "(empty directory)"
+    if truncated:
+        lines.append(
+            f"... stopped after {max_entries} entries; narrow `directory`, "
+            "lower `max_depth` or use `include`/`exclude`"
+        )
+    return "\n".join(lines)
+
+
+def get_files_info(
+    working_directory: str,
+    directory: Optional[str] = None,
+    cache: Optional[ListingCache] = None,
+    recursive: bool = False,
+    max_depth: Optional[int] = None,
+    include: Union[str, list[str], None] = None,
+    exclude: Union[str, list[str], None] = None,
+    max_entries: int = MAX_ENTRIES,
+) -> str:
     """
     Parameters
     ----------
@@ -17,6 +157,17 @@ def get_files_info(working_directory: str, directory: Optional[str] = None) -> s
     directory : Optional[str]
         A *relative* path inside `working_directory` whose contents will be
         listed.  `None` or "." means the working directory itself.
+    cache : Optional[ListingCache]
+        Reuse a previous listing while the directory is unchanged.
+    recursive : bool
+        List the whole subtree as an indented tree of "name size" lines,
+        up to `max_depth` levels (unlimited when None).
+    include, exclude : glob or list of globs
+        Only list files matching `include`; skip files and directories
+        (without descending into them) matching `exclude`.  Globs with a
+        "/" match the path relative to `directory`, others the name.
+    max_entries : int
+        Stop a tree listing after this many lines.
 
     Returns
     -------
@@ -37,36 +188,88 @@ def get_files_info(working_directory: str, directory: Optional[str] = None) -> s
                 "permitted working directory"
             )
 
-        # Ensure the target is a directory
-        if not os.path.isdir(target_abs):
+        # Ensure the target is a directory (one stat also gives the mtime)
+        try:
+            st = os.stat(target_abs)
+        except FileNotFoundError:
+            st = None
+        if st is None or not stat.S_ISDIR(st.st_mode):
             return f'Error: "{directory}" is not a directory'
 
-        # Build listing lines
-        lines = []
-        for name in sorted(os.listdir(target_abs)):
-            item_abs = os.path.join(target_abs, name)
-            is_dir = os.path.isdir(item_abs)
-            size = os.path.getsize(item_abs)
-            lines.append(
-                f"- {name}: file_size={size} bytes, is_dir={is_dir}"
+        include, exclude = _globs(include), _globs(exclude)
+        if recursive or include or exclude:
+            depth = max(1, int(max_depth)) if recursive and max_depth is not None else None
+            return _tree(
+                target_abs, depth if recursive else 1,
+                include, exclude, max(1, int(max_entries)),
             )
 
+        if cache is not None:
+            listing = cache.get(target_abs, st.st_mtime_ns)
+            if listing is not None:
+                return listing
+
+        # Build listing lines in one scandir pass; DirEntry caches d_type
+        # and stat results, so each entry costs at most one stat call.
+        with os.scandir(target_abs) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        lines = [
+            f"- {e.name}: file_size={e.stat().st_size} bytes, is_dir={e.is_dir()}"
+            for e in entries
+            if e.name not in TOOL_STATE_DIRS
+        ]
+
         # Join with newlines exactly like the spec
-        return "\n".join(lines) if lines else "(empty directory)"
+        listing = "\n".join(lines) if lines else "(empty directory)"
+        if cache is not None:
+            cache.put(target_abs, st.st_mtime_ns, listing)
+        return listing
 
     except Exception as exc:  # catch *all* unexpected issues
         return f"Error: {exc}"
 
-schema_get_files_info = types.FunctionDeclaration(
-    name="get_files_info",
-    description="Lists files in the specified directory along with their sizes, constrained to the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "directory": types.Schema(
-                type=types.Type.STRING,
-                description="The directory to list files from, relative to the working directory. If not provided, lists files in the working directory itself.",
-            ),
-        },
-    ),
-)
+
+def _schema(types):
+    return types.FunctionDeclaration(
+        name="get_files_info",
+        description=(
+            "Lists files in the specified directory along with their sizes, constrained to the "
+            "working directory. With recursive=true, returns the whole subtree in one call as an "
+            "indented tree ('name size' per file, 'name/' per directory); .git, __pycache__ and "
+            "similar directories are skipped."
+        ),
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "directory": types.Schema(
+                    type=types.Type.STRING,
+                    description="The directory to list files from, relative to the working directory. If not provided, lists files in the working directory itself.",
+                ),
+                "recursive": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="List subdirectories too, as an indented tree. Defaults to false.",
+                ),
+                "max_depth": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="With recursive, how many directory levels to show (1 = only this directory). Unlimited by default.",
+                ),
+                "include": types.Schema(
+                    type=types.Type.ARRAY,
+                    items=types.Schema(type=types.Type.STRING),
+                    description="Glob patterns (e.g. '*.py'); only files matching one are listed.",
+                ),
+                "exclude": types.Schema(
+                    type=types.Type.ARRAY,
+                    items=types.Schema(type=types.Type.STRING),
+                    description="Glob patterns for files or directories to leave out; excluded directories are not descended into.",
+                ),
+                "max_entries": types.Schema(
+                    type=types.Type.INTEGER,
+                    description=f"Maximum lines in a tree listing. Defaults to {MAX_ENTRIES}.",
+                ),
+            },
+        ),
+    )
+
+
+__getattr__ = lazy_schema(globals(), "schema_get_files_info", _schema)
@@ -0,0 +1,196 @@
+# functions/patch_file.py
+from __future__ import annotations
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from functions.schema import lazy_schema
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def _parse_unified(diff: str) -> list[tuple[int, list[str], list[str]]]:
+    """
+    Return (old_start, old_lines, new_lines) for each hunk of a unified diff.
+    Everything before the first @@ (including "---"/"+++" file headers) is
+    skipped; after it, "--- x" is the removal of a line "-- x".
+    """
+    hunks: list[tuple[int, list[str], list[str]]] = []
+    current = None
+    for line in diff.splitlines():
+        header = _HUNK_HEADER.match(line)
+        if header:
+            current = (int(header.group(1)), [], [])
+            hunks.append(current)
+        elif current is None or line.startswith("\\"):
+            continue                        # file headers, "\ No newline…"
+        elif line.startswith("+"):
+            current[2].append(line[1:])
+        elif line.startswith("-"):
+            current[1].append(line[1:])
+        else:                               # context (a bare "" is a blank line)
+            current[1].append(line[1:])
+            current[2].append(line[1:])
+    if not hunks:
+        raise ValueError("no @@ hunks found in diff")
+    return hunks
+
+
+def _find_block(lines: list[str], block: list[str], expected: int) -> int | None:
+    """Index of the occurrence of *block* in *lines* nearest to *expected*."""
+    if not block:
+        return min(max(expected, 0), len(lines))
+    n = len(block)
+    matches = [
+        i for i in range(len(lines) - n + 1)
+        if lines[i] == block[0] and lines[i:i + n] == block
+    ]
+    if not matches:
+        return None
+    return min(matches, key=lambda i: abs(i - expected))
+
+
+def _apply_diff(text: str, diff: str) -> tuple[str, list[dict]]:
+    lines = text.split("\n")
+    errors: list[dict] = []
+    delta = 0                               # line shift from earlier hunks
+    for n, (start, old, new) in enumerate(_parse_unified(diff), 1):
+        # "-N,0" inserts *after* old line N; otherwise line N is old[0]
+        pos = _find_block(lines, old, (start if not old else start - 1) + delta)
+        if pos is None:
+            errors.append({
+                "hunk": n,
+                "line": start,
+                "reason": "context not found",
+                "expected": "\n".join(old[:5]),
+            })
+            continue
+        lines[pos:pos + len(old)] = new
+        delta += len(new) - len(old)
+    return "\n".join(lines), errors
+
+
+def _apply_edits(text: str, edits: list[dict]) -> tuple[str, list[dict]]:
+    errors: list[dict] = []
+    for n, edit in enumerate(edits, 1):
+        search = edit.get("search", "")
+        replace = edit.get("replace", "")
+        count = text.count(search) if search else 0
+        if count != 1:
+            errors.append({
+                "hunk": n,
+                "reason": "search text is empty" if not search
+                else "search text not found" if count == 0
+                else f"search text matches {count} times; add context to make it unique",
+                "search": search[:200],
+            })
+            continue
+        text = text.replace(search, replace, 1)
+    return text, errors
+
+
+def patch_file(
+    working_directory: str,
+    file_path: str,
+    edits: list[dict] | None = None,
+    diff: str | None = None,
+) -> str:
+    """
+    Apply search/replace *edits* or a unified *diff* to an existing file
+    under ``pkg/`` in *working_directory*.  All hunks must apply, otherwise
+    nothing is written and an "Error:" string with a JSON list of the
+    failed hunks is returned.  The write is atomic (temp file + os.replace).
+    """
+    try:
+        work_abs = os.path.abspath(working_directory)
+        target_abs = os.path.abspath(os.path.join(work_abs, file_path))
+
+        # ── EXTRA SAFETY: only allow writes under calculator/pkg ──
+        safe_root = os.path.abspath(os.path.join(work_abs, "pkg"))
+        if not target_abs.startswith(safe_root):
+            return (
+                f'Error: For safety, may only write inside "pkg" '
+                f'(got "{file_path}")'
+            )
+        # Guard-rail: must stay inside working_directory
+        if not target_abs.startswith(work_abs):
+            return (
+                f'Error: Cannot write to "{file_path}" as it is outside '
+                "the permitted working directory"
+            )
+
+        if not os.path.isfile(target_abs):
+            return f'Error: File not found or is not a regular file: "{file_path}"'
+        if bool(edits) == bool(diff):
+            return "Error: pass exactly one of `edits` or `diff`"
+
+        with open(target_abs, "r", encoding="utf-8", newline="") as f:
+            original = f.read()
+
+        if diff:
+            patched, errors = _apply_diff(original, diff)
+        else:
+            patched, errors = _apply_edits(original, edits)
+
+        if errors:
+            return (
+                f'Error: {len(errors)} hunk(s) failed to apply to "{file_path}"; '
+                "file left unchanged: " + json.dumps(errors)
+            )
+
+        # Atomic replace: readers never see a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target_abs), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                f.write(patched)
+            shutil.copymode(target_abs, tmp_path)
+            os.replace(tmp_path, target_abs)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        hunks = len(edits) if edits else len(_parse_unified(diff))
+        return (
+            f'Successfully patched "{file_path}" '
+            f"({hunks} hunk(s) applied, {len(patched)} characters now)"
+        )
+
+    except Exception as exc:
+        return f"Error: {exc}"
+
+
+def _schema(types):
+    return types.FunctionDeclaration(
+        name="patch_file",
+        description=(
+            "Change part of an existing file without resending all of it. Pass either "
+            "`edits` (search/replace pairs; each search text must occur exactly once) "
+            "or `diff` (a unified diff). Nothing is written unless every hunk applies."
+        ),
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(type=types.Type.STRING),
+                "edits": types.Schema(
+                    type=types.Type.ARRAY,
+                    items=types.Schema(
+                        type=types.Type.OBJECT,
+                        properties={
+                            "search":  types.Schema(type=types.Type.STRING),
+                            "replace": types.Schema(type=types.Type.STRING),
+                        },
+                    ),
+                    description="Search/replace hunks, applied in order.",
+                ),
+                "diff": types.Schema(
+                    type=types.Type.STRING,
+                    description="Unified diff with @@ hunk headers.",
+                ),
+            },
+        ),
+    )
+
+
+__getattr__ = lazy_schema(globals(), "schema_patch_file", _schema)
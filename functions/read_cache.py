@@ -0,0 +1,117 @@
+# functions/read_cache.py
+"""
+Content-addressed cache for `get_file_content`.
+
+`ContentCache` is shared by every session in the process: decoded file text
+keyed by (absolute path, mtime, size), evicted least-recently-used once the
+cached text exceeds a byte budget.  `ReadLog` is per session and remembers
+which version (sha) of each file the model has already been shown, and in
+which turn, so an unchanged re-read can be answered with a one-line note
+instead of the full payload.
+"""
+from __future__ import annotations
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from .get_file_content import get_file_content
+
+DEFAULT_MAX_BYTES = 32 << 20
+
+
+class ContentCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[str, int, int], tuple[str, str, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, int, int]) -> Optional[tuple[str, str]]:
+        """Return (sha, text) for *key*, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def put(self, key: tuple[str, int, int], sha: str, text: str) -> None:
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (sha, text, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def invalidate(self, path: str) -> None:
+        """Drop every cached version of *path*."""
+        path = os.path.abspath(path)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path]:
+                self._bytes -= self._entries.pop(key)[2]
+
+
+class ReadLog:
+    """Per-session record of the file versions the model has seen."""
+
+    def __init__(self) -> None:
+        self.turn = 0                           # set by the agent loop
+        self._seen: dict[str, tuple[str, int]] = {}
+
+    def seen(self, file_path: str, sha: str) -> Optional[int]:
+        """Turn in which this exact version was shown, if any."""
+        entry = self._seen.get(os.path.normpath(file_path))
+        return entry[1] if entry is not None and entry[0] == sha else None
+
+    def record(self, file_path: str, sha: str) -> None:
+        self._seen[os.path.normpath(file_path)] = (sha, self.turn)
+
+    def forget(self, file_path: str, sha: Optional[str] = None) -> None:
+        """
+        The model no longer has this file's text (e.g. it was compacted).
+        With *sha*, only if that is the version recorded: compacting an old
+        read must not erase a newer re-read of the same file.
+        """
+        key = os.path.normpath(file_path)
+        entry = self._seen.get(key)
+        if entry is not None and (sha is None or entry[0] == sha):
+            del self._seen[key]
+
+
+def read_file_cached(
+    cache: ContentCache,
+    working_directory: str,
+    file_path: str,
+) -> tuple[str, Optional[str]]:
+    """
+    `get_file_content` through *cache*.  Returns (text, sha); sha is None
+    when the read failed, in which case *text* is the error string.
+    """
+    target_abs = os.path.abspath(os.path.join(os.path.abspath(working_directory), file_path))
+    try:
+        st = os.stat(target_abs)
+        key = (target_abs, st.st_mtime_ns, st.st_size)
+    except OSError:
+        key = None
+
+    if key is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            return hit[1], hit[0]
+
+    text = get_file_content(working_directory, file_path)
+    if text.startswith("Error:"):
+        return text, None
+
+    sha = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+    if key is not None:
+        cache.put(key, sha, text)
+    return text, sha
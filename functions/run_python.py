@@ -1,71 +1,463 @@
 # functions/run_python.py
 from __future__ import annotations
 import os, sys, subprocess
+import select
+import threading
+import time
+from dataclasses import dataclass
 
+from functions.schema import lazy_schema
 
-def run_python_file(working_directory: str, file_path: str, args: list[str] | None = None) -> str:
+TIMEOUT = 30  # seconds
+
+# Output limits, per stream for the head/tail windows and combined for the
+# kill switch.  Everything between head and tail is dropped and counted.
+HEAD_BYTES = 2_500
+TAIL_BYTES = 2_500
+MAX_OUTPUT_BYTES = 1 << 20
+READ_CHUNK = 1 << 16
+
+# Optional functions.warm_pool.WarmPool; when set, scripts run in forked
+# children of pre-started interpreters instead of a cold subprocess.
+_warm_pool = None
+
+
+def use_warm_pool(pool) -> None:
+    """Route run_python_file through *pool* (None restores cold starts)."""
+    global _warm_pool
+    _warm_pool = pool
+
+
+@dataclass
+class RunResult:
+    stdout: str
+    stderr: str
+    returncode: int
+    wall: float                         # seconds
+    peak_rss_kb: int | None             # None where os.wait4 is unavailable
+    killed_at: int | None = None        # output bytes when the limit tripped
+
+
+class _Capture:
+    """Keep the first *head* and last *tail* bytes of a stream."""
+
+    def __init__(self, head: int, tail: int) -> None:
+        self.head_limit, self.tail_limit = head, tail
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def feed(self, chunk: bytes) -> None:
+        self.total += len(chunk)
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk and self.tail_limit > 0:
+            self.tail += chunk
+            if len(self.tail) > self.tail_limit:
+                del self.tail[:len(self.tail) - self.tail_limit]
+
+    def text(self) -> str:
+        return _window_text(
+            self.head.decode(errors="replace"),
+            self.tail.decode(errors="replace"),
+            self.total - len(self.head) - len(self.tail),
+        )
+
+
+def _window_text(head: str, tail: str, dropped: int) -> str:
+    if dropped <= 0:
+        return head + tail
+    return f"{head}\n[... {dropped} bytes of output dropped ...]\n{tail}"
+
+
+def _peak_rss_kb(rusage) -> int:
+    # ru_maxrss is KiB on Linux but bytes on macOS
+    return rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+
+
+def _resolve(working_directory: str, file_path: str) -> tuple[str, str, str | None]:
+    """Return (work_abs, target_abs, error) after the guard-rail checks."""
+    work_abs = os.path.abspath(working_directory)
+    target_abs = os.path.abspath(os.path.join(work_abs, file_path))
+
+    # ── Guard-rails ────────────────────────────────────────────
+    if not target_abs.startswith(work_abs):
+        return work_abs, target_abs, (
+            f'Error: Cannot execute "{file_path}" as it is outside the '
+            "permitted working directory"
+        )
+
+    if not os.path.isfile(target_abs):
+        return work_abs, target_abs, f'Error: File "{file_path}" not found.'
+
+    if not target_abs.endswith(".py"):
+        return work_abs, target_abs, f'Error: "{file_path}" is not a Python file.'
+
+    return work_abs, target_abs, None
+
+
+def _format(result: RunResult, max_output_bytes: int) -> str:
+    chunks: list[str] = []
+    if result.stdout.strip():
+        chunks.append("STDOUT:\n" + result.stdout.rstrip())
+    if result.stderr.strip():
+        chunks.append("STDERR:\n" + result.stderr.rstrip())
+    if result.killed_at is not None:
+        chunks.append(
+            f"Process killed after {result.killed_at} bytes of output "
+            f"(max_output_bytes={max_output_bytes})"
+        )
+    elif result.returncode != 0:
+        chunks.append(f"Process exited with code {result.returncode}")
+
+    body = "\n".join(chunks) if chunks else "No output produced."
+    rss = "n/a" if result.peak_rss_kb is None else f"{result.peak_rss_kb / 1024:.1f} MiB"
+    return body + f"\n[wall time {result.wall:.2f}s, peak RSS {rss}]"
+
+
+def _limits(head: object, tail: object, max_output: object) -> tuple[int, int, int]:
+    """Check the model-supplied output limits; ValueError names the bad one."""
+    values = []
+    for name, value in (
+        ("head_bytes", head), ("tail_bytes", tail), ("max_output_bytes", max_output)
+    ):
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)              # JSON numbers may arrive as 2500.0
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            raise ValueError(f"{name} must be a non-negative integer (got {value!r})")
+        values.append(value)
+    return values[0], values[1], values[2]
+
+
+def _pidfd(pid: int) -> int | None:
+    """A descriptor that turns readable when *pid* exits (Linux), else None."""
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        return None
+
+
+def _reap(pid: int, timeout: float):
+    """
+    Wait up to *timeout* seconds for *pid* to exit, then reap it with
+    wait4.  Returns (status, rusage), or None if it is still running.
+    """
+    fd = _pidfd(pid)
+    if fd is not None:
+        try:
+            if not select.select([fd], [], [], max(0.0, timeout))[0]:
+                return None
+        finally:
+            os.close(fd)
+        return os.wait4(pid, 0)[1:]
+    deadline, delay = time.monotonic() + timeout, 0.001
+    while True:                             # no pidfd: poll, backing off
+        wpid, status, rusage = os.wait4(pid, os.WNOHANG)
+        if wpid:
+            return status, rusage
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+
+async def _reap_async(pid: int, timeout: float):
+    """`_reap` without blocking the event loop."""
+    import asyncio
+
+    fd = _pidfd(pid)
+    if fd is not None:
+        loop = asyncio.get_running_loop()
+        exited = loop.create_future()
+        loop.add_reader(fd, lambda: exited.done() or exited.set_result(None))
+        try:
+            await asyncio.wait_for(exited, max(0.0, timeout))
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            loop.remove_reader(fd)
+            os.close(fd)
+        return os.wait4(pid, 0)[1:]
+    deadline, delay = time.monotonic() + timeout, 0.001
+    while True:
+        wpid, status, rusage = os.wait4(pid, os.WNOHANG)
+        if wpid:
+            return status, rusage
+        if time.monotonic() >= deadline:
+            return None
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+
+def _run_streaming(
+    cmd: list[str], cwd: str, head: int, tail: int, max_output: int
+) -> RunResult:
+    """
+    Run *cmd*, reading stdout and stderr incrementally into bounded
+    head/tail windows.  The child is killed once combined output exceeds
+    *max_output* bytes (0 disables) or after TIMEOUT seconds, in which case
+    subprocess.TimeoutExpired is raised as with subprocess.run.
+    """
+    start = time.monotonic()
+    deadline = start + TIMEOUT
+    proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = _Capture(head, tail), _Capture(head, tail)
+    killed_at: list[int] = []
+
+    def pump(stream, capture: _Capture) -> None:
+        for chunk in iter(lambda: stream.read1(READ_CHUNK), b""):
+            capture.feed(chunk)
+            total = out.total + err.total
+            if max_output and total > max_output and not killed_at:
+                killed_at.append(total)
+                proc.kill()
+        stream.close()
+
+    readers = [
+        threading.Thread(target=pump, args=(proc.stdout, out), daemon=True),
+        threading.Thread(target=pump, args=(proc.stderr, err), daemon=True),
+    ]
+    for t in readers:
+        t.start()
+    for t in readers:
+        t.join(max(0.0, deadline - time.monotonic()))
+    timed_out = any(t.is_alive() for t in readers)
+    if timed_out:
+        proc.kill()
+        for t in readers:
+            t.join(1.0)
+
+    # reap with wait4 so the child's own peak RSS is available
+    peak_rss = None
+    if hasattr(os, "wait4"):
+        reaped = _reap(proc.pid, deadline - time.monotonic())
+        if reaped is None:
+            proc.kill()
+            timed_out = True
+            reaped = os.wait4(proc.pid, 0)[1:]
+        status, rusage = reaped
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        peak_rss = _peak_rss_kb(rusage)
+    else:
+        try:
+            proc.wait(max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            timed_out = True
+
+    if timed_out and not killed_at:
+        raise subprocess.TimeoutExpired(cmd, TIMEOUT)
+
+    return RunResult(
+        out.text(), err.text(), proc.returncode,
+        time.monotonic() - start, peak_rss,
+        killed_at[0] if killed_at else None,
+    )
+
+
+async def _run_streaming_async(
+    cmd: list[str], cwd: str, head: int, tail: int, max_output: int
+) -> RunResult:
+    """
+    `_run_streaming` on the event loop (POSIX only).  The pipes are read
+    through asyncio transports and the child is reaped with our own wait4,
+    not asyncio's child watcher, so its peak RSS is still reported.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    start = time.monotonic()
+    deadline = start + TIMEOUT
+    proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = _Capture(head, tail), _Capture(head, tail)
+    killed_at: list[int] = []
+
+    async def pump(pipe, capture: _Capture) -> None:
+        reader = asyncio.StreamReader(limit=READ_CHUNK)
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), pipe
+        )
+        try:
+            while chunk := await reader.read(READ_CHUNK):
+                capture.feed(chunk)
+                total = out.total + err.total
+                if max_output and total > max_output and not killed_at:
+                    killed_at.append(total)
+                    proc.kill()
+        finally:
+            transport.close()
+
+    timed_out = False
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(pump(proc.stdout, out), pump(proc.stderr, err)),
+            max(0.0, deadline - time.monotonic()),
+        )
+        reaped = await _reap_async(proc.pid, deadline - time.monotonic())
+    except asyncio.TimeoutError:
+        reaped = None
+    except BaseException:
+        proc.kill()
+        os.wait4(proc.pid, 0)
+        raise
+    if reaped is None:
+        proc.kill()
+        timed_out = True
+        reaped = os.wait4(proc.pid, 0)[1:]
+    status, rusage = reaped
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    if timed_out and not killed_at:
+        raise subprocess.TimeoutExpired(cmd, TIMEOUT)
+
+    return RunResult(
+        out.text(), err.text(), proc.returncode,
+        time.monotonic() - start, _peak_rss_kb(rusage),
+        killed_at[0] if killed_at else None,
+    )
+
+
+def _run_warm(
+    target_abs: str, args: list[str], work_abs: str, head: int, tail: int, max_output: int
+) -> RunResult:
+    reply = _warm_pool.run(target_abs, args, work_abs, TIMEOUT, head, tail, max_output)
+    return RunResult(
+        _window_text(*reply["stdout"]),
+        _window_text(*reply["stderr"]),
+        reply["returncode"],
+        reply["wall"],
+        reply["peak_rss_kb"],
+        reply["killed_at"],
+    )
+
+
+def run_python_file(
+    working_directory: str,
+    file_path: str,
+    args: list[str] | None = None,
+    head_bytes: int = HEAD_BYTES,
+    tail_bytes: int = TAIL_BYTES,
+    max_output_bytes: int = MAX_OUTPUT_BYTES,
+) -> str:
     """
     Execute a Python file inside *working_directory* with optional CLI *args*.
 
+    Output is captured incrementally: per stream only the first
+    *head_bytes* and last *tail_bytes* are kept, and the child is killed
+    once it has written more than *max_output_bytes* in total (0 = no limit).
+
     Returns a formatted string that always begins with either:
       • "STDOUT:" / "STDERR:" / "Process exited …", or
       • "Error:" on failure / guard-rail breach.
+    and ends with the child's wall time and peak RSS.
     """
     args = args or []
 
     try:
-        work_abs = os.path.abspath(working_directory)
-        target_abs = os.path.abspath(os.path.join(work_abs, file_path))
-
-        # ── Guard-rails ────────────────────────────────────────────
-        if not target_abs.startswith(work_abs):
-            return (
-                f'Error: Cannot execute "{file_path}" as it is outside the '
-                "permitted working directory"
+        head_bytes, tail_bytes, max_output_bytes = _limits(
+            head_bytes, tail_bytes, max_output_bytes
+        )
+    except ValueError as e:
+        return f"Error: {e}"
+
+    try:
+        work_abs, target_abs, error = _resolve(working_directory, file_path)
+        if error:
+            return error
+
+        if _warm_pool is not None:
+            result = _run_warm(
+                target_abs, args, work_abs, head_bytes, tail_bytes, max_output_bytes
+            )
+        else:
+            # ── Run the subprocess ────────────────────────────────
+            result = _run_streaming(
+                [sys.executable, target_abs, *args],
+                work_abs, head_bytes, tail_bytes, max_output_bytes,
             )
 
-        if not os.path.isfile(target_abs):
-            return f'Error: File "{file_path}" not found.'
+        return _format(result, max_output_bytes)
 
-        if not target_abs.endswith(".py"):
-            return f'Error: "{file_path}" is not a Python file.'
+    except Exception as e:
+        return f"Error: executing Python file: {e}"
 
-        # ── Run the subprocess ────────────────────────────────────
-        cp = subprocess.run(
-            [sys.executable, target_abs, *args],
-            cwd=work_abs,
-            capture_output=True,
-            text=True,
-            timeout=30,
-        )
 
-        chunks: list[str] = []
-        if cp.stdout.strip():
-            chunks.append("STDOUT:\n" + cp.stdout.rstrip())
-        if cp.stderr.strip():
-            chunks.append("STDERR:\n" + cp.stderr.rstrip())
-        if cp.returncode != 0:
-            chunks.append(f"Process exited with code {cp.returncode}")
+async def run_python_file_async(
+    working_directory: str,
+    file_path: str,
+    args: list[str] | None = None,
+    head_bytes: int = HEAD_BYTES,
+    tail_bytes: int = TAIL_BYTES,
+    max_output_bytes: int = MAX_OUTPUT_BYTES,
+) -> str:
+    """
+    Same contract as `run_python_file`, without blocking the event loop.
 
-        return "\n".join(chunks) if chunks else "No output produced."
+    The child's pipes and exit are awaited on the loop itself.  The warm
+    pool's protocol and the non-POSIX wait are blocking, so those two
+    cases still run `run_python_file` in a worker thread.
+    """
+    import asyncio      # only the agent loop needs it; keep tool imports light
+
+    args = args or []
+    try:
+        limits = _limits(head_bytes, tail_bytes, max_output_bytes)
+    except ValueError as e:
+        return f"Error: {e}"
+    if _warm_pool is not None or not hasattr(os, "wait4"):
+        return await asyncio.to_thread(run_python_file, working_directory, file_path, args, *limits)
+
+    try:
+        work_abs, target_abs, error = _resolve(working_directory, file_path)
+        if error:
+            return error
+        result = await _run_streaming_async(
+            [sys.executable, target_abs, *args], work_abs, *limits
+        )
+        return _format(result, limits[2])
 
     except Exception as e:
         return f"Error: executing Python file: {e}"
 
-from google.genai import types
-
-schema_run_python_file = types.FunctionDeclaration(
-    name="run_python_file",
-    description="Execute a Python (.py) file with optional CLI arguments.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(type=types.Type.STRING),
-            "args": types.Schema(
-                type=types.Type.ARRAY,
-                items=types.Schema(type=types.Type.STRING),
-                description="Optional list of command-line arguments.",
-            ),
-        },
-    ),
-)
+
+def _schema(types):
+    return types.FunctionDeclaration(
+        name="run_python_file",
+        description=(
+            "Execute a Python (.py) file with optional CLI arguments. Long output is "
+            "trimmed to a head and tail window per stream; the result ends with the "
+            "run's wall time and peak memory."
+        ),
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(type=types.Type.STRING),
+                "args": types.Schema(
+                    type=types.Type.ARRAY,
+                    items=types.Schema(type=types.Type.STRING),
+                    description="Optional list of command-line arguments.",
+                ),
+                "head_bytes": types.Schema(
+                    type=types.Type.INTEGER,
+                    description=f"Bytes kept from the start of each stream (default {HEAD_BYTES}).",
+                ),
+                "tail_bytes": types.Schema(
+                    type=types.Type.INTEGER,
+                    description=f"Bytes kept from the end of each stream (default {TAIL_BYTES}).",
+                ),
+                "max_output_bytes": types.Schema(
+                    type=types.Type.INTEGER,
+                    description=(
+                        "Kill the script once it has written this many bytes in total "
+                        f"(default {MAX_OUTPUT_BYTES}, 0 = no limit)."
+                    ),
+                ),
+            },
+        ),
+    )
+
+
+__getattr__ = lazy_schema(globals(), "schema_run_python_file", _schema)
@@ -0,0 +1,160 @@
+# functions/run_tests.py
+from __future__ import annotations
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from functions.test_impact import Fingerprints, Index, source_hashes
+from functions.schema import lazy_schema
+
+TIMEOUT = 120  # seconds, for the whole selected batch
+INDEX_DIR = ".test_impact"  # inside the working directory
+MAX_DETAIL = 2_000  # characters of traceback kept per failing test
+
+RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_impact.py")
+
+
+def _index_path(work_abs: str, test_rel: str) -> str:
+    # kept with the project, so a copy of it (batch mode) starts warm and
+    # the index is deleted along with it
+    key = hashlib.sha1(test_rel.replace(os.sep, "/").encode()).hexdigest()[:16]
+    return os.path.join(work_abs, INDEX_DIR, f"{key}.json")
+
+
+def _format(report: dict[str, dict | None], ran: set[str], changed: list[str]) -> str:
+    counts: dict[str, int] = {}
+    lines: list[str] = []
+    for name, record in report.items():
+        record = record or {"outcome": "ERROR", "detail": "no result recorded"}
+        counts[record["outcome"]] = counts.get(record["outcome"], 0) + 1
+        if record["outcome"] in ("FAIL", "ERROR"):
+            cached = "" if name in ran else " (cached)"
+            detail = record["detail"][-MAX_DETAIL:].rstrip()
+            lines.append(f"{record['outcome']}: {name}{cached}\n{detail}")
+
+    header = (
+        f"Ran {len(ran)} of {len(report)} tests "
+        f"({len(report) - len(ran)} unaffected, results reused)"
+    )
+    if changed:
+        header += "; changed since last run: " + ", ".join(changed)
+    summary = ", ".join(f"{outcome}={n}" for outcome, n in sorted(counts.items()))
+    status = "FAILED" if counts.get("FAIL") or counts.get("ERROR") else "OK"
+    return "\n".join([header, *lines, f"{status} ({summary})"])
+
+
+def run_tests(
+    working_directory: str,
+    test_file: str = "tests.py",
+    run_all: bool = False,
+) -> str:
+    """
+    Run the unittest tests in *test_file* whose code changed since their
+    last run, reusing the stored result of every other test.
+
+    Which code a test depends on comes from the test-impact index (see
+    functions.test_impact): the functions it entered during its last run,
+    fingerprinted per function.  New tests, tests without a stored result
+    and, with *run_all*, every test are always run.
+    """
+    try:
+        work_abs = os.path.abspath(working_directory)
+        target_abs = os.path.abspath(os.path.join(work_abs, test_file))
+
+        # ── Guard-rails ────────────────────────────────────────────
+        if not target_abs.startswith(work_abs):
+            return (
+                f'Error: Cannot execute "{test_file}" as it is outside the '
+                "permitted working directory"
+            )
+        if not os.path.isfile(target_abs):
+            return f'Error: File "{test_file}" not found.'
+        if not target_abs.endswith(".py"):
+            return f'Error: "{test_file}" is not a Python file.'
+
+        test_rel = os.path.relpath(target_abs, work_abs)
+        index = Index(_index_path(work_abs, test_rel))
+        hashes = source_hashes(work_abs)
+        changed = sorted(
+            path for path in hashes.keys() | index.files.keys()
+            if hashes.get(path) != index.files.get(path)
+        ) if index.files else []
+
+        prints = Fingerprints(work_abs)
+        skip = [] if run_all else [
+            name for name, record in index.tests.items()
+            if prints.unchanged(record["deps"])
+        ]
+
+        # ── Run the affected tests in a fresh interpreter ─────────
+        fd, results_path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            proc = subprocess.run(
+                [sys.executable, RUNNER, test_rel, results_path],
+                cwd=work_abs,
+                input=json.dumps(skip),
+                capture_output=True,
+                text=True,
+                timeout=TIMEOUT,
+            )
+            with open(results_path, encoding="utf-8") as f:
+                results = json.load(f) if os.path.getsize(results_path) else None
+        finally:
+            os.unlink(results_path)
+
+        if results is None:
+            output = (proc.stderr or proc.stdout).strip()[-MAX_DETAIL:]
+            return f'Error: could not load tests from "{test_file}":\n{output}'
+
+        names = results["all"]
+        for name, record in results["ran"].items():
+            if name in names:
+                # a test always depends on its own source, even if skipped
+                touched = record.pop("touched")
+                touched.setdefault(test_rel, []).append(name)
+                record["deps"] = prints.deps(touched)
+                index.tests[name] = record
+        index.tests = {name: index.tests[name] for name in names if name in index.tests}
+        index.files = hashes
+        index.save()
+
+        # fixture failures (setUpClass, …) are reported but never stored
+        report = {name: index.tests.get(name) for name in names}
+        report.update((n, r) for n, r in results["ran"].items() if n not in report)
+        return _format(report, set(results["ran"]), changed)
+
+    except subprocess.TimeoutExpired:
+        return f"Error: tests timed out after {TIMEOUT} seconds"
+    except Exception as e:
+        return f"Error: running tests: {e}"
+
+
+def _schema(types):
+    return types.FunctionDeclaration(
+        name="run_tests",
+        description=(
+            "Run the unittest tests affected by changes since the last run. Tests whose "
+            "code (the functions they used last time) is unchanged are not rerun; their "
+            "previous result is reused and marked as cached."
+        ),
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "test_file": types.Schema(
+                    type=types.Type.STRING,
+                    description="Test module relative to the working directory (default tests.py).",
+                ),
+                "run_all": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="Ignore the index and run every test.",
+                ),
+            },
+        ),
+    )
+
+
+__getattr__ = lazy_schema(globals(), "schema_run_tests", _schema)
@@ -0,0 +1,25 @@
+# functions/schema.py
+"""
+Lazy tool schemas.  Building a `types.FunctionDeclaration` needs
+`google.genai`, which is slow to import and not needed to *run* a tool, so
+each tool module defines a builder and exposes its schema through a module
+`__getattr__` (PEP 562): the SDK is imported on first access only.
+"""
+from __future__ import annotations
+from typing import Any, Callable
+
+
+def lazy_schema(namespace: dict[str, Any], name: str, build: Callable[[Any], Any]):
+    """
+    Return a module `__getattr__` that, on first access to *name*, calls
+    *build* with `google.genai.types` and caches the result in *namespace*.
+    """
+    def __getattr__(attr: str):
+        if attr != name:
+            raise AttributeError(f"module {namespace['__name__']!r} has no attribute {attr!r}")
+        from google.genai import types
+
+        value = namespace[name] = build(types)
+        return value
+
+    return __getattr__
@@ -0,0 +1,155 @@
+# functions/search_code.py
+"""
+Find code inside the permitted working directory without reading every
+file: symbol lookups are answered from the index alone, and text searches
+only open the files whose trigrams can contain the query (see
+functions.code_index).  Errors are returned as strings starting with
+"Error:".
+"""
+from __future__ import annotations
+import os
+import re
+from typing import Optional
+
+from functions.code_index import CodeIndex, read_text
+from functions.schema import lazy_schema
+
+MAX_RESULTS = 50
+MAX_LINE = 200  # characters of each matching line shown
+
+MODES = ("text", "symbol", "regex")
+
+
+def _within(rel: str, prefix: str) -> bool:
+    return prefix == "." or rel == prefix or rel.startswith(prefix + os.sep)
+
+
+def search_code(
+    working_directory: str,
+    query: str,
+    mode: str = "text",
+    path: Optional[str] = None,
+    case_sensitive: bool = False,
+    max_results: int = MAX_RESULTS,
+    index: Optional[CodeIndex] = None,
+) -> str:
+    """
+    Parameters
+    ----------
+    working_directory : str
+        The root folder the LLM is allowed to search.
+    query : str
+        A substring ("text"), a symbol name or dotted suffix such as
+        "Calculator.evaluate" ("symbol"), or a Python regular expression
+        ("regex").
+    path : Optional[str]
+        Only search files under this *relative* file or directory.
+    index : Optional[CodeIndex]
+        The shared index; a private one is used when omitted.
+
+    Returns
+    -------
+    str
+        One "file:line: text" line per match under a header with the match
+        count, or an error string that begins with "Error:".
+    """
+    try:
+        work_abs = os.path.abspath(working_directory)
+        target_abs = os.path.abspath(os.path.join(work_abs, path or "."))
+
+        # ── Guard-rails ────────────────────────────────────────────
+        if not target_abs.startswith(work_abs):
+            return (
+                f'Error: Cannot search "{path}" as it is outside the '
+                "permitted working directory"
+            )
+        if not os.path.exists(target_abs):
+            return f'Error: "{path}" does not exist'
+        if mode not in MODES:
+            return f'Error: unknown mode "{mode}"; use one of {", ".join(MODES)}'
+        if not query:
+            return "Error: empty query"
+        flags = 0 if case_sensitive else re.IGNORECASE
+        try:
+            pattern = re.compile(query if mode == "regex" else re.escape(query), flags)
+        except re.error as e:
+            return f"Error: invalid regular expression: {e}"
+
+        prefix = os.path.relpath(target_abs, work_abs)
+        index = index or CodeIndex()
+        matches: list[str] = []
+        total = 0
+        idx = index.refreshed(work_abs)
+        if mode == "symbol":
+            wanted = query if case_sensitive else query.lower()
+            for rel, symbols in idx.symbols():
+                if not _within(rel, prefix):
+                    continue
+                for name, kind, line in symbols:
+                    key = name if case_sensitive else name.lower()
+                    if key == wanted or key.endswith("." + wanted):
+                        total += 1
+                        if len(matches) < max_results:
+                            matches.append(f"{rel}:{line}: {kind} {name}")
+        else:
+            files = idx.candidates(query) if mode == "text" else idx.text_files()
+            for rel in files:
+                if not _within(rel, prefix):
+                    continue
+                text = read_text(os.path.join(work_abs, rel))
+                for n, line in enumerate((text or "").splitlines(), 1):
+                    if pattern.search(line):
+                        total += 1
+                        if len(matches) < max_results:
+                            matches.append(f"{rel}:{n}: {line.strip()[:MAX_LINE]}")
+
+        if not total:
+            return f'No matches for "{query}" ({mode})'
+        header = f'{total} matches for "{query}" ({mode})'
+        if total > len(matches):
+            header += f", showing the first {len(matches)}"
+        return "\n".join([header, *matches])
+
+    except Exception as e:
+        return f"Error: searching: {e}"
+
+
+def _schema(types):
+    return types.FunctionDeclaration(
+        name="search_code",
+        description=(
+            "Search the working directory's files and return matching lines as "
+            "file:line: text. Use it to find where something is defined or used "
+            "instead of reading whole files."
+        ),
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "query": types.Schema(
+                    type=types.Type.STRING,
+                    description="What to look for: a substring, a symbol name (e.g. 'Calculator.evaluate') or a regular expression, depending on mode.",
+                ),
+                "mode": types.Schema(
+                    type=types.Type.STRING,
+                    enum=list(MODES),
+                    description="'text' (default): substring match; 'symbol': class/function/method/variable definitions; 'regex': Python regular expression.",
+                ),
+                "path": types.Schema(
+                    type=types.Type.STRING,
+                    description="Optional file or directory, relative to the working directory, to limit the search to.",
+                ),
+                "case_sensitive": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="Match case exactly. Defaults to false.",
+                ),
+                "max_results": types.Schema(
+                    type=types.Type.INTEGER,
+                    description=f"Maximum matching lines returned. Defaults to {MAX_RESULTS}.",
+                ),
+            },
+            required=["query"],
+        ),
+    )
+
+
+__getattr__ = lazy_schema(globals(), "schema_search_code", _schema)
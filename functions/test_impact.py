@@ -0,0 +1,229 @@
+"""
+Test-impact index for `run_tests`.
+
+Every test is run under `sys.monitoring` (PY_START events), which records
+the functions it enters in files under the working directory.  Each
+source file is split into per-function fingerprints with `ast`: one hash
+per top-level function or method, plus a "<module>" hash for everything
+outside them (imports, constants, class attributes).  A test's result
+stays valid while every function it entered, and the "<module>" part of
+every file it entered, hashes the same as when it ran.
+
+Run as a script, this module is the runner child: it loads the unittest
+suite, runs every test not named in the skip list and writes one JSON
+record per test to the given results file.
+"""
+from __future__ import annotations
+import ast
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+MODULE = "<module>"
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest()[:16]
+
+
+def fingerprint(source: str) -> dict[str, str]:
+    """{qualname: hash} for each function/method in *source*, plus MODULE."""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return {MODULE: _digest(source)}
+
+    lines = source.splitlines(keepends=True)
+    spans: dict[str, tuple[int, int]] = {}
+
+    def visit(body: list[ast.stmt], prefix: str) -> None:
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                first = min([node.lineno, *(d.lineno for d in node.decorator_list)])
+                spans[prefix + node.name] = (first - 1, node.end_lineno)
+            elif isinstance(node, ast.ClassDef):
+                visit(node.body, f"{prefix}{node.name}.")
+
+    visit(tree.body, "")
+    hashes = {name: _digest("".join(lines[a:b])) for name, (a, b) in spans.items()}
+    inside = {i for a, b in spans.values() for i in range(a, b)}
+    hashes[MODULE] = _digest("".join(l for i, l in enumerate(lines) if i not in inside))
+    return hashes
+
+
+def owner(qualname: str, functions: dict[str, str]) -> str:
+    """Map a code object's qualname to the fingerprint entry that holds it."""
+    top = qualname.split(".<locals>", 1)[0]
+    return top if top in functions else MODULE
+
+
+class Fingerprints:
+    """Per-file fingerprints of a working directory, computed on demand."""
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self._files: dict[str, dict[str, str] | None] = {}
+
+    def __call__(self, rel_path: str) -> dict[str, str] | None:
+        if rel_path not in self._files:
+            try:
+                with open(os.path.join(self.root, rel_path), encoding="utf-8") as f:
+                    self._files[rel_path] = fingerprint(f.read())
+            except (OSError, UnicodeDecodeError):
+                self._files[rel_path] = None    # deleted or unreadable
+        return self._files[rel_path]
+
+    def deps(self, touched: dict[str, list[str]]) -> dict[str, dict[str, str | None]]:
+        """Snapshot the hashes a test run depends on."""
+        out: dict[str, dict[str, str | None]] = {}
+        for rel_path, qualnames in touched.items():
+            functions = self(rel_path) or {}
+            names = {owner(q, functions) for q in qualnames} | {MODULE}
+            out[rel_path] = {name: functions.get(name) for name in sorted(names)}
+        return out
+
+    def unchanged(self, deps: dict[str, dict[str, str | None]]) -> bool:
+        for rel_path, hashes in deps.items():
+            functions = self(rel_path) or {}
+            if any(functions.get(name) != h for name, h in hashes.items()):
+                return False
+        return True
+
+
+class Index:
+    """
+    The on-disk index: per test its last outcome and the fingerprints it
+    depended on, plus a content hash of every source file at the last run
+    (used to report what changed in between).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.tests: dict[str, dict] = {}
+        self.files: dict[str, str] = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.tests, self.files = data["tests"], data["files"]
+        except (OSError, ValueError, KeyError):
+            pass                                # missing or corrupt: start over
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"tests": self.tests, "files": self.files}, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def source_hashes(root: str) -> dict[str, str]:
+    """Content hash of every .py file under *root*, keyed by relative path."""
+    out: dict[str, str] = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".") and d != "__pycache__"]
+        for name in filenames:
+            if name.endswith(".py"):
+                path = os.path.join(dirpath, name)
+                with open(path, "rb") as f:
+                    out[os.path.relpath(path, root)] = hashlib.sha1(f.read()).hexdigest()[:16]
+    return out
+
+
+# ── runner child ─────────────────────────────────────────────────
+
+def _test_name(test) -> str:
+    return f"{type(test).__qualname__}.{test._testMethodName}"
+
+
+def _run(test_file: str, skip: set[str], results_path: str) -> None:
+    import importlib
+    import unittest
+
+    root = os.getcwd()
+    sys.path.insert(0, root)
+    module = importlib.import_module(os.path.splitext(test_file)[0].replace(os.sep, "."))
+    tests = []
+    pending = [unittest.defaultTestLoader.loadTestsFromModule(module)]
+    while pending:                              # flatten nested suites
+        for item in pending.pop():
+            (pending if isinstance(item, unittest.TestSuite) else tests).append(item)
+
+    mon = sys.monitoring
+    tool = mon.COVERAGE_ID
+    touched: set[tuple[str, str]] = set()
+
+    def on_start(code, offset):
+        if code.co_filename.startswith(root + os.sep):
+            touched.add((os.path.relpath(code.co_filename, root), code.co_qualname))
+        return mon.DISABLE                      # once per code object per test
+
+    records: dict[str, dict] = {}
+
+    class Result(unittest.TestResult):
+        def startTest(self, test):
+            touched.clear()
+            mon.restart_events()
+            super().startTest(test)
+
+        def _record(self, test, outcome, detail=""):
+            by_file: dict[str, list[str]] = {}
+            for rel_path, qualname in touched:
+                by_file.setdefault(rel_path, []).append(qualname)
+            records[_test_name(test)] = {
+                "outcome": outcome, "detail": detail, "touched": by_file,
+            }
+
+        def addSuccess(self, test):
+            super().addSuccess(test)
+            self._record(test, "ok")
+
+        def addFailure(self, test, err):
+            super().addFailure(test, err)
+            self._record(test, "FAIL", self.failures[-1][1])
+
+        def addError(self, test, err):
+            super().addError(test, err)
+            self._record(test, "ERROR", self.errors[-1][1])
+
+        def addSkip(self, test, reason):
+            super().addSkip(test, reason)
+            self._record(test, "skipped", reason)
+
+        def addExpectedFailure(self, test, err):
+            super().addExpectedFailure(test, err)
+            self._record(test, "expected failure")
+
+        def addUnexpectedSuccess(self, test):
+            super().addUnexpectedSuccess(test)
+            self._record(test, "unexpected success")
+
+    selected = [t for t in tests if _test_name(t) not in skip]
+    mon.use_tool_id(tool, "test_impact")
+    mon.register_callback(tool, mon.events.PY_START, on_start)
+    mon.set_events(tool, mon.events.PY_START)
+    try:
+        result = Result()
+        result.buffer = True                    # test output goes into the tracebacks
+        unittest.TestSuite(selected).run(result)
+    finally:
+        mon.set_events(tool, 0)
+        mon.free_tool_id(tool)
+
+    # errors outside any test (e.g. setUpClass) have no record of their own
+    for test, detail in result.errors:
+        if not hasattr(test, "_testMethodName"):
+            records[str(test)] = {"outcome": "ERROR", "detail": detail, "touched": {}}
+
+    with open(results_path, "w", encoding="utf-8") as f:
+        json.dump({"all": [_test_name(t) for t in tests], "ran": records}, f)
+
+
+if __name__ == "__main__":
+    # test_impact.py TEST_FILE RESULTS_PATH < skip-list JSON
+    _run(sys.argv[1], set(json.load(sys.stdin)), sys.argv[2])
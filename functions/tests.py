@@ -0,0 +1,573 @@
+# functions/tests.py  (run from the project root: python -m unittest functions.tests)
+import asyncio
+import json
+import os
+import pkgutil
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from google.genai import types
+
+import functions
+from functions import code_index
+from functions import get_file_content as gfc
+from functions import dispatcher
+from functions.dispatcher import call_functions, call_functions_async
+from functions.get_files_info import ListingCache, get_files_info
+from functions.patch_file import patch_file
+from functions import run_python
+from functions.run_python import run_python_file, run_python_file_async, use_warm_pool
+from functions.run_tests import INDEX_DIR, run_tests
+from functions.search_code import search_code
+from functions.test_impact import MODULE, fingerprint
+from functions.warm_pool import WarmPool
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def call(name, **args):
+    return types.FunctionCall(name=name, args=args)
+
+
+def results(content):
+    return [p.function_response.response["result"] for p in content.parts]
+
+
+class TempDirTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        write(os.path.join(self.tmp, "pkg", "mod.py"), "x = 1\n")
+
+
+class TestDispatcher(TempDirTestCase):
+    def run_calls(self, *calls, **kwargs):
+        return results(call_functions(list(calls), workdir=self.tmp, **kwargs))
+
+    def test_listing_cache_is_per_session(self):
+        mine, theirs = ListingCache(), ListingCache()
+        pkg = os.path.join(self.tmp, "pkg")
+        mtime = os.stat(pkg).st_mtime_ns
+        self.run_calls(call("get_files_info", directory="pkg"), listings=mine)
+        self.assertIsNotNone(mine.get(pkg, mtime))
+        self.assertIsNone(theirs.get(pkg, mtime))
+
+    def test_write_invalidates_the_sessions_listing(self):
+        listings = ListingCache()
+        before, = self.run_calls(call("get_files_info", directory="pkg"), listings=listings)
+        # same directory mtime, bigger file: only invalidation can notice
+        self.run_calls(
+            call("patch_file", file_path="pkg/mod.py",
+                 edits=[{"search": "x = 1", "replace": "x = 1000000"}]),
+            listings=listings,
+        )
+        after, = self.run_calls(call("get_files_info", directory="pkg"), listings=listings)
+        self.assertIn("file_size=6 bytes", before)
+        self.assertIn("file_size=12 bytes", after)
+
+    def test_parallel_reads_keep_call_order_and_writes_stay_serial(self):
+        events, lock = [], threading.Lock()
+
+        def log(event):
+            with lock:
+                events.append(event)
+
+        def fake_search(working_directory, query, index=None):
+            log(("start", query))
+            time.sleep(0.2 - 0.05 * int(query))     # later calls finish first
+            log(("end", query))
+            return query
+
+        def fake_write(working_directory, file_path, content):
+            log(("write", content))
+            return content
+
+        calls = [call("search_code", query=q) for q in "012"]
+        calls += [call("write_file", file_path="pkg/w.py", content="w"), call("search_code", query="3")]
+        with mock.patch.dict(dispatcher.FUNC_MAP, search_code=fake_search, write_file=fake_write):
+            for run in (
+                lambda: call_functions(calls, workdir=self.tmp),
+                lambda: asyncio.run(call_functions_async(calls, workdir=self.tmp)),
+            ):
+                events.clear()
+                self.assertEqual(results(run()), ["0", "1", "2", "w", "3"])
+                self.assertEqual({e[0] for e in events[:3]}, {"start"})   # ran together
+                self.assertEqual(events[6:], [("write", "w"), ("start", "3"), ("end", "3")])
+
+    def test_read_after_write_sees_the_write(self):
+        path = "pkg/mod.py"
+        before, _, after = self.run_calls(
+            call("get_file_content", file_path=path),
+            call("patch_file", file_path=path, edits=[{"search": "x = 1", "replace": "x = 2"}]),
+            call("get_file_content", file_path=path),
+        )
+        self.assertEqual((before, after), ("x = 1\n", "x = 2\n"))
+
+
+class TestRangedReads(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        write(os.path.join(self.tmp, "notes.txt"), "".join(f"line {i} é\n" for i in range(1, 6)))
+
+    def read(self, **kwargs):
+        return gfc.get_file_content(self.tmp, "notes.txt", **kwargs)
+
+    def test_line_range(self):
+        text = self.read(start_line=2, end_line=3)
+        self.assertEqual(
+            text.splitlines(),
+            ['[File "notes.txt": 50 bytes, 5 lines; showing lines 2-3]', "line 2 é", "line 3 é"],
+        )
+
+    def test_start_past_end_is_an_error(self):
+        self.assertTrue(self.read(start_line=100).startswith("Error: start_line 100 is past the end"))
+        self.assertTrue(self.read(offset=51).startswith("Error: offset 51 is past the end"))
+
+    def test_byte_slices_keep_whole_characters(self):
+        # "line 1 é\n": é is bytes 7-8; start inside it, end inside the next one
+        text = self.read(offset=8, length=10)
+        header, data = text.split("\n", 1)
+        self.assertEqual(header, '[File "notes.txt": 50 bytes, 5 lines; showing bytes 9-19]')
+        self.assertEqual(data, "\nline 2 é")
+        self.assertNotIn("\ufffd", data)
+
+    def test_line_count_is_computed_once_per_version(self):
+        calls = []
+        real = gfc._count_lines
+        gfc._count_lines = lambda buf: calls.append(1) or real(buf)
+        self.addCleanup(setattr, gfc, "_count_lines", real)
+        self.read(start_line=1, end_line=1)
+        self.read(offset=10, length=5)
+        self.assertEqual(len(calls), 1)
+        write(os.path.join(self.tmp, "notes.txt"), "changed\n")
+        self.assertIn("1 lines", self.read(start_line=1))
+        self.assertEqual(len(calls), 2)
+
+
+class TestPatchFile(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp, "pkg", "letters.txt")
+        write(self.path, "a\nb\nc\nd\ne\n")
+
+    def patch(self, **kwargs):
+        return patch_file(self.tmp, "pkg/letters.txt", **kwargs)
+
+    def test_edits(self):
+        result = self.patch(edits=[{"search": "b\n", "replace": "B\n"}, {"search": "e", "replace": "E"}])
+        self.assertTrue(result.startswith("Successfully patched"), result)
+        self.assertEqual(read(self.path), "a\nB\nc\nd\nE\n")
+
+    def test_insertion_hunk_goes_after_line_n(self):
+        self.patch(diff="@@ -2,0 +3,1 @@\n+X\n")
+        self.assertEqual(read(self.path), "a\nb\nX\nc\nd\ne\n")
+
+    def test_insertion_at_start(self):
+        self.patch(diff="@@ -0,0 +1 @@\n+X\n")
+        self.assertEqual(read(self.path), "X\na\nb\nc\nd\ne\n")
+
+    def test_deletion_hunk(self):
+        self.patch(diff="--- a/pkg/letters.txt\n+++ b/pkg/letters.txt\n@@ -2,3 +2,2 @@\n b\n-c\n d\n")
+        self.assertEqual(read(self.path), "a\nb\nd\ne\n")
+
+    def test_removing_a_line_that_starts_with_dashes(self):
+        write(self.path, "a\n-- note\nb\n")
+        self.patch(diff="@@ -1,3 +1,2 @@\n a\n--- note\n b\n")
+        self.assertEqual(read(self.path), "a\nb\n")
+
+    def test_fuzzy_offset(self):
+        # the hunk says line 1, but "d" is on line 4
+        self.patch(diff="@@ -1,1 +1,1 @@\n-d\n+D\n")
+        self.assertEqual(read(self.path), "a\nb\nc\nD\ne\n")
+
+    def test_failures_are_reported_and_nothing_is_written(self):
+        result = self.patch(diff="@@ -1,1 +1,1 @@\n-a\n+A\n@@ -3,1 +3,1 @@\n-zzz\n+c\n")
+        self.assertTrue(result.startswith("Error: 1 hunk(s) failed"), result)
+        failed = json.loads(result.split("file left unchanged: ", 1)[1])
+        self.assertEqual([(f["hunk"], f["reason"]) for f in failed], [(2, "context not found")])
+        self.assertEqual(read(self.path), "a\nb\nc\nd\ne\n")
+
+        result = self.patch(edits=[{"search": "\n", "replace": ""}])
+        self.assertIn("matches 5 times", result)
+
+    def test_stays_inside_pkg(self):
+        self.assertTrue(patch_file(self.tmp, "../x.py", edits=[{"search": "a", "replace": "b"}]).startswith("Error:"))
+
+
+class TestRunPython(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        write(os.path.join(self.tmp, "loud.py"), (
+            "import sys\n"
+            "sys.stdout.write('x' * int(sys.argv[1]))\n"
+            "sys.stderr.write('oops')\n"
+            "sys.exit(int(sys.argv[2]))\n"
+        ))
+
+    def run_both(self, *args, **limits):
+        sync = run_python_file(self.tmp, "loud.py", list(args), **limits)
+        async_ = asyncio.run(run_python_file_async(self.tmp, "loud.py", list(args), **limits))
+        return sync, async_
+
+    def test_output_exit_code_and_stats(self):
+        for text in self.run_both("3", "2"):
+            self.assertTrue(text.startswith("STDOUT:\nxxx\nSTDERR:\noops\n"), text)
+            self.assertIn("Process exited with code 2", text)
+            self.assertRegex(text, r"\[wall time [\d.]+s, peak RSS ([\d.]+ MiB|n/a)\]$")
+
+    def test_head_and_tail_window(self):
+        for text in self.run_both("100", "0", head_bytes=10, tail_bytes=5):
+            self.assertIn("xxxxxxxxxx\n[... 85 bytes of output dropped ...]\nxxxxx", text)
+
+    def test_output_limit_kills_the_child(self):
+        for text in self.run_both("10000000", "0", max_output_bytes=1000):
+            self.assertIn("Process killed after", text)
+
+    def test_timeout(self):
+        write(os.path.join(self.tmp, "slow.py"), "import time\ntime.sleep(30)\n")
+        self.addCleanup(setattr, run_python, "TIMEOUT", run_python.TIMEOUT)
+        run_python.TIMEOUT = 0.2
+        for text in (
+            run_python_file(self.tmp, "slow.py"),
+            asyncio.run(run_python_file_async(self.tmp, "slow.py")),
+        ):
+            self.assertIn("timed out after 0.2 seconds", text)
+
+    def test_limits_are_validated(self):
+        for limits in ({"head_bytes": -1}, {"tail_bytes": "10"}, {"max_output_bytes": 1.5}):
+            for text in self.run_both("1", "0", **limits):
+                self.assertTrue(text.startswith("Error: "), text)
+                self.assertIn("must be a non-negative integer", text)
+        for text in self.run_both("3", "0", head_bytes=2500.0):
+            self.assertTrue(text.startswith("STDOUT:\nxxx"), text)
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "the warm pool needs os.fork")
+class TestWarmPool(TestRunPython):
+    """Every TestRunPython case again, run in forked children of a zygote."""
+
+    def setUp(self):
+        super().setUp()
+        self.pool = WarmPool(1)
+        self.addCleanup(self.pool.close)
+        use_warm_pool(self.pool)
+        self.addCleanup(use_warm_pool, None)
+
+    def cold(self, *args, **kwargs):
+        use_warm_pool(None)
+        try:
+            return run_python_file(*args, **kwargs)
+        finally:
+            use_warm_pool(self.pool)
+
+    def test_output_matches_cold_runs(self):
+        write(os.path.join(self.tmp, "crash.py"), "print('hi')\nraise ValueError('boom')\n")
+        for file_path, args, limits in [
+            ("loud.py", ["3", "2"], {}),
+            ("loud.py", ["100", "0"], {"head_bytes": 10, "tail_bytes": 5}),
+            ("loud.py", ["100000", "0"], {"head_bytes": 0, "tail_bytes": 0}),
+            ("crash.py", [], {}),
+        ]:
+            with self.subTest(file_path=file_path, args=args):
+                warm = run_python_file(self.tmp, file_path, args, **limits)
+                cold = self.cold(self.tmp, file_path, args, **limits)
+                # everything but the final "[wall time …, peak RSS …]" line
+                self.assertEqual(warm.rsplit("\n", 1)[0], cold.rsplit("\n", 1)[0])
+                self.assertRegex(warm, r"peak RSS [\d.]+ MiB\]$")
+
+    def test_output_limit_stops_the_child_promptly(self):
+        text = run_python_file(self.tmp, "loud.py", ["100000000", "0"], max_output_bytes=1000)
+        killed_at = int(text.split("Process killed after ", 1)[1].split()[0])
+        self.assertLess(killed_at, 1000 + 2 * (1 << 16))   # pipe buffer + one read
+
+    def test_broken_zygote_is_replaced(self):
+        zygote = self.pool._idle.queue[0]
+        zygote.proc.kill()
+        zygote.proc.wait()
+        self.assertTrue(run_python_file(self.tmp, "loud.py", ["1", "0"]).startswith("Error:"))
+        self.assertTrue(run_python_file(self.tmp, "loud.py", ["1", "0"]).startswith("STDOUT:\nx"))
+
+    def test_close_stops_the_zygotes(self):
+        zygotes = list(self.pool._idle.queue)
+        self.pool.close()
+        self.assertTrue(all(z.proc.poll() is not None for z in zygotes))
+
+
+OPS = """\
+SCALE = 1
+
+
+def add(a, b):
+    return a + b
+
+
+class Ops:
+    def mul(self, a, b):
+        return a * b * SCALE
+"""
+
+OPS_TESTS = """\
+import unittest
+from pkg.ops import Ops, add
+
+
+class TestOps(unittest.TestCase):
+    def test_add(self):
+        self.assertEqual(add(2, 3), 5)
+
+    def test_mul(self):
+        self.assertEqual(Ops().mul(2, 3), 6)
+"""
+
+
+class TestFingerprint(unittest.TestCase):
+    def test_one_hash_per_function(self):
+        prints = fingerprint(OPS)
+        self.assertEqual(set(prints), {"add", "Ops.mul", MODULE})
+        edited = fingerprint(OPS.replace("a * b", "b * a"))
+        self.assertEqual({k for k in prints if prints[k] != edited[k]}, {"Ops.mul"})
+        edited = fingerprint(OPS.replace("SCALE = 1", "SCALE = 2"))
+        self.assertEqual({k for k in prints if prints[k] != edited[k]}, {MODULE})
+
+    def test_syntax_error_hashes_the_whole_file(self):
+        self.assertEqual(set(fingerprint("def (:")), {MODULE})
+
+
+class TestRunTests(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        write(os.path.join(self.tmp, "pkg", "__init__.py"), "")
+        write(os.path.join(self.tmp, "pkg", "ops.py"), OPS)
+        write(os.path.join(self.tmp, "tests.py"), OPS_TESTS)
+
+    def edit(self, old, new):
+        path = os.path.join(self.tmp, "pkg", "ops.py")
+        write(path, read(path).replace(old, new))
+
+    def test_only_dependent_tests_rerun(self):
+        self.assertTrue(run_tests(self.tmp).startswith("Ran 2 of 2 tests"))
+
+        cached = run_tests(self.tmp)
+        self.assertTrue(cached.startswith("Ran 0 of 2 tests (2 unaffected"), cached)
+        self.assertTrue(cached.endswith("OK (ok=2)"), cached)
+
+        self.edit("return a * b", "return a * b + 1")
+        text = run_tests(self.tmp)
+        self.assertTrue(text.startswith("Ran 1 of 2 tests"), text)
+        self.assertIn("changed since last run: pkg/ops.py", text)
+        self.assertIn("FAIL: TestOps.test_mul\n", text)
+
+        # the failure is reused until mul changes again; add is still cached
+        self.edit("def add(a, b):", "def add(a, b):  # sum")
+        text = run_tests(self.tmp)
+        self.assertTrue(text.startswith("Ran 1 of 2 tests"), text)
+        self.assertIn("FAIL: TestOps.test_mul (cached)", text)
+
+        self.edit("SCALE = 1", "SCALE = 1  # no-op")   # module level: every test
+        self.assertTrue(run_tests(self.tmp).startswith("Ran 2 of 2 tests"))
+        self.assertTrue(run_tests(self.tmp, run_all=True).startswith("Ran 2 of 2 tests"))
+
+    def test_index_lives_in_the_project(self):
+        run_tests(self.tmp)
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp, INDEX_DIR))), 1)
+        self.assertFalse(os.path.exists(INDEX_DIR))
+
+        copy = os.path.join(self.tmp, "copy")
+        shutil.copytree(self.tmp, copy, ignore=shutil.ignore_patterns("copy"))
+        self.assertTrue(run_tests(copy).startswith("Ran 0 of 2 tests"))
+
+        listing = results(call_functions([call("get_files_info")], workdir=self.tmp))[0]
+        self.assertNotIn(INDEX_DIR, listing)
+
+
+SHAPES = """\
+AREA_UNITS = "cm2"
+
+
+class Square:
+    def area(self, side):
+        return side * side
+
+
+def describe(shape):
+    return f"{shape} in {AREA_UNITS}"
+"""
+
+
+class TestFilesTree(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        write(os.path.join(self.tmp, "pkg", "sub", "deep.py"), "")
+        write(os.path.join(self.tmp, "pkg", "notes.txt"), "hi\n")
+        write(os.path.join(self.tmp, "top.py"), "")
+
+    def tree(self, **kwargs):
+        return get_files_info(self.tmp, **kwargs).splitlines()
+
+    def test_depth(self):
+        self.assertEqual(self.tree(recursive=True, max_depth=1), ["pkg/", "top.py 0"])
+        self.assertEqual(
+            self.tree(recursive=True, max_depth=2),
+            ["pkg/", "  mod.py 6", "  notes.txt 3", "  sub/", "top.py 0"],
+        )
+        self.assertIn("    deep.py 0", self.tree(recursive=True))
+
+    def test_include_lists_matching_files_and_their_directories(self):
+        self.assertEqual(
+            self.tree(recursive=True, include="*.py"),
+            ["pkg/", "  mod.py 6", "  sub/", "    deep.py 0", "top.py 0"],
+        )
+        self.assertEqual(
+            self.tree(recursive=True, include="pkg/sub/*"), ["pkg/", "  sub/", "    deep.py 0"],
+        )
+        self.assertEqual(self.tree(recursive=True, include="*.rs"), ["(no matching entries)"])
+
+    def test_exclude_skips_files_and_whole_directories(self):
+        self.assertEqual(
+            self.tree(recursive=True, exclude=["sub", "*.txt"]), ["pkg/", "  mod.py 6", "top.py 0"],
+        )
+
+    def test_pruned_and_tool_state_directories_are_not_listed(self):
+        for name in (".git", "__pycache__", ".code_index", ".test_impact"):
+            write(os.path.join(self.tmp, "pkg", name, "x.py"), "")
+        self.assertEqual(
+            self.tree(recursive=True),
+            ["pkg/", "  mod.py 6", "  notes.txt 3", "  sub/", "    deep.py 0", "top.py 0"],
+        )
+        listing = get_files_info(self.tmp, "pkg")
+        self.assertNotIn(".code_index", listing)
+        self.assertNotIn(".test_impact", listing)
+
+    def test_truncation(self):
+        tree = self.tree(recursive=True, max_entries=3)
+        self.assertEqual(tree[:3], ["pkg/", "  mod.py 6", "  notes.txt 3"])
+        self.assertTrue(tree[3].startswith("... stopped after 3 entries"))
+        self.assertEqual(len(tree), 4)
+
+    def test_include_ancestors_count_against_max_entries(self):
+        for max_entries in range(1, 6):
+            with self.subTest(max_entries):
+                tree = self.tree(recursive=True, include="*.py", max_entries=max_entries)
+                entries = [line for line in tree if not line.startswith("...")]
+                self.assertLessEqual(len(entries), max_entries)
+                self.assertEqual(len(entries) < 5, tree[-1].startswith("... stopped"))
+        # pkg/ + sub/ + deep.py do not fit in 2: stop rather than show bare directories
+        self.assertEqual(
+            self.tree(recursive=True, include="pkg/sub/*", max_entries=2)[0][:11], "... stopped",
+        )
+
+
+class TestSearchCode(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        write(os.path.join(self.tmp, "pkg", "shapes.py"), SHAPES)
+        self.index = code_index.CodeIndex()
+
+    def search(self, query, **kwargs):
+        return search_code(self.tmp, query, index=self.index, **kwargs).splitlines()
+
+    def test_text(self):
+        self.assertEqual(self.search("side * SIDE"), [
+            '1 matches for "side * SIDE" (text)', "pkg/shapes.py:6: return side * side",
+        ])
+        self.assertEqual(self.search("side * SIDE", case_sensitive=True)[0],
+                         'No matches for "side * SIDE" (text)')
+        self.assertEqual(len(self.search("AREA_UNITS", path="pkg/mod.py")), 1)
+
+    def test_symbol(self):
+        self.assertEqual(self.search("area", mode="symbol"), [
+            '1 matches for "area" (symbol)', "pkg/shapes.py:5: method Square.area",
+        ])
+        self.assertEqual(self.search("Square.area", mode="symbol")[1:], ["pkg/shapes.py:5: method Square.area"])
+        self.assertEqual(self.search("area_units", mode="symbol")[1:], ["pkg/shapes.py:1: variable AREA_UNITS"])
+
+    def test_regex(self):
+        self.assertEqual(self.search(r"^def \w+\(", mode="regex")[1:], ["pkg/shapes.py:9: def describe(shape):"])
+        self.assertTrue(self.search("(", mode="regex")[0].startswith("Error: invalid regular expression"))
+
+    def test_index_lives_in_the_project(self):
+        self.search("x")
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp, code_index.INDEX_DIR, "index.json")))
+        self.assertFalse(os.path.exists(code_index.INDEX_DIR))
+        listing = results(call_functions([call("get_files_info")], workdir=self.tmp))[0]
+        self.assertNotIn(code_index.INDEX_DIR, listing)
+
+    def test_write_file_invalidates(self):
+        path = os.path.join(self.tmp, "pkg", "mod.py")
+        search = call("search_code", query="y = 2")
+        self.assertIn("No matches", results(call_functions([search], workdir=self.tmp))[0])
+        mtime = os.stat(path).st_mtime_ns
+        call_functions([call("write_file", file_path="pkg/mod.py", content="y = 2\n")], workdir=self.tmp)
+        os.utime(path, ns=(mtime, mtime))      # same size and mtime: only invalidation tells
+        self.assertIn("pkg/mod.py:1: y = 2", results(call_functions([search], workdir=self.tmp))[0])
+
+    def test_indexing_one_project_does_not_block_another(self):
+        other = os.path.join(self.tmp, "other")
+        write(os.path.join(other, "b.py"), "def b(): pass\n")
+        release = threading.Event()
+        real = code_index.read_text
+
+        def slow_read(path):
+            if path.startswith(os.path.join(self.tmp, "pkg")):
+                release.wait(5)
+            return real(path)
+
+        code_index.read_text = slow_read
+        self.addCleanup(setattr, code_index, "read_text", real)
+        blocked = threading.Thread(target=search_code, args=(os.path.join(self.tmp, "pkg"), "x"),
+                                   kwargs={"index": self.index})
+        blocked.start()
+        try:
+            done = []
+            searcher = threading.Thread(target=lambda: done.append(
+                search_code(other, "b", mode="symbol", index=self.index)))
+            searcher.start()
+            searcher.join(2)
+            self.assertEqual(done, ['1 matches for "b" (symbol)\nb.py:1: function b'])
+        finally:
+            release.set()
+            blocked.join()
+
+
+class TestLazyImports(unittest.TestCase):
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    NEEDS_SDK = {"functions.dispatcher", "functions.tests"}   # build Content/Part objects
+
+    def imports_genai(self, code):
+        proc = subprocess.run(
+            [sys.executable, "-c", code + "\nimport sys; print('google.genai' in sys.modules)"],
+            cwd=self.ROOT, capture_output=True, text=True, timeout=60,
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        return proc.stdout.split()[-1] == "True"
+
+    def test_tool_modules_and_main_do_not_import_the_sdk(self):
+        names = sorted(
+            f"functions.{m.name}" for m in pkgutil.iter_modules(functions.__path__)
+        )
+        tools = [name for name in names if name not in self.NEEDS_SDK]
+        self.assertIn("functions.run_python", tools)
+        self.assertFalse(self.imports_genai(f"import main, {', '.join(tools)}"))
+
+    def test_schema_access_imports_the_sdk(self):
+        self.assertTrue(self.imports_genai("from functions.write_file import schema_write_file"))
+
+
+if __name__ == "__main__":
+    unittest.main()
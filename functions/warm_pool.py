@@ -0,0 +1,326 @@
+"""
+A pool of pre-started "zygote" interpreters for `run_python_file`.
+
+Each zygote is a long-lived Python process that has already paid interpreter
+startup and imported common stdlib modules.  It never runs user code
+itself: for every request it forks a fresh child, which redirects
+stdout/stderr, switches to the requested cwd and runs the script with
+`runpy` as `__main__`, exactly like `python script.py args...`.
+
+The child writes into two pipes that the zygote reads as the output
+arrives, keeping only a head and tail window of each stream; it kills the
+child as soon as the combined output passes the limit (the pipe buffer
+bounds how far it can overshoot), reaps it with `os.wait4` (for its peak
+RSS) and replies with the windows.
+Requests and results travel as JSON lines over the zygote's stdin/stdout.
+POSIX only (needs `os.fork`).
+"""
+from __future__ import annotations
+import json
+import os
+import queue
+import select
+import signal
+import subprocess
+import sys
+import time
+from typing import Optional
+
+READ_CHUNK = 1 << 16
+
+# Modules imported once by every zygote.  Only the stdlib: project modules
+# must be imported fresh in each child so edits are always picked up.
+PRELOAD = (
+    "argparse", "array", "collections", "dataclasses", "decimal", "fractions",
+    "itertools", "json", "math", "re", "runpy", "traceback", "typing", "unittest",
+)
+
+
+class _Zygote:
+    def __init__(self, preload: tuple[str, ...]) -> None:
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), *preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._buf = b""
+
+    def _readline(self, timeout: Optional[float]) -> dict:
+        fd = self.proc.stdout.fileno()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while b"\n" not in self._buf:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                raise TimeoutError
+            chunk = os.read(fd, 1 << 16)
+            if not chunk:
+                raise EOFError("warm interpreter exited")
+            self._buf += chunk
+        line, self._buf = self._buf.split(b"\n", 1)
+        return json.loads(line)
+
+    def run(self, target: str, args: list[str], cwd: str, timeout: float, limits: dict) -> dict:
+        request = {"target": target, "args": args, "cwd": cwd, **limits}
+        self.proc.stdin.write(json.dumps(request).encode() + b"\n")
+        self.proc.stdin.flush()
+
+        pid = self._readline(timeout)["pid"]
+        try:
+            reply = self._readline(timeout)
+        except TimeoutError:
+            os.kill(pid, signal.SIGKILL)
+            self._readline(None)            # zygote reaps the child and replies
+            raise subprocess.TimeoutExpired([sys.executable, target, *args], timeout)
+        return reply
+
+    def close(self) -> None:
+        self.proc.kill()
+        self.proc.wait()
+        for pipe in (self.proc.stdin, self.proc.stdout):
+            try:
+                pipe.close()
+            except OSError:                     # unflushed request to a dead zygote
+                pass
+
+
+class WarmPool:
+    """`size` zygotes; each serves one run at a time."""
+
+    def __init__(self, size: int = 2, preload: tuple[str, ...] = PRELOAD) -> None:
+        if not hasattr(os, "fork"):
+            raise RuntimeError("the warm interpreter pool needs os.fork")
+        self.preload = preload
+        self._idle: queue.Queue[_Zygote] = queue.Queue()
+        for _ in range(size):
+            self._idle.put(_Zygote(preload))
+
+    def run(
+        self,
+        target: str,
+        args: list[str],
+        cwd: str,
+        timeout: float,
+        head: int,
+        tail: int,
+        max_output: int,
+    ) -> dict:
+        """
+        Run *target* in a forked child.  Returns a dict with "returncode",
+        "wall", "peak_rss_kb", "killed_at" (output bytes when the
+        *max_output* limit tripped, else None) and, for "stdout" and
+        "stderr", a [head, tail, dropped_bytes] window.
+        """
+        limits = {"head": head, "tail": tail, "max_output": max_output}
+        zygote = self._idle.get()
+        try:
+            return zygote.run(target, args, cwd, timeout, limits)
+        except (EOFError, OSError, ValueError):
+            zygote.close()                  # replace a broken zygote
+            zygote = _Zygote(self.preload)
+            raise
+        finally:
+            self._idle.put(zygote)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# ── zygote side ──────────────────────────────────────────────────
+
+def _exit_code(exc: SystemExit) -> int:
+    # same rules as the interpreter's handling of an uncaught SystemExit
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+def _child(request: dict, out_fd: int, err_fd: int) -> None:
+    import runpy
+    import traceback
+
+    code = 1
+    try:
+        os.dup2(out_fd, 1)
+        os.dup2(err_fd, 2)
+        os.close(out_fd)
+        os.close(err_fd)
+        os.chdir(request["cwd"])
+        sys.argv = [request["target"], *request["args"]]
+        sys.path[0] = os.path.dirname(request["target"])
+        try:
+            runpy.run_path(request["target"], run_name="__main__")
+            code = 0
+        except SystemExit as exc:
+            code = _exit_code(exc)
+        except BaseException as exc:
+            # hide the zygote/runpy frames, like a plain `python script.py`
+            tb = exc.__traceback__
+            while tb is not None and tb.tb_frame.f_code.co_filename != request["target"]:
+                tb = tb.tb_next
+            traceback.print_exception(type(exc), exc, tb or exc.__traceback__)
+            code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+class _Window:
+    """The first *head* and last *tail* bytes of a stream, and its size."""
+
+    def __init__(self, head: int, tail: int) -> None:
+        self.head_limit, self.tail_limit = head, tail
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def feed(self, chunk: bytes) -> None:
+        self.total += len(chunk)
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk and self.tail_limit > 0:
+            self.tail += chunk
+            if len(self.tail) > self.tail_limit:
+                del self.tail[:len(self.tail) - self.tail_limit]
+
+    def reply(self) -> list:
+        """[head_text, tail_text, dropped_bytes]"""
+        return [
+            self.head.decode("utf-8", errors="replace"),
+            self.tail.decode("utf-8", errors="replace"),
+            self.total - len(self.head) - len(self.tail),
+        ]
+
+
+def _pidfd(pid: int) -> Optional[int]:
+    """A descriptor that turns readable when *pid* exits (Linux), else None."""
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        return None
+
+
+def _collect(
+    pid: int, out_fd: int, err_fd: int, request: dict
+) -> tuple[int, int, Optional[int], _Window, _Window]:
+    """
+    Read the child's pipes until it exits, killing it once its output
+    passes request["max_output"] bytes; then reap it.  Returns
+    (returncode, ru_maxrss, killed_at, stdout window, stderr window).
+    """
+    windows = {fd: _Window(request["head"], request["tail"]) for fd in (out_fd, err_fd)}
+    max_output = request["max_output"]
+    killed_at = None
+    exit_fd = _pidfd(pid)
+    reaped = None
+
+    def read(fd: int) -> bool:
+        nonlocal killed_at
+        chunk = os.read(fd, READ_CHUNK)
+        if not chunk:
+            return False
+        windows[fd].feed(chunk)
+        total = sum(w.total for w in windows.values())
+        if max_output and total > max_output and killed_at is None:
+            killed_at = total
+            os.kill(pid, signal.SIGKILL)
+        return True
+
+    try:
+        live = [out_fd, err_fd]
+        while live and reaped is None:
+            watch = live if exit_fd is None else [*live, exit_fd]
+            # without a pidfd, look for an exited child every 50 ms
+            ready, _, _ = select.select(watch, [], [], None if exit_fd is not None else 0.05)
+            for fd in ready:
+                if fd != exit_fd and not read(fd):
+                    live.remove(fd)
+            if exit_fd is None or exit_fd in ready:
+                wpid, status, rusage = os.wait4(pid, os.WNOHANG)
+                if wpid:
+                    reaped = status, rusage
+        if reaped is None:                      # both pipes closed
+            reaped = os.wait4(pid, 0)[1:]
+        else:
+            # the child is gone; take what is buffered, but do not wait for
+            # a grandchild that may still hold the pipes open
+            for fd in live:
+                os.set_blocking(fd, False)
+                try:
+                    while read(fd):
+                        pass
+                except BlockingIOError:
+                    pass
+    finally:
+        if exit_fd is not None:
+            os.close(exit_fd)
+    status, rusage = reaped
+    return (
+        os.waitstatus_to_exitcode(status), rusage.ru_maxrss, killed_at,
+        windows[out_fd], windows[err_fd],
+    )
+
+
+def _zygote_main(preload: list[str]) -> None:
+    import importlib
+
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+    # keep the protocol pipes on private fds; children inherit /dev/null
+    proto_in = os.fdopen(os.dup(0), "rb")
+    proto_out = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    def send(message: dict) -> None:
+        proto_out.write(json.dumps(message).encode() + b"\n")
+        proto_out.flush()
+
+    for line in proto_in:
+        request = json.loads(line)
+        (out_r, out_w), (err_r, err_w) = os.pipe(), os.pipe()
+        start = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            os.close(out_r)
+            os.close(err_r)
+            _child(request, out_w, err_w)
+        os.close(out_w)
+        os.close(err_w)
+        send({"pid": pid})
+        try:
+            returncode, peak_rss, killed_at, out, err = _collect(pid, out_r, err_r, request)
+        finally:
+            os.close(out_r)
+            os.close(err_r)
+        if sys.platform == "darwin":
+            peak_rss //= 1024                   # bytes on macOS, KiB elsewhere
+        send({
+            "returncode": returncode,
+            "wall": time.monotonic() - start,
+            "peak_rss_kb": peak_rss,
+            "killed_at": killed_at,
+            "stdout": out.reply(),
+            "stderr": err.reply(),
+        })
+
+if __name__ == "__main__":
+    _zygote_main(sys.argv[1:])
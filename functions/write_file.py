@@ -2,6 +2,7 @@
 from __future__ import annotations
 import os
 
+from functions.schema import lazy_schema
 
 
 def write_file(working_directory: str, file_path: str, content: str) -> str:
@@ -44,16 +45,19 @@ def write_file(working_directory: str, file_path: str, content: str) -> str:
     except Exception as exc:
         return f"Error: {exc}"
 
-from google.genai import types
-
-schema_write_file = types.FunctionDeclaration(
-    name="write_file",
-    description="Write or overwrite a text file with the given content.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(type=types.Type.STRING),
-            "content":   types.Schema(type=types.Type.STRING),
-        },
-    ),
-)
+
+def _schema(types):
+    return types.FunctionDeclaration(
+        name="write_file",
+        description="Write or overwrite a text file with the given content.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(type=types.Type.STRING),
+                "content":   types.Schema(type=types.Type.STRING),
+            },
+        ),
+    )
+
+
+__getattr__ = lazy_schema(globals(), "schema_write_file", _schema)
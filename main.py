@@ -1,113 +1,247 @@
 # main.py
+#
+# Only the stdlib is imported at module level: the agent (and with it
+# google.genai) loads after the arguments are parsed, and dotenv only when
+# the Gemini client is built because no other client was given.
+import argparse
+import asyncio
+import atexit
 import os
+import re
 import sys
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-
-# tool schemas
-from functions.get_files_info   import schema_get_files_info
-from functions.get_file_content import schema_get_file_content
-from functions.write_file       import schema_write_file
-from functions.run_python       import schema_run_python_file
-from functions.dispatcher       import call_function
-
-# ── system prompt ───────────────────────────────────────────────
-system_prompt = """
-You are a helpful AI coding agent.
-
-You are working in a repository that has a **calculator package** at
-`calculator/pkg/`.  The main logic lives in `pkg/calculator.py`.
-
-When a user reports a bug in the calculator:
-
-1. Call **get_files_info(directory='pkg')** to confirm the file list.
-2. Call **get_file_content(file_path='pkg/calculator.py')** to inspect the
-   source.
-3. Patch ONLY that file with **write_file(file_path='pkg/calculator.py', …)**.
-   Never create new files (e.g. script.py).
-4. Optionally run **run_python_file(file_path='tests.py')** or
-   **run_python_file(file_path='calculator/main.py', args=[...])** to verify.
-5. After it works, answer in plain text.
-
-Exactly ONE function call per response, no free-text plans.
-Paths must stay relative; `working_directory` is added automatically.
-"""
-
-
-# ── tool registry ────────────────────────────────────────────────
-available_tools = [
-    types.Tool(
-        function_declarations=[
-            schema_get_files_info,
-            schema_get_file_content,
-            schema_run_python_file,
-            schema_write_file,
-        ]
-    )
-]
-
-# ── auth & client ────────────────────────────────────────────────
-load_dotenv()
-client = genai.Client(api_key=os.environ["GEMINI_API_KEY"])
-
-# ── CLI prompt & --verbose flag ─────────────────────────────────
-args = sys.argv[1:] or sys.exit("usage: uv run main.py \"prompt\" [--verbose]")
-verbose = args[-1] == "--verbose"
-if verbose:
-    args = args[:-1]
-
-user_prompt = " ".join(args)
-if verbose:
-    print(f'User prompt: "{user_prompt}"')
 
-# conversation memory
-messages: list[types.Content] = [
-    types.Content(role="user", parts=[types.Part(text=user_prompt)])
-]
 
-# ── dialogue loop ───────────────────────────────────────────────
-for iteration in range(20):
+def main(argv: list[str] | None = None, client=None) -> None:
+    """
+    CLI entry point.  *client* replaces the Gemini client (anything with
+    the `client.aio.models.generate_content_stream` surface, e.g.
+    agent.replay.ReplayClient); by default one is built from GEMINI_API_KEY.
+    """
+    # ── CLI prompt, --verbose & --resume flags ──────────────────
+    parser = argparse.ArgumentParser(
+        usage='uv run main.py "prompt" [--verbose] [--resume SESSION_ID]\n'
+              '       uv run main.py --batch TASKS.jsonl [--output RESULTS.jsonl] [--concurrency N]'
+    )
+    parser.add_argument("prompt", nargs="*")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--resume", metavar="SESSION_ID")
+    parser.add_argument(
+        "--context-budget", type=int, metavar="TOKENS",
+        help="estimated prompt size above which old tool results are compacted "
+             "(default: agent.compaction.DEFAULT_TOKEN_BUDGET)",
+    )
+    parser.add_argument(
+        "--warm-pool", type=int, default=0, metavar="N",
+        help="run run_python_file in N pre-started interpreters (POSIX only)",
+    )
+    parser.add_argument(
+        "--trace", metavar="FILE",
+        help="write per-call timings and tokens as Chrome trace JSON "
+             "(or JSON lines if FILE ends in .jsonl) and print a summary table",
+    )
+    parser.add_argument(
+        "--replay", metavar="SESSION_FILE",
+        help="replay the model turns recorded in a session file instead of "
+             "calling Gemini (no API key needed)",
+    )
+    parser.add_argument(
+        "--cache", action=argparse.BooleanOptionalAction, default=None,
+        help="answer repeated identical model requests from an on-disk cache "
+             "(default: on if AGENT_RESPONSE_CACHE=1); --no-cache always calls the model",
+    )
+    parser.add_argument(
+        "--max-attempts", type=int, default=5, metavar="N",
+        help="attempts per model call; 429/5xx, resets and timeouts are retried with backoff",
+    )
+    parser.add_argument(
+        "--model-timeout", type=float, default=120.0, metavar="SECONDS",
+        help="timeout for one model call attempt, including the streamed reply",
+    )
+    parser.add_argument(
+        "--max-iterations", type=int, metavar="N",
+        help="model turns per session before giving up (default: agent.loop.MAX_ITERATIONS)",
+    )
+    parser.add_argument(
+        "--batch", metavar="TASKS",
+        help='run every task of a JSONL file ({"prompt": ..., "id": ...} per line), '
+             "each in its own copy of the working directory",
+    )
+    parser.add_argument(
+        "--output", metavar="FILE",
+        help="batch results, one JSON line per task (default: TASKS with .results.jsonl)",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4, metavar="N",
+        help="batch tasks run at once",
+    )
+    parser.add_argument(
+        "--rpm", type=float, metavar="N",
+        help="start at most N model requests per minute, across all sessions",
+    )
+    parser.add_argument(
+        "--keep-workdirs", action="store_true",
+        help="keep each batch task's copy of the working directory (path in its result)",
+    )
+    opts = parser.parse_args(argv)
+    if opts.batch and (opts.prompt or opts.resume):
+        parser.error("--batch cannot be combined with a prompt or --resume")
+    if not opts.prompt and not opts.resume and not opts.batch:
+        parser.error("a prompt, --resume SESSION_ID or --batch TASKS is required")
+    if opts.max_iterations is not None and opts.max_iterations < 1:
+        parser.error("--max-iterations must be at least 1")
+    if opts.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if opts.max_attempts < 1:
+        parser.error("--max-attempts must be at least 1")
+    if not opts.model_timeout > 0:
+        parser.error("--model-timeout must be positive")
+    if opts.rpm is not None and not opts.rpm > 0:
+        parser.error("--rpm must be positive")
+    # ids are 12 hex digits (SessionStore); never a path
+    if opts.resume is not None and not re.fullmatch(r"[0-9a-f]{12}", opts.resume):
+        parser.error(f"--resume: {opts.resume!r} is not a session id (12 hex digits)")
+
+    verbose = opts.verbose
+    user_prompt = " ".join(opts.prompt)
+    if verbose and user_prompt:
+        print(f'User prompt: "{user_prompt}"')
+
+    from agent.loop           import MAX_ITERATIONS, ModelCallError, run_session
+    from agent.session        import SessionStore
+    from agent.compaction     import DEFAULT_TOKEN_BUDGET
+    from agent.trace          import Tracer
+    from agent.response_cache import ResponseCache
+    from agent.model          import ModelCaller, RetryPolicy, make_client
+
+    # ── auth & client ───────────────────────────────────────────
+    if client is None and opts.replay:
+        from agent.replay import ReplayClient
+
+        client = ReplayClient.from_session(opts.replay)
+    elif client is None:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        client = make_client(os.environ["GEMINI_API_KEY"])
+    caller = ModelCaller(
+        RetryPolicy(max_attempts=opts.max_attempts, timeout=opts.model_timeout),
+        rate=opts.rpm / 60 if opts.rpm is not None else None,
+    )
+    max_iterations = opts.max_iterations or MAX_ITERATIONS
+    context_budget = DEFAULT_TOKEN_BUDGET if opts.context_budget is None else opts.context_budget
+
+    # ── optional warm interpreters for run_python_file ──────────
+    if opts.warm_pool > 0:
+        from functions.run_python import use_warm_pool
+        from functions.warm_pool import WarmPool
+
+        pool = WarmPool(opts.warm_pool)
+        atexit.register(pool.close)
+        use_warm_pool(pool)
+
+    # ── opt-in response cache ───────────────────────────────────
+    use_cache = opts.cache
+    if use_cache is None:
+        use_cache = os.environ.get("AGENT_RESPONSE_CACHE") == "1"
+    cache = ResponseCache() if use_cache else None
+    tracer = Tracer() if opts.trace or verbose else None
+
+    if opts.batch:
+        return _main_batch(opts, client, caller, tracer, cache, max_iterations, context_budget)
+
+    # ── session store: every turn is persisted as it happens ────
+    store = SessionStore(opts.resume)
+    if opts.resume and not store.exists():
+        sys.exit(f"Unknown session: {opts.resume}")
+    print(f"Session: {store.session_id}")
+
+    # ── run the async agent loop to completion ──────────────────
     try:
-        resp = client.models.generate_content(
-            model="gemini-2.0-flash-001",
-            contents=messages,
-            config=types.GenerateContentConfig(
-                system_instruction=system_prompt,
-                tools=available_tools,
-                temperature=0.0,
-            ),
+        result = asyncio.run(
+            run_session(
+                client,
+                store,
+                user_prompt,
+                verbose=verbose,
+                context_budget=context_budget,
+                max_iterations=max_iterations,
+                tracer=tracer,
+                cache=cache,
+                caller=caller,
+            )
         )
-    except Exception as e:
+    except ModelCallError as e:
         print(f"Fatal error calling model: {e}")
+        print(caller.metrics.summary())
+        print(f"Resume with: uv run main.py --resume {store.session_id}")
         sys.exit(1)
+    finally:
+        if opts.trace:
+            tracer.write(opts.trace)
+
+    if store.skipped:
+        lines = ", ".join(map(str, store.skipped))
+        print(f"Warning: skipped corrupt line(s) {lines} of {store.path}")
+    if result.final_response is not None:
+        print("Final response:\n" + result.final_response)
+    else:
+        print("Max iterations reached without final response.")
+        print(f"Resume with: uv run main.py --resume {store.session_id}")
+
+    # ── optional token usage summary ────────────────────────────
+    if verbose and result.usage is not None:
+        meta = result.usage
+        print(f"Prompt tokens: {meta.prompt_token_count}")
+        print(f"Response tokens: {meta.candidates_token_count}")
+        print(f"Prompt tokens saved by compaction: ~{result.tokens_saved} (estimated)")
+        if cache is not None:
+            print(f"Response cache: {cache.hits} hit(s), {cache.misses} miss(es)")
+        print(caller.metrics.summary())
+
+    # ── where the time and tokens went ──────────────────────────
+    if tracer is not None:
+        print(tracer.summary())
+        if opts.trace:
+            print(f"Trace written to {opts.trace}")
+
+
+def _main_batch(opts, client, caller, tracer, cache, max_iterations, context_budget) -> None:
+    """--batch: every task in its own copy of WORKING_DIR, results streamed to --output."""
+    from agent.batch          import load_tasks, run_batch, summary
+    from functions.dispatcher import WORKING_DIR
 
-    content = resp.candidates[0].content
-    messages.append(content)                # keep conversation state
-    part0 = content.parts[0]
-
-    # ── branch: model produced a tool call ──────────────────────
-    if part0.function_call:
-        tool_response = call_function(part0.function_call, verbose=verbose)
-
-        # ensure dispatcher produced a tool response
-        if not tool_response.parts[0].function_response:
-            raise RuntimeError("call_function failed to produce a tool response")
-
-        if verbose:
-            print("->", tool_response.parts[0].function_response.response)
-
-        messages.append(tool_response)      # feed tool result back to LLM
-        continue                            # next turn
-
-    # ── branch: model produced plain text (final answer) ────────
-    print("Final response:\n" + part0.text.strip())
-    break
-else:
-    print("Max iterations reached without final response.")
+    try:
+        tasks = load_tasks(opts.batch, max_iterations)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Cannot load tasks: {e}")
+    output = opts.output or os.path.splitext(opts.batch)[0] + ".results.jsonl"
+    print(f"Batch: {len(tasks)} task(s), {opts.concurrency} at a time; results in {output}")
 
-# ── optional token usage summary ────────────────────────────────
-if verbose:
-    meta = resp.usage_metadata
-    print(f"Prompt tokens: {meta.prompt_token_count}")
-    print(f"Response tokens: {meta.candidates_token_count}")
+    try:
+        with open(output, "w", encoding="utf-8") as out:
+            records = asyncio.run(
+                run_batch(
+                    client, tasks, out, WORKING_DIR,
+                    concurrency=opts.concurrency,
+                    keep_workdirs=opts.keep_workdirs,
+                    verbose=opts.verbose,
+                    context_budget=context_budget,
+                    tracer=tracer,
+                    cache=cache,
+                    caller=caller,
+                )
+            )
+    finally:
+        if opts.trace:
+            tracer.write(opts.trace)
+
+    print(summary(records))
+    print(caller.metrics.summary())
+    if tracer is not None:
+        print(tracer.summary())
+        if opts.trace:
+            print(f"Trace written to {opts.trace}")
+
+
+if __name__ == "__main__":
+    main()